@@ -5,22 +5,12 @@ import json
 import sys
 import os
 import logging
-import logging.config
-from typing import Dict, Callable, List, Tuple, Any
-
-import yaml
+from typing import Dict, Callable, List, Tuple, Any, Optional
 
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-# Configure logging
-with open(os.path.join(project_root, "logging.yaml")) as f:
-    conf = yaml.safe_load(f)
-    log_fn = conf["handlers"]["file_handler"]["filename"]
-    log_fn = os.path.join(project_root, log_fn)
-    conf["handlers"]["file_handler"]["filename"] = log_fn
-    logging.config.dictConfig(conf)
-
 
+# Note: logging is configured by clemgame (see clemgame/log_utils.py), which the entry points import first
 def get_logger(name):
     return logging.getLogger(name)
 
@@ -36,7 +26,49 @@ def load_credentials(backend, file_name="key.json") -> Dict:
     return creds
 
 
+class StopConditions:
+    """
+    Declarative conditions under which a response is complete, before the maximal number of tokens is generated:
+    the response ends before the first of the stop strings or after max_lines lines. Leading whitespace of the
+    response is ignored (e.g. the newline with which some models start).
+    """
+
+    def __init__(self, stop_strings: List[str] = None, max_lines: int = None):
+        self.stop_strings: List[str] = stop_strings or []
+        self.max_lines: Optional[int] = max_lines
+
+    def find_end(self, text: str) -> Optional[int]:
+        """
+        :return: the position at which the response text is complete; None, if it may go on
+        """
+        start = len(text) - len(text.lstrip())
+        ends = [text.find(stop_string, start) for stop_string in self.stop_strings]
+        if self.max_lines:
+            end = start - 1
+            for _ in range(self.max_lines):
+                end = text.find("\n", end + 1)
+                if end == -1:
+                    break
+            ends.append(end)
+        ends = [end for end in ends if end != -1]
+        return min(ends) if ends else None
+
+    def truncate(self, text: str) -> str:
+        """
+        :return: the response text up to its end (see find_end)
+        """
+        end = self.find_end(text)
+        return text if end is None else text[:end]
+
+    def to_dict(self) -> Dict:
+        return {"stop_strings": self.stop_strings, "max_lines": self.max_lines}
+
+
 class Backend(abc.ABC):
+    # whether generate_response accepts stop_conditions (see StopConditions)
+    supports_stop_conditions: bool = False
+    # backends with a higher priority are asked first whether they support a model (see lookup_by_model_name)
+    lookup_priority: int = 0
 
     @abc.abstractmethod
     def generate_response(self, messages: List[Dict], model: str) -> Tuple[Any, Any, str]:
@@ -66,10 +98,43 @@ class Backend(abc.ABC):
         """
         pass
 
+    def generate_batch(self, list_of_messages: List[List[Dict]], model: str) -> List[Tuple[Any, Any, str]]:
+        """Get the responses to several dialogue contexts at once.
+
+        Backends that can process the contexts together (e.g. local models, in one batch) override this;
+        by default, they are passed to generate_response one after the other.
+
+        Returns:
+            List[Tuple[Any, Any, str]]: for each context, the (prompt, response, response text) triple of
+            generate_response.
+        """
+        return [self.generate_response(messages, model) for messages in list_of_messages]
+
     @abc.abstractmethod
     def supports(self, model_name: str):
         pass
 
+    def end_episode(self):
+        """
+        Called after each episode. Backends that keep state per conversation (e.g. cached keys and values of
+        local models) release it here.
+        """
+        pass
+
+    def prewarm(self, model_name: str):
+        """
+        Called before a run plays its episodes. Local backends may start to read the model's weights from the disk
+        in the background here, before the model is loaded by the first call.
+        """
+        pass
+
+    def get_load_metrics(self, model_name: str) -> Dict:
+        """
+        :return: for a local model loaded by this backend: how long loading it took (load_seconds) and the peak
+                 resident set size of the process after loading it (peak_rss_bytes); otherwise empty
+        """
+        return {}
+
     def __repr__(self):
         return f"Backend({str(self)})"
 
@@ -108,9 +173,9 @@ else:
 def lookup_by_model_name(remote_model_name: str) -> Backend:
     """
     :param remote_model_name: the model name for which a supporting backend has to be found
-    :return: first backend found that supports the model; otherwise None
+    :return: first backend found that supports the model (by lookup_priority); otherwise None
     """
-    for backend in _loaded_backends:
+    for backend in sorted(_loaded_backends, key=lambda b: -b.lookup_priority):
         if backend.supports(remote_model_name):
             return backend
     return None
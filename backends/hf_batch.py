@@ -0,0 +1,56 @@
+""" Batched generation with local HuggingFace models.
+
+The prompts of a batch are left-padded, so that all of them end at the same position and model.generate() appends
+the new tokens of all sequences in one loop. The continuation of each sequence is then sliced off by the (padded)
+prompt length, and cut after its first end-of-sequence token: generate() pads the sequences that finished early until
+the last one finishes.
+"""
+from typing import List, Optional, Sequence, Tuple, Union
+
+import torch
+
+
+def left_pad(sequences: Sequence[Sequence[int]], pad_token_id: int) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    :param sequences: the token ids of the prompts
+    :param pad_token_id: the id to pad the shorter prompts with
+    :return: the padded input ids and the attention mask, both of shape (batch, length of the longest prompt)
+    """
+    length = max(len(sequence) for sequence in sequences)
+    input_ids = torch.full((len(sequences), length), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(sequences), length), dtype=torch.long)
+    for idx, sequence in enumerate(sequences):
+        if len(sequence):
+            input_ids[idx, -len(sequence):] = torch.as_tensor(sequence, dtype=torch.long)
+            attention_mask[idx, -len(sequence):] = 1
+    return input_ids, attention_mask
+
+
+def continuations(output_ids: torch.Tensor, prompt_length: int,
+                  eos_token_id: Optional[Union[int, List[int]]]) -> List[List[int]]:
+    """
+    :param output_ids: the sequences returned by model.generate() for left-padded prompts
+    :param prompt_length: the length of the padded prompts
+    :param eos_token_id: the end-of-sequence token id(s) of the model's generation config
+    :return: the generated token ids of each sequence, up to and including its first end-of-sequence token
+    """
+    if eos_token_id is None:
+        eos_token_ids = set()
+    elif isinstance(eos_token_id, int):
+        eos_token_ids = {eos_token_id}
+    else:
+        eos_token_ids = set(eos_token_id)
+    result = []
+    for sequence in output_ids[:, prompt_length:].tolist():
+        end = next((idx + 1 for idx, token_id in enumerate(sequence) if token_id in eos_token_ids), len(sequence))
+        result.append(sequence[:end])
+    return result
+
+
+def pad_token_id(tokenizer) -> int:
+    """
+    :return: the tokenizer's padding token id; the end-of-sequence token id for tokenizers without one (e.g. Llama 2)
+    """
+    if tokenizer.pad_token_id is not None:
+        return tokenizer.pad_token_id
+    return tokenizer.eos_token_id
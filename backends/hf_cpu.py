@@ -0,0 +1,114 @@
+""" Inference options of the local HuggingFace models on CPUs (e.g. evaluation nodes without GPUs).
+
+- bf16: the weights are loaded in bfloat16, if the CPU has native bfloat16 instructions (AVX512-BF16 or AMX);
+  otherwise the checkpoint's dtype is kept, as emulated bfloat16 is slower than float32
+- int8: the Linear layers are quantized dynamically to int8 (their weights are stored in int8, the activations are
+  quantized on the fly); the model is loaded in float32 for this
+- inference_mode: generate under torch.inference_mode instead of torch.no_grad (no version counters and views)
+- num_threads: the number of intra-op threads while the model generates (default: torch's, i.e. the physical cores)
+- compile: compile the forward pass with torch.compile (the first calls of new shapes are slow)
+
+See hf_cpu_benchmark.py to compare the options for a model.
+"""
+import contextlib
+import resource
+from typing import Dict, Optional, Union
+
+import torch
+
+import backends
+
+logger = backends.get_logger(__name__)
+
+
+class CPUOptions:
+
+    def __init__(self, bf16: bool = True, int8: bool = False, inference_mode: bool = True,
+                 num_threads: Optional[int] = None, compile: bool = False):
+        self.bf16 = bf16
+        self.int8 = int8
+        self.inference_mode = inference_mode
+        self.num_threads = num_threads
+        self.compile = compile
+
+    def to_dict(self) -> Dict:
+        return {"bf16": self.bf16, "int8": self.int8, "inference_mode": self.inference_mode,
+                "num_threads": self.num_threads, "compile": self.compile}
+
+
+def supports_bf16() -> bool:
+    """
+    :return: whether the CPU has native bfloat16 instructions
+    """
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = set(f.read().split())
+    except OSError:  # not Linux
+        return False
+    return bool(flags & {"avx512_bf16", "amx_bf16"})
+
+
+def torch_dtype(options: CPUOptions) -> Union[str, torch.dtype]:
+    """
+    :return: the torch_dtype to load the model with
+    """
+    if options.int8:
+        return torch.float32
+    if options.bf16 and supports_bf16():
+        return torch.bfloat16
+    return "auto"
+
+
+def optimize(model, options: CPUOptions):
+    """
+    :return: the loaded model, quantized and compiled according to the options (in place)
+    """
+    if options.int8:
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    if options.compile:
+        # generate() stays available, as only the forward pass is replaced
+        try:
+            model.forward = torch.compile(model.forward, dynamic=True)
+        except RuntimeError as e:  # e.g. not supported for this Python version
+            logger.warning(f"The model is not compiled: {e}")
+    logger.info(f"CPU options: {options.to_dict()}, dtype: {model.dtype}")
+    return model
+
+
+@contextlib.contextmanager
+def inference_context(options: Optional[CPUOptions]):
+    """
+    The context of a model's generation calls (None: on GPUs, inference mode only).
+    The number of threads is process-wide, so that the previous number is restored afterwards.
+    """
+    num_threads = torch.get_num_threads()
+    if options is not None and options.num_threads and num_threads != options.num_threads:
+        torch.set_num_threads(options.num_threads)
+    try:
+        if options is None or options.inference_mode:
+            with torch.inference_mode():
+                yield
+        else:
+            with torch.no_grad():
+                yield
+    finally:
+        if torch.get_num_threads() != num_threads:
+            torch.set_num_threads(num_threads)
+
+
+def rss_bytes() -> int:
+    """
+    :return: the current resident set size of the process (0 where /proc is not available)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return 0
+
+
+def peak_rss_bytes() -> int:
+    """
+    :return: the peak resident set size of the process so far
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KiB on Linux
@@ -0,0 +1,85 @@
+""" Compare the CPU inference options (see hf_cpu.py) of a local HuggingFace model: tokens/sec and RSS.
+
+Each option set is measured in its own (forked) process, so that the resident set sizes only include its model.
+Run with python3 backends/hf_cpu_benchmark.py -m <MODEL ID> (or the path of a local model).
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import hf_cpu  # noqa: E402
+
+OPTION_SETS = {
+    "eager": hf_cpu.CPUOptions(bf16=False, inference_mode=False),
+    "inference_mode": hf_cpu.CPUOptions(bf16=False),
+    "bf16": hf_cpu.CPUOptions(bf16=True),
+    "int8": hf_cpu.CPUOptions(bf16=False, int8=True),
+    "compile": hf_cpu.CPUOptions(bf16=True, compile=True),
+}
+
+MESSAGES = [{"role": "user", "content": "Describe the rules of the game of chess in a few sentences."}]
+
+
+def measure(model_id: str, options: hf_cpu.CPUOptions, max_new_tokens: int, repetitions: int, results):
+    import torch
+    from transformers import AutoTokenizer, AutoModelForCausalLM
+
+    start = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(model_id, verbose=False)
+    model = AutoModelForCausalLM.from_pretrained(model_id, torch_dtype=hf_cpu.torch_dtype(options))
+    model = hf_cpu.optimize(model.eval(), options)
+    load_seconds = time.perf_counter() - start
+
+    prompt_tokens = tokenizer.apply_chat_template(MESSAGES, add_generation_prompt=True, return_tensors="pt")
+
+    def generate():
+        with hf_cpu.inference_context(options):
+            # a fixed number of new tokens, so that the options generate the same amount
+            return model.generate(prompt_tokens, max_new_tokens=max_new_tokens, min_new_tokens=max_new_tokens,
+                                  do_sample=False, pad_token_id=tokenizer.eos_token_id)
+
+    generate()  # warm-up (and compilation)
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        generate()
+    seconds = time.perf_counter() - start
+    results.put({"dtype": str(model.dtype).replace("torch.", ""), "threads": torch.get_num_threads(),
+                 "load_seconds": load_seconds, "tokens_per_second": repetitions * max_new_tokens / seconds,
+                 "rss_mb": hf_cpu.rss_bytes() / 2 ** 20, "peak_rss_mb": hf_cpu.peak_rss_bytes() / 2 ** 20})
+
+
+def benchmark(args):
+    print(f"Native bfloat16: {hf_cpu.supports_bf16()}")
+    print(f"{'options':<16}{'dtype':<10}{'threads':>8}{'load s':>10}{'tokens/s':>10}{'RSS MB':>10}{'peak MB':>10}")
+    context = multiprocessing.get_context("fork")
+    for name in args.options:
+        options = OPTION_SETS[name]
+        options.num_threads = args.threads
+        results = context.Queue()
+        process = context.Process(target=measure,
+                                  args=(args.model_name, options, args.max_new_tokens, args.repetitions, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(f"{name:<16}failed (exit code {process.exitcode})")
+            continue
+        result = results.get()
+        print(f"{name:<16}{result['dtype']:<10}{result['threads']:>8}{result['load_seconds']:>10.1f}"
+              f"{result['tokens_per_second']:>10.2f}{result['rss_mb']:>10.0f}{result['peak_rss_mb']:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-m", "--model_name", type=str, default="TinyLlama/TinyLlama-1.1B-Chat-v1.0",
+                        help="The HuggingFace model ID (or the path of a local model) of a small chat model.")
+    parser.add_argument("-o", "--options", nargs="+", choices=list(OPTION_SETS), default=list(OPTION_SETS),
+                        help="The option sets to compare.")
+    parser.add_argument("-t", "--threads", type=int, default=None,
+                        help="The number of threads (default: torch's default).")
+    parser.add_argument("-n", "--max_new_tokens", type=int, default=64)
+    parser.add_argument("-r", "--repetitions", type=int, default=3)
+    benchmark(parser.parse_args())
@@ -0,0 +1,244 @@
+""" Continuous batching of the generation requests to a local HuggingFace model.
+
+A background thread owns the model. Any number of threads (e.g. concurrent episodes) submit the token ids of their
+prompts to a queue and block on the returned future. The engine decodes all running sequences together, one token
+per step, and admits waiting requests whenever running sequences finish (iteration-level batching), instead of
+waiting for the whole batch.
+
+The running sequences share one left-padded key/value cache: a new sequence is prefilled on its own and then padded
+to the length of the batch (or the batch to its length). Finished sequences are removed from the batch, and the
+leading columns that only hold padding are cropped.
+"""
+import concurrent.futures
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Union
+
+import torch
+import transformers
+
+import backends
+from backends import hf_kv_cache
+
+logger = backends.get_logger(__name__)
+
+# default number of sequences that are decoded together
+MAX_BATCH_SIZE = 8
+# how long the idle engine waits for requests before checking whether it was stopped
+IDLE_TIMEOUT = 0.1
+
+
+class Request:
+
+    def __init__(self, prompt_ids: List[int], max_new_tokens: int, temperature: float,
+                 is_complete: Optional[Callable[[List[int]], bool]] = None):
+        self.prompt_ids = prompt_ids
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.is_complete = is_complete
+        self.output_ids: List[int] = []
+        self.future = concurrent.futures.Future()
+
+
+class GenerationEngine:
+    """
+    The thread that generates the continuations of the submitted prompts in continuous batches.
+    """
+
+    def __init__(self, model, eos_token_id: Optional[Union[int, List[int]]], max_batch_size: int = MAX_BATCH_SIZE,
+                 device: str = "cpu"):
+        """
+        :param model: a causal language model with the key/value layout (batch, heads, tokens, head dim)
+        :param eos_token_id: the end-of-sequence token id(s) that finish a sequence
+        :param max_batch_size: the number of sequences that are decoded together
+        :param device: the device of the model's inputs
+        """
+        self.model = model
+        if eos_token_id is None:
+            self.eos_token_ids = set()
+        elif isinstance(eos_token_id, int):
+            self.eos_token_ids = {eos_token_id}
+        else:
+            self.eos_token_ids = set(eos_token_id)
+        self.max_batch_size = max_batch_size
+        self.device = device
+        self.requests: queue.Queue = queue.Queue()
+        # the running sequences and their (left-padded) keys, values and attention mask:
+        self.running: List[Request] = []
+        self.past_key_values = None
+        self.attention_mask: Optional[torch.Tensor] = None
+        # metrics:
+        self.steps = 0
+        self.occupied_slots = 0
+        self.generated_tokens = 0
+        self.busy_seconds = 0.
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="hf-generation-engine", daemon=True)
+        self._thread.start()
+
+    def submit(self, prompt_ids: List[int], max_new_tokens: int, temperature: float = 0.,
+               is_complete: Callable[[List[int]], bool] = None) -> concurrent.futures.Future:
+        """
+        :param prompt_ids: the token ids of the prompt
+        :param max_new_tokens: the maximal number of tokens to generate
+        :param temperature: 0 for greedy decoding, otherwise the sampling temperature
+        :param is_complete: whether the generated token ids are complete (see hf_stopping), checked after each token
+        :return: a future of the generated token ids (including a final end-of-sequence token)
+        """
+        if self._stopped.is_set():
+            raise RuntimeError("The generation engine was stopped")
+        request = Request(list(prompt_ids), max_new_tokens, temperature, is_complete)
+        self.requests.put(request)
+        return request.future
+
+    def generate(self, prompt_ids: List[int], max_new_tokens: int, temperature: float = 0.,
+                 is_complete: Callable[[List[int]], bool] = None) -> List[int]:
+        """ Submit a prompt and wait for its continuation """
+        return self.submit(prompt_ids, max_new_tokens, temperature, is_complete).result()
+
+    def stop(self):
+        """ Finish the running sequences, fail the waiting requests and end the thread """
+        self._stopped.set()
+        self._thread.join()
+        while True:
+            try:
+                request = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            request.future.set_exception(RuntimeError("The generation engine was stopped"))
+
+    @property
+    def queue_depth(self) -> int:
+        return self.requests.qsize()
+
+    @property
+    def occupancy(self) -> float:
+        """ the mean fraction of the batch slots that were used in the decoding steps """
+        return self.occupied_slots / (self.steps * self.max_batch_size) if self.steps else 0.
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.generated_tokens / self.busy_seconds if self.busy_seconds else 0.
+
+    def stats(self) -> Dict:
+        return {"queue_depth": self.queue_depth, "running": len(self.running), "steps": self.steps,
+                "occupancy": self.occupancy, "generated_tokens": self.generated_tokens,
+                "tokens_per_second": self.tokens_per_second}
+
+    def _run(self):
+        while not (self._stopped.is_set() and not self.running):
+            self._admit()
+            if not self.running:
+                continue
+            start = time.perf_counter()
+            try:
+                self._step()
+            except Exception as e:  # fail the running sequences, but keep serving
+                logger.error(e, exc_info=True)
+                for request in self.running:
+                    request.future.set_exception(e)
+                self._reset_batch()
+            self.busy_seconds += time.perf_counter() - start
+
+    def _admit(self):
+        """ Prefill waiting requests while there are free slots """
+        while len(self.running) < self.max_batch_size and not self._stopped.is_set():
+            try:
+                # block only while there is nothing else to do
+                request = self.requests.get(timeout=IDLE_TIMEOUT) if not self.running else self.requests.get_nowait()
+            except queue.Empty:
+                return
+            start = time.perf_counter()
+            try:
+                self._prefill(request)
+            except Exception as e:
+                logger.error(e, exc_info=True)
+                request.future.set_exception(e)
+            self.busy_seconds += time.perf_counter() - start
+
+    @torch.inference_mode()
+    def _prefill(self, request: Request):
+        input_ids = torch.tensor([request.prompt_ids], device=self.device)
+        outputs = self.model(input_ids=input_ids, use_cache=True)
+        if self._append_token(request, outputs.logits[:, -1, :]):
+            return
+        past = hf_kv_cache.to_legacy_cache(outputs.past_key_values)
+        mask = torch.ones((1, input_ids.shape[1]), dtype=torch.long, device=self.device)
+        if self.past_key_values is None:
+            self.past_key_values, self.attention_mask = past, mask
+        else:
+            batch_length, length = self.attention_mask.shape[1], mask.shape[1]
+            self.past_key_values = tuple(
+                tuple(torch.cat([_left_pad(batch_tensor, length), _left_pad(tensor, batch_length)])
+                      for batch_tensor, tensor in zip(batch_layer, layer))
+                for batch_layer, layer in zip(self.past_key_values, past))
+            self.attention_mask = torch.cat([_left_pad(self.attention_mask, length),
+                                             _left_pad(mask, batch_length)])
+        self.running.append(request)
+
+    @torch.inference_mode()
+    def _step(self):
+        """ Decode the next token of all running sequences """
+        input_ids = torch.tensor([[request.output_ids[-1]] for request in self.running], device=self.device)
+        position_ids = self.attention_mask.sum(dim=1, keepdim=True)
+        self.attention_mask = torch.cat([self.attention_mask, torch.ones_like(input_ids)], dim=1)
+        outputs = self.model(input_ids=input_ids, attention_mask=self.attention_mask, position_ids=position_ids,
+                             past_key_values=self.past_key_values, use_cache=True)
+        self.past_key_values = hf_kv_cache.to_legacy_cache(outputs.past_key_values)
+        self.steps += 1
+        self.occupied_slots += len(self.running)
+        finished = [self._append_token(request, outputs.logits[idx:idx + 1, -1, :])
+                    for idx, request in enumerate(self.running)]
+        if any(finished):
+            keep = [idx for idx, done in enumerate(finished) if not done]
+            self.running = [self.running[idx] for idx in keep]
+            if not self.running:
+                self._reset_batch()
+                return
+            index = torch.tensor(keep, device=self.device)
+            self.attention_mask = self.attention_mask.index_select(0, index)
+            # crop the columns that are padding in all remaining sequences
+            start = int((self.attention_mask.sum(dim=0) > 0).nonzero()[0])
+            self.attention_mask = self.attention_mask[:, start:]
+            self.past_key_values = tuple(tuple(tensor.index_select(0, index)[..., start:, :] for tensor in layer)
+                                         for layer in self.past_key_values)
+
+    def _append_token(self, request: Request, logits: torch.Tensor) -> bool:
+        """
+        :return: whether the request is finished (its future then has the result)
+        """
+        if request.temperature > 0:
+            warpers = transformers.LogitsProcessorList([transformers.TemperatureLogitsWarper(request.temperature)])
+            top_k = self.model.generation_config.top_k
+            if top_k:
+                warpers.append(transformers.TopKLogitsWarper(top_k))
+            scores = warpers(None, logits.float())
+            token_id = int(torch.multinomial(torch.softmax(scores, dim=-1), num_samples=1))
+        else:
+            token_id = int(logits.argmax(dim=-1))
+        request.output_ids.append(token_id)
+        self.generated_tokens += 1
+        done = (token_id in self.eos_token_ids or len(request.output_ids) >= request.max_new_tokens
+                or (request.is_complete is not None and request.is_complete(request.output_ids)))
+        if done:
+            request.future.set_result(request.output_ids)
+        return done
+
+    def _reset_batch(self):
+        self.running = []
+        self.past_key_values = None
+        self.attention_mask = None
+
+
+def _left_pad(tensor: torch.Tensor, length: int) -> torch.Tensor:
+    """
+    :return: the tensor padded with zeros to the given length in its token dimension (keys and values: -2, mask: -1)
+    """
+    dim = -1 if tensor.dim() == 2 else -2
+    missing = length - tensor.shape[dim]
+    if missing <= 0:
+        return tensor
+    shape = list(tensor.shape)
+    shape[dim] = missing
+    return torch.cat([torch.zeros(shape, dtype=tensor.dtype, device=tensor.device), tensor], dim=dim)
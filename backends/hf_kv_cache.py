@@ -0,0 +1,255 @@
+""" Reuse of the key/value cache (past_key_values) of local HuggingFace models across calls.
+
+In multi-turn games, the prompt of a player's next turn is the prompt of its previous turn plus its response and
+the next message. Instead of running the prefill over the whole history again, the cached keys and values of the
+longest common token prefix are passed to model.generate(), which then only processes the new tokens.
+
+The conversations are identified by their token ids, so that no player ids have to be passed to the backends:
+a prompt continues the cached conversation with which it shares the longest prefix. The cached entries are never
+modified (generate() gets cropped views of them), so that e.g. both players of a self-play game can share a backend.
+
+Across episodes, the initial prompts of an experiment share long prefixes (the game instructions), which differ only
+in a few slot values near the end. The keys and values of these prompts are kept in a PrefixCache, so that the
+prefill of the next episode's initial prompt starts at the first token that differs.
+
+Both caches find the stored token sequence with the longest common prefix in a trie over the token ids.
+"""
+import collections
+from typing import Any, Dict, Optional, Sequence, Set, Tuple
+
+import torch
+
+import backends
+
+logger = backends.get_logger(__name__)
+
+# default bounds of the conversation cache
+MAX_CONVERSATIONS = 8
+MAX_CACHED_TOKENS = 32768
+# default bounds of the prefix cache
+MAX_PREFIXES = 16
+MAX_PREFIX_TOKENS = 32768
+# evict conversations while more than this fraction of a GPU's memory is allocated
+MAX_MEMORY_FRACTION = 0.9
+
+
+def to_legacy_cache(past_key_values: Any) -> Tuple:
+    """
+    :return: the keys and values as tuple (one (key, value) pair per layer), also for transformers Cache objects
+    """
+    if hasattr(past_key_values, "to_legacy_cache"):
+        return past_key_values.to_legacy_cache()
+    return past_key_values
+
+
+def past_length(past_key_values: Tuple) -> int:
+    """
+    :return: the number of tokens covered by the keys and values of shape (batch, heads, tokens, head dim)
+    """
+    return past_key_values[0][0].shape[-2]
+
+
+def crop_past_key_values(past_key_values: Tuple, length: int) -> Tuple:
+    """
+    :return: views of the keys and values of the first length tokens
+    """
+    return tuple(tuple(tensor[..., :length, :] for tensor in layer) for layer in past_key_values)
+
+
+def memory_pressure(max_memory_fraction: float = MAX_MEMORY_FRACTION) -> bool:
+    """
+    :return: True, if more than max_memory_fraction of the memory of a GPU is allocated
+    """
+    if not torch.cuda.is_available():
+        return False
+    for device in range(torch.cuda.device_count()):
+        total = torch.cuda.get_device_properties(device).total_memory
+        if torch.cuda.memory_allocated(device) > max_memory_fraction * total:
+            return True
+    return False
+
+
+class TokenTrie:
+    """
+    A trie over the token ids of the stored sequences. Each node knows the sequences that pass through it.
+    """
+
+    class Node:
+        __slots__ = ("children", "keys")
+
+        def __init__(self):
+            self.children: Dict[int, "TokenTrie.Node"] = {}
+            self.keys: Set[int] = set()
+
+    def __init__(self):
+        self.root = TokenTrie.Node()
+
+    def insert(self, key: int, token_ids: Sequence[int]):
+        node = self.root
+        for token_id in token_ids:
+            node = node.children.setdefault(token_id, TokenTrie.Node())
+            node.keys.add(key)
+
+    def remove(self, key: int, token_ids: Sequence[int]):
+        node = self.root
+        for token_id in token_ids:
+            child = node.children[token_id]
+            child.keys.discard(key)
+            if not child.keys:  # no other sequence continues here
+                del node.children[token_id]
+                return
+            node = child
+
+    def longest_prefix(self, token_ids: Sequence[int]) -> Tuple[int, Set[int]]:
+        """
+        :return: the length of the longest prefix shared with a stored sequence, and the keys of these sequences
+        """
+        node, length = self.root, 0
+        for token_id in token_ids:
+            child = node.children.get(token_id)
+            if child is None:
+                break
+            node, length = child, length + 1
+        return length, node.keys
+
+
+class KVCache:
+    """
+    Keys and values by their token ids, evicted in least recently used order.
+    """
+
+    def __init__(self, max_entries: int, max_tokens: int, max_memory_fraction: float = MAX_MEMORY_FRACTION):
+        """
+        :param max_entries: the number of token sequences to keep
+        :param max_tokens: the number of tokens to keep the keys and values of (over all sequences)
+        :param max_memory_fraction: evict sequences while more of a GPU's memory is allocated
+        """
+        self.max_entries = max_entries
+        self.max_tokens = max_tokens
+        self.max_memory_fraction = max_memory_fraction
+        self.entries: collections.OrderedDict = collections.OrderedDict()  # key -> (token ids, past key values)
+        self.trie = TokenTrie()
+        self.cached_tokens = 0
+        self._next_key = 0
+        self.lookups = 0
+        self.hits = 0
+        self.looked_up_tokens = 0
+        self.reused_tokens = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def misses(self) -> int:
+        return self.lookups - self.hits
+
+    @property
+    def hit_rate(self) -> float:
+        """ the fraction of the lookups that reused cached keys and values """
+        return self.hits / self.lookups if self.lookups else 0.
+
+    @property
+    def token_hit_rate(self) -> float:
+        """ the fraction of the looked up prompt tokens whose keys and values were reused """
+        return self.reused_tokens / self.looked_up_tokens if self.looked_up_tokens else 0.
+
+    def lookup(self, input_ids: Sequence[int]) -> Tuple[int, Optional[Tuple]]:
+        """
+        :param input_ids: the token ids of a prompt
+        :return: the number of prompt tokens covered by the cached keys and values, and these;
+                 0 and None, if no cached sequence shares a prefix with the prompt
+        """
+        self.lookups += 1
+        self.looked_up_tokens += len(input_ids)
+        length, keys = self.trie.longest_prefix(input_ids)
+        # at least the last prompt token has to be processed to get the logits of the next token
+        length = min(length, len(input_ids) - 1)
+        if length <= 0:
+            return 0, None
+        # the most recently used of the sequences with this prefix
+        key = next(key for key in reversed(self.entries) if key in keys)
+        self.entries.move_to_end(key)
+        self.hits += 1
+        self.reused_tokens += length
+        return length, crop_past_key_values(self.entries[key][1], length)
+
+    def store(self, token_ids: Sequence[int], past_key_values: Any):
+        """
+        :param token_ids: the token ids covered by the keys and values
+        :param past_key_values: as returned by model.generate()
+        """
+        token_ids = tuple(token_ids)
+        key = self._next_key
+        self._next_key += 1
+        self.entries[key] = (token_ids, to_legacy_cache(past_key_values))
+        self.trie.insert(key, token_ids)
+        self.cached_tokens += len(token_ids)
+        self._evict()
+
+    def remove(self, key: int):
+        token_ids, _ = self.entries.pop(key)
+        self.trie.remove(key, token_ids)
+        self.cached_tokens -= len(token_ids)
+
+    def clear(self):
+        for key in list(self.entries):
+            self.remove(key)
+
+    def stats(self) -> str:
+        return (f"{self.hits} of {self.lookups} lookups hit ({self.hit_rate:.1%}), "
+                f"{self.reused_tokens} of {self.looked_up_tokens} prompt tokens reused ({self.token_hit_rate:.1%}), "
+                f"{len(self.entries)} entries with {self.cached_tokens} tokens")
+
+    def _evict(self):
+        while self.entries and (len(self.entries) > self.max_entries
+                                or self.cached_tokens > self.max_tokens
+                                or memory_pressure(self.max_memory_fraction)):
+            key = next(iter(self.entries))
+            logger.debug("Evicted the cached keys and values of %d tokens", len(self.entries[key][0]))
+            self.remove(key)
+
+
+class ConversationCache(KVCache):
+    """
+    The keys and values of the most recent conversations.
+    """
+
+    def __init__(self, max_conversations: int = MAX_CONVERSATIONS, max_tokens: int = MAX_CACHED_TOKENS,
+                 max_memory_fraction: float = MAX_MEMORY_FRACTION):
+        super().__init__(max_conversations, max_tokens, max_memory_fraction)
+
+    def store(self, token_ids: Sequence[int], past_key_values: Any):
+        """
+        Keep the keys and values of a conversation. The entries of the conversations that it continues are replaced.
+        """
+        token_ids = tuple(token_ids)
+        length, keys = self.trie.longest_prefix(token_ids)
+        for key in list(keys):
+            if len(self.entries[key][0]) == length:  # the new conversation continues the stored one
+                self.remove(key)
+        super().store(token_ids, past_key_values)
+
+
+class PrefixCache(KVCache):
+    """
+    The keys and values of the initial prompts of the recent episodes.
+    """
+
+    def __init__(self, max_prefixes: int = MAX_PREFIXES, max_tokens: int = MAX_PREFIX_TOKENS,
+                 max_memory_fraction: float = MAX_MEMORY_FRACTION):
+        super().__init__(max_prefixes, max_tokens, max_memory_fraction)
+
+    def store(self, token_ids: Sequence[int], past_key_values: Any):
+        """
+        Keep the keys and values of a prompt, unless a cached prompt already starts with it.
+        :param token_ids: the token ids of the prompt
+        :param past_key_values: as returned by model.generate() (also covering the generated tokens)
+        """
+        token_ids = tuple(token_ids)
+        length, _ = self.trie.longest_prefix(token_ids)
+        if length == len(token_ids):
+            return
+        # copy the keys and values of the prompt tokens, so that the rest of the tensors can be freed
+        prompt_past = tuple(tuple(tensor.clone() for tensor in layer)
+                            for layer in crop_past_key_values(to_legacy_cache(past_key_values), len(token_ids)))
+        super().store(token_ids, prompt_past)
@@ -0,0 +1,108 @@
+""" Loading the weights of local HuggingFace models with little memory overhead.
+
+- safetensors checkpoints are memory-mapped: their tensors are read from the page cache straight into the parameters
+  (the checkpoints of most models are safetensors; transformers only falls back to pickled .bin files without them)
+- low_cpu_mem_usage: the model is created without initialized weights, so that no second copy is materialized in RAM
+  before the checkpoint is loaded and placed
+- the cache directory is set by CLEMBENCH_HF_CACHE (default: /data/huggingface_cache, if it can be created;
+  otherwise the default cache of HuggingFace)
+- prewarm: the cached checkpoint files are read into the page cache in a background thread (e.g. while the game
+  instances are set up), so that the actual load does not wait for the disk
+"""
+import glob
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import huggingface_hub
+
+import backends
+from backends import hf_cpu
+
+logger = backends.get_logger(__name__)
+
+CACHE_DIR_VARIABLE = "CLEMBENCH_HF_CACHE"
+DEFAULT_CACHE_DIR = "/data/huggingface_cache"
+# the checkpoint files to prewarm, by preference (transformers loads the safetensors files, if there are any)
+WEIGHT_PATTERNS = ["*.safetensors", "*.bin"]
+PREWARM_CHUNK_BYTES = 16 * 2 ** 20
+
+
+def cache_dir() -> Optional[str]:
+    """
+    :return: the directory of the downloaded models; None for the default cache of HuggingFace
+    """
+    if os.environ.get(CACHE_DIR_VARIABLE):
+        return os.environ[CACHE_DIR_VARIABLE]
+    try:
+        os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+    except OSError as e:
+        logger.info(f"Cannot create {DEFAULT_CACHE_DIR} ({e}), using the default cache of HuggingFace")
+        return None
+    return DEFAULT_CACHE_DIR
+
+
+def model_kwargs() -> Dict:
+    """
+    :return: the arguments of from_pretrained for a memory-efficient load
+    """
+    return {"cache_dir": cache_dir(), "low_cpu_mem_usage": True}
+
+
+def weight_files(model_id: str, token: str = None) -> List[str]:
+    """
+    :param model_id: the id of the model on HuggingFace (or the path of a local model)
+    :return: the cached checkpoint files of the model (empty, if the model is not downloaded yet)
+    """
+    if os.path.isdir(model_id):
+        model_path = model_id
+    else:
+        try:
+            model_path = huggingface_hub.snapshot_download(model_id, cache_dir=cache_dir(), token=token,
+                                                           local_files_only=True)
+        except Exception:  # not cached (e.g. huggingface_hub.utils.LocalEntryNotFoundError)
+            return []
+    for pattern in WEIGHT_PATTERNS:
+        files = sorted(glob.glob(os.path.join(model_path, pattern)))
+        if files:
+            return files
+    return []
+
+
+def prewarm(model_id: str, token: str = None) -> Optional[threading.Thread]:
+    """
+    Read the cached checkpoint files of the model into the page cache in a background thread.
+    :return: the started thread; None, if the model is not downloaded yet
+    """
+    files = weight_files(model_id, token)
+    if not files:
+        logger.info(f"No cached checkpoint of {model_id} to prewarm")
+        return None
+    thread = threading.Thread(target=_read_files, args=(model_id, files), name="hf-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def _read_files(model_id: str, files: List[str]):
+    start = time.perf_counter()
+    buffer = bytearray(PREWARM_CHUNK_BYTES)
+    total = 0
+    for file_path in files:
+        with open(file_path, "rb", buffering=0) as f:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            while True:
+                read = f.readinto(buffer)
+                if not read:
+                    break
+                total += read
+    logger.info(f"Prewarmed {total / 2 ** 30:.1f} GiB of {model_id} in {time.perf_counter() - start:.1f}s")
+
+
+def load_metrics(start: float) -> Dict:
+    """
+    :param start: the time.perf_counter() before loading the model
+    :return: the load time and the peak resident set size of the process after loading
+    """
+    return {"load_seconds": round(time.perf_counter() - start, 2), "peak_rss_bytes": hf_cpu.peak_rss_bytes()}
@@ -0,0 +1,223 @@
+""" A pool of loaded local HuggingFace models, by model name.
+
+Each pooled model comes with its tokenizer and its own key/value caches (their token ids only make sense for the
+model's tokenizer), so that e.g. the two players of a cross-play pair of local models use their own weights. When the
+weights of the loaded models exceed the memory budget, the least recently used models are unloaded: their references
+are dropped, the garbage is collected and the CUDA memory that torch keeps cached is returned.
+
+The size of a model is only known after loading it. A model that was loaded (and evicted) before makes room for itself
+before it is loaded again; otherwise the other models are evicted right after loading it.
+
+The models are leased for their generation calls (see ModelPool.lease): a leased model is in use (e.g. by a thread of
+the model server or by its generation engine) and only unloaded once it is returned.
+"""
+import collections
+import contextlib
+import gc
+import os
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
+
+import torch
+
+import backends
+from backends import hf_cpu, hf_engine, hf_kv_cache
+
+logger = backends.get_logger(__name__)
+
+# default memory budget: this fraction of the GPU memory (or of the RAM, without GPUs)
+MEMORY_BUDGET_FRACTION = 0.8
+
+
+def default_memory_budget() -> int:
+    """
+    :return: the default memory budget in bytes (see MEMORY_BUDGET_FRACTION)
+    """
+    if torch.cuda.is_available():
+        total = sum(torch.cuda.get_device_properties(device).total_memory
+                    for device in range(torch.cuda.device_count()))
+    else:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    return int(MEMORY_BUDGET_FRACTION * total)
+
+
+def memory_footprint(model) -> int:
+    """
+    :return: the size of the model's parameters and buffers in bytes, including the packed weights of the layers
+             quantized to int8 (see hf_cpu), which are neither parameters nor buffers
+    """
+    if hasattr(model, "get_memory_footprint"):
+        size = model.get_memory_footprint()
+    else:
+        size = sum(tensor.numel() * tensor.element_size()
+                   for tensor in list(model.parameters()) + list(model.buffers()))
+    for module in model.modules():
+        if isinstance(module, torch.ao.nn.quantized.dynamic.Linear):
+            size += sum(tensor.numel() * tensor.element_size()
+                        for tensor in module._weight_bias() if tensor is not None)
+    return size
+
+
+class PooledModel:
+    """
+    A loaded model with its tokenizer and the caches of its conversations.
+    """
+
+    def __init__(self, model_name: str, model, tokenizer, device: str, cpu_options: hf_cpu.CPUOptions = None):
+        self.model_name = model_name
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        # the options the model was loaded with on CPUs (None on GPUs):
+        self.cpu_options = cpu_options
+        self.memory_bytes = memory_footprint(model)
+        # keys and values of the recent conversations, to only prefill the new tokens of a player's next turn:
+        self.kv_cache = hf_kv_cache.ConversationCache()
+        # keys and values of the initial prompts, which share the game instructions across the episodes:
+        self.prefix_cache = hf_kv_cache.PrefixCache()
+        self.engine: Optional[hf_engine.GenerationEngine] = None
+        self._engine_lock = threading.Lock()
+        # the number of callers that use the model (see ModelPool.get and ModelPool.put_back):
+        self.leases = 0
+
+    def get_engine(self, max_batch_size: int) -> hf_engine.GenerationEngine:
+        """
+        :return: the continuous-batching engine of the model (started on the first call)
+        """
+        with self._engine_lock:
+            if self.engine is None:
+                self.engine = hf_engine.GenerationEngine(self.model, self.model.generation_config.eos_token_id,
+                                                         max_batch_size, self.device)
+            return self.engine
+
+    def release(self):
+        """ Drop the references to the weights, the tokenizer and the caches """
+        if self.engine is not None:
+            self.engine.stop()
+            self.engine = None
+        self.kv_cache.clear()
+        self.prefix_cache.clear()
+        self.model = None
+        self.tokenizer = None
+
+
+class ModelPool:
+    """
+    The loaded models, evicted in least recently used order when their weights exceed the memory budget.
+    """
+
+    def __init__(self, load_fn: Callable[[str], PooledModel], memory_budget: Optional[int] = None):
+        """
+        :param load_fn: loads a model by its name
+        :param memory_budget: the number of bytes that the weights of the loaded models may take;
+                              default: see default_memory_budget
+        """
+        self.load_fn = load_fn
+        self.memory_budget = memory_budget if memory_budget is not None else default_memory_budget()
+        self.models: collections.OrderedDict = collections.OrderedDict()  # model name -> PooledModel
+        self.known_sizes: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        # the models that were loaded again after their eviction (reported once, see get):
+        self.reloaded: set = set()
+
+    def __contains__(self, model_name: str) -> bool:
+        return model_name in self.models
+
+    def __getitem__(self, model_name: str) -> PooledModel:
+        return self.models[model_name]
+
+    def __len__(self) -> int:
+        return len(self.models)
+
+    def __iter__(self):
+        return iter(list(self.models.values()))
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(pooled.memory_bytes for pooled in self.models.values())
+
+    def get(self, model_name: str) -> PooledModel:
+        """
+        Lease a model: it is not unloaded before it is returned with put_back (see lease).
+        :return: the pooled model, which is loaded first, if necessary
+        """
+        with self._lock:
+            if model_name not in self.models:
+                if model_name in self.known_sizes:
+                    self._warn_reload(model_name)
+                    self._evict(reserved=self.known_sizes[model_name])
+                self.add(self.load_fn(model_name))
+            self.models.move_to_end(model_name)
+            pooled = self.models[model_name]
+            pooled.leases += 1
+            return pooled
+
+    def put_back(self, pooled: PooledModel):
+        """ Return a leased model; the models that were evicted in the meantime are unloaded, once unused """
+        with self._lock:
+            pooled.leases -= 1
+            if pooled.leases > 0:
+                return
+            if self.models.get(pooled.model_name) is not pooled:
+                self._unload(pooled)
+            else:
+                self._evict()
+
+    @contextlib.contextmanager
+    def lease(self, model_name: str) -> Iterator[PooledModel]:
+        """ The pooled model (see get) for the generation calls in the context """
+        pooled = self.get(model_name)
+        try:
+            yield pooled
+        finally:
+            self.put_back(pooled)
+
+    def add(self, pooled: PooledModel):
+        """ Add a loaded model and evict the others, while the budget is exceeded """
+        with self._lock:
+            self.models[pooled.model_name] = pooled
+            self.known_sizes[pooled.model_name] = pooled.memory_bytes
+            self._evict()
+
+    def evict(self, model_name: str):
+        """ Remove a model from the pool and free its memory (once it is no longer leased) """
+        with self._lock:
+            pooled = self.models.pop(model_name)
+            if pooled.leases > 0:
+                logger.info(f"Unloading {model_name} once it is no longer in use")
+                return
+            self._unload(pooled)
+
+    def _unload(self, pooled: PooledModel):
+        logger.info(f"Unloading {pooled.model_name} ({pooled.memory_bytes / 2 ** 30:.1f} GiB)")
+        pooled.release()
+        del pooled
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def clear(self):
+        for model_name in list(self.models):
+            self.evict(model_name)
+
+    def model_names(self) -> List[str]:
+        """ :return: the loaded models, least recently used first """
+        return list(self.models)
+
+    def _evict(self, reserved: int = 0):
+        # the most recently used model stays, even if it exceeds the budget on its own; the leased models stay as well
+        candidates = list(self.models) if reserved else list(self.models)[:-1]
+        for model_name in candidates:
+            if self.memory_bytes + reserved <= self.memory_budget:
+                break
+            if self.models[model_name].leases == 0:
+                self.evict(model_name)
+
+    def _warn_reload(self, model_name: str):
+        if model_name in self.reloaded:
+            return
+        self.reloaded.add(model_name)
+        logger.warning(f"Loading {model_name} again: the memory budget ({self.memory_budget / 2 ** 30:.1f} GiB) does "
+                       f"not fit it together with {', '.join(self.models) or 'no other model'}. If the models take "
+                       f"turns (e.g. a cross-play pair), their weights are loaded again in every turn; raise "
+                       f"models.memory_budget to keep them loaded.")
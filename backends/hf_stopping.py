@@ -0,0 +1,36 @@
+""" The stop conditions of the players (see backends.StopConditions) as stopping criteria of HuggingFace generation.
+
+The generated tokens are decoded after each step and the generation ends as soon as the text is complete, e.g. after
+the first line of a single-line answer, instead of running on until max_new_tokens or an end-of-sequence token.
+"""
+from typing import List
+
+import torch
+import transformers
+
+import backends
+
+
+def is_complete(stop_conditions: backends.StopConditions, tokenizer, output_ids: List[int]) -> bool:
+    """
+    :param output_ids: the generated token ids (without the prompt)
+    :return: True, if the decoded text fulfills one of the stop conditions
+    """
+    text = tokenizer.decode(output_ids, skip_special_tokens=True)
+    return stop_conditions.find_end(text) is not None
+
+
+class StopConditionsCriteria(transformers.StoppingCriteria):
+
+    def __init__(self, stop_conditions: backends.StopConditions, tokenizer, prompt_length: int):
+        """
+        :param stop_conditions: when the response is complete
+        :param tokenizer: to decode the generated tokens
+        :param prompt_length: the number of prompt tokens before the generated ones
+        """
+        self.stop_conditions = stop_conditions
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> bool:
+        return is_complete(self.stop_conditions, self.tokenizer, input_ids[0, self.prompt_length:].tolist())
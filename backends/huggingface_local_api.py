@@ -1,12 +1,13 @@
 """ Backend using HuggingFace transformers & ungated models. Uses HF tokenizers instruct/chat templates for proper input format per model. """
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Optional
 import torch
 import backends
+from backends import hf_batch, hf_cpu, hf_loading, hf_model_pool, hf_stopping, hf_kv_cache
 
 import transformers
 from transformers import AutoTokenizer, AutoModelForCausalLM
-import os
 import copy
+import time
 
 logger = backends.get_logger(__name__)
 
@@ -88,6 +89,41 @@ SUSTECH = [MODEL_SUS_CHAT_34B]
 sus_template = "{% for message in messages %}{% if message['role'] == 'user' %}{{ '### Human: ' + message['content'] + '\\n\\n' }}{% elif message['role'] == 'assistant' %}{{ '### Assistant: ' + message['content'] }}{% endif %}{% if loop.last %}{{ '### Assistant: ' }}{% endif %}{% endfor %}"
 
 
+# the HuggingFace users/organisations that host the models:
+HF_USER_PREFIXES = [
+    ("mistralai/", [MODEL_MISTRAL_7B_INSTRUCT_V0_1, MODEL_MIXTRAL_8X7B_INSTRUCT_V0_1]),
+    ("Riiid/", [MODEL_RIIID_SHEEP_DUCK_LLAMA_2_70B_V1_1, MODEL_RIIID_SHEEP_DUCK_LLAMA_2_13B]),
+    ("tiiuae/", [MODEL_FALCON_7B_INSTRUCT, MODEL_FALCON_40B_INSTRUCT]),
+    ("OpenAssistant/", [MODEL_OPEN_ASSISTANT_12B]),
+    ("TheBloke/", [MODEL_KOALA_13B, MODEL_WIZARD_VICUNA_13B]),
+    ("google/", [MODEL_GOOGLE_FLAN_T5]),
+    ("WizardLM/", [MODEL_WIZARDLM_70B_V1, MODEL_WIZARDLM_13B_V1_2]),
+    ("lmsys/", [MODEL_LMSYS_VICUNA_7B, MODEL_LMSYS_VICUNA_13B, MODEL_LMSYS_VICUNA_33B]),
+    ("nomic-ai/", [MODEL_GPT4ALL_13B_SNOOZY]),
+    ("codellama/", [MODEL_CODELLAMA_34B_I]),
+    ("HuggingFaceH4/", [MODEL_ZEPHYR_7B_ALPHA, MODEL_ZEPHYR_7B_BETA]),
+    ("openchat/", [MODEL_OPENCHAT_3_5]),
+    ("01-ai/", [MODEL_YI_34B_CHAT]),
+    ("microsoft/", [MODEL_ORCA_2_13B]),
+    ("deepseek-ai/", [MODEL_DEEPSEEK_7B_CHAT, MODEL_DEEPSEEK_67B_CHAT]),
+    ("allenai/", [MODEL_TULU_2_DPO_7B, MODEL_TULU_2_DPO_70B]),
+    ("SUSTech/", [MODEL_SUS_CHAT_34B]),
+]
+
+# the custom chat templates of the models that do not come with a proper one (see PREMADE_CHAT_TEMPLATE):
+CUSTOM_CHAT_TEMPLATES = [
+    (ORCA_HASH, orca_template),
+    (FALCON, falcon_template),
+    (OASST, oasst_template),
+    (KOALA, koala_template),
+    (VICUNA, vicuna_1_1_template),
+    (OPENCHAT, openchat_template),
+    (CHATML, chatml_template),
+    (TULU, tulu_template),
+    (DEEPSEEK, deepseek_template),
+    (SUSTECH, sus_template),
+]
+
 # templates currently have 'generation prompt' hardcoded
 # doesn't matter for clembench, but once added, templates can be pushed to HF and this block can be reduced
 # newer versions of transformers/tokenizers are supposed to properly handle the generation prompt argument
@@ -97,103 +133,121 @@ sus_template = "{% for message in messages %}{% if message['role'] == 'user' %}{
 SLOW_TOKENIZER = [MODEL_YI_34B_CHAT, MODEL_ORCA_2_13B, MODEL_SUS_CHAT_34B]
 
 
+# end-of-sequence strings of the chat templates, which some tokenizers do not treat as special tokens (so that
+# skip_special_tokens keeps them in the decoded response); the tokenizer's own EOS token is always culled:
+TEMPLATE_EOS = [
+    (OPENCHAT, ["<|end_of_turn|>"]),
+    (CHATML, ["<|im_end|>"]),
+    (DEEPSEEK, ["<｜end▁of▁sentence｜>"]),
+    (SUSTECH, ["<|endoftext|>"]),
+    (OASST, ["<|endoftext|>"]),
+]
+# llama2 EOS token, for the models with the other templates:
+DEFAULT_EOS = ["</s>"]
+
+
+def get_eos_strings(model_name: str) -> List[str]:
+    """
+    :return: the end-of-sequence strings of the model's chat template
+    """
+    for template_models, eos_strings in TEMPLATE_EOS:
+        if model_name in template_models:
+            return eos_strings
+    return DEFAULT_EOS
+
+
+def get_hf_model_id(model_name: str) -> str:
+    """
+    :return: the id of the model on the HuggingFace hub
+    """
+    for hf_user_prefix, models in HF_USER_PREFIXES:
+        if model_name in models:
+            return f"{hf_user_prefix}{model_name}"
+    raise ValueError(f"No HuggingFace user known for {model_name}")
+
+
+def get_chat_template(model_name: str) -> Optional[str]:
+    """
+    :return: the custom chat template of the model; None, if its tokenizer's template is used
+    """
+    if model_name in PREMADE_CHAT_TEMPLATE:
+        return None
+    for template_models, chat_template in CUSTOM_CHAT_TEMPLATES:
+        if model_name in template_models:
+            return chat_template
+    return None
+
+
+def cull_eos_tokens(response_text: str, eos_strings: List[str]) -> str:
+    """
+    :return: the response text without an EOS string at its end
+    """
+    for eos_string in eos_strings:
+        if eos_string and response_text.endswith(eos_string):
+            return response_text[:-len(eos_string)]
+    return response_text
+
+
 class HuggingfaceLocal(backends.Backend):
+    supports_stop_conditions = True
+
     def __init__(self):
         self.temperature: float = -1.
-        self.model_loaded = False
-
-    def load_model(self, model_name):
+        # reuse the keys and values of the recent conversations and initial prompts (see hf_kv_cache):
+        self.use_kv_cache: bool = True
+        # decode the calls of concurrent threads (e.g. episodes) in continuous batches of up to this size (0: off):
+        self.engine_batch_size: int = 0
+        # the loaded models (e.g. both of a cross-play pair), unloaded in least recently used order when their weights
+        # exceed the memory budget (set models.memory_budget in bytes; default: see hf_model_pool):
+        self.models = hf_model_pool.ModelPool(self.load_model)
+        # how the models are loaded and run on nodes without GPUs (see hf_cpu), by model name:
+        self.cpu_options: Dict[str, hf_cpu.CPUOptions] = {}
+        self.default_cpu_options = hf_cpu.CPUOptions()
+        # the load time and peak RSS of the last load of each model (see hf_loading.load_metrics):
+        self.load_metrics: Dict[str, Dict] = {}
+
+    def load_model(self, model_name) -> hf_model_pool.PooledModel:
         logger.info(f'Start loading huggingface model: {model_name}')
+        start = time.perf_counter()
 
-        # model cache handling
-        root_data_path = os.path.join(os.path.abspath(os.sep), "data")
-        # check if root/data exists:
-        if not os.path.isdir(root_data_path):
-            logger.info(f"{root_data_path} does not exist, creating directory.")
-            # create root/data:
-            os.mkdir(root_data_path)
-        CACHE_DIR = os.path.join(root_data_path, "huggingface_cache")
-
-        if model_name in [MODEL_MISTRAL_7B_INSTRUCT_V0_1, MODEL_MIXTRAL_8X7B_INSTRUCT_V0_1]:  # mistralai models
-            hf_user_prefix = "mistralai/"
-        elif model_name in [MODEL_RIIID_SHEEP_DUCK_LLAMA_2_70B_V1_1,
-                            MODEL_RIIID_SHEEP_DUCK_LLAMA_2_13B]:  # Riiid models
-            hf_user_prefix = "Riiid/"
-        elif model_name in [MODEL_FALCON_7B_INSTRUCT, MODEL_FALCON_40B_INSTRUCT]:  # tiiuae models
-            hf_user_prefix = "tiiuae/"
-        elif model_name in [MODEL_OPEN_ASSISTANT_12B]:  # OpenAssistant models
-            hf_user_prefix = "OpenAssistant/"
-        elif model_name in [MODEL_KOALA_13B, MODEL_WIZARD_VICUNA_13B]:  # TheBloke models
-            hf_user_prefix = "TheBloke/"
-        elif model_name in [MODEL_GOOGLE_FLAN_T5]:  # Google models
-            hf_user_prefix = "google/"
-        elif model_name in [MODEL_WIZARDLM_70B_V1, MODEL_WIZARDLM_13B_V1_2]:  # WizardLM models
-            hf_user_prefix = "WizardLM/"
-        elif model_name in [MODEL_LMSYS_VICUNA_7B, MODEL_LMSYS_VICUNA_13B, MODEL_LMSYS_VICUNA_33B]:  # lmsys models
-            hf_user_prefix = "lmsys/"
-        elif model_name in [MODEL_GPT4ALL_13B_SNOOZY]:  # nomic-ai models
-            hf_user_prefix = "nomic-ai/"
-        elif model_name in [MODEL_CODELLAMA_34B_I]:  # codellama models
-            hf_user_prefix = "codellama/"
-        elif model_name in [MODEL_ZEPHYR_7B_ALPHA, MODEL_ZEPHYR_7B_BETA]:  # HuggingFaceH4 models
-            hf_user_prefix = "HuggingFaceH4/"
-        elif model_name in [MODEL_OPENCHAT_3_5]:  # openchat models
-            hf_user_prefix = "openchat/"
-        elif model_name in [MODEL_YI_34B_CHAT]:  # 01-ai models
-            hf_user_prefix = "01-ai/"
-        elif model_name in [MODEL_ORCA_2_13B]:  # microsoft models
-            hf_user_prefix = "microsoft/"
-        elif model_name in [MODEL_DEEPSEEK_7B_CHAT, MODEL_DEEPSEEK_67B_CHAT]:  # deepseek-ai models
-            hf_user_prefix = "deepseek-ai/"
-        elif model_name in [MODEL_TULU_2_DPO_7B, MODEL_TULU_2_DPO_70B]:  # allenai models
-            hf_user_prefix = "allenai/"
-        elif model_name in [MODEL_SUS_CHAT_34B]:  # SUSTech models
-            hf_user_prefix = "SUSTech/"
-
-        hf_model_str = f"{hf_user_prefix}{model_name}"
+        hf_model_str = get_hf_model_id(model_name)
+        # memory-mapped safetensors, no initialized weights before loading and the configured cache (see hf_loading):
+        model_kwargs = hf_loading.model_kwargs()
 
         # use 'slow' tokenizer for models that require it:
         if model_name in SLOW_TOKENIZER:
-            self.tokenizer = AutoTokenizer.from_pretrained(hf_model_str, device_map="auto", torch_dtype="auto",
-                                                           cache_dir=CACHE_DIR, verbose=False, use_fast=False)
+            tokenizer = AutoTokenizer.from_pretrained(hf_model_str, device_map="auto", torch_dtype="auto",
+                                                      cache_dir=model_kwargs["cache_dir"], verbose=False,
+                                                      use_fast=False)
         else:
-            self.tokenizer = AutoTokenizer.from_pretrained(hf_model_str, device_map="auto", torch_dtype="auto",
-                                                           cache_dir=CACHE_DIR, verbose=False)
+            tokenizer = AutoTokenizer.from_pretrained(hf_model_str, device_map="auto", torch_dtype="auto",
+                                                      cache_dir=model_kwargs["cache_dir"], verbose=False)
 
         # apply proper chat template:
-        if model_name not in PREMADE_CHAT_TEMPLATE:
-            if model_name in ORCA_HASH:
-                self.tokenizer.chat_template = orca_template
-            elif model_name in FALCON:
-                self.tokenizer.chat_template = falcon_template
-            elif model_name in OASST:
-                self.tokenizer.chat_template = oasst_template
-            elif model_name in KOALA:
-                self.tokenizer.chat_template = koala_template
-            elif model_name in VICUNA:
-                self.tokenizer.chat_template = vicuna_1_1_template
-            elif model_name in OPENCHAT:
-                self.tokenizer.chat_template = openchat_template
-            elif model_name in CHATML:
-                self.tokenizer.chat_template = chatml_template
-            elif model_name in TULU:
-                self.tokenizer.chat_template = tulu_template
-            elif model_name in DEEPSEEK:
-                self.tokenizer.chat_template = deepseek_template
-            elif model_name in SUSTECH:
-                self.tokenizer.chat_template = sus_template
-
-
-        # load all models using their default configuration:
-        self.model = AutoModelForCausalLM.from_pretrained(hf_model_str, device_map="auto", torch_dtype="auto",
-                                                          cache_dir=CACHE_DIR)
-
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model_name = model_name
-        self.model_loaded = True
+        chat_template = get_chat_template(model_name)
+        if chat_template is not None:
+            tokenizer.chat_template = chat_template
+
+        # load all models using their default configuration (on CPUs, in bfloat16 or int8 according to their options):
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        cpu_options = None
+        torch_dtype = "auto"
+        if device == "cpu":
+            cpu_options = self.cpu_options.get(model_name, self.default_cpu_options)
+            torch_dtype = hf_cpu.torch_dtype(cpu_options)
+        model = AutoModelForCausalLM.from_pretrained(hf_model_str, device_map="auto", torch_dtype=torch_dtype,
+                                                     **model_kwargs)
+        if cpu_options is not None:
+            model = hf_cpu.optimize(model, cpu_options)
+
+        self.load_metrics[model_name] = hf_loading.load_metrics(start)
+        logger.info(f"Finished loading huggingface model: {model_name} ({self.load_metrics[model_name]})")
+        logger.info(f"Model device map: {model.hf_device_map}")
+        return hf_model_pool.PooledModel(model_name, model, tokenizer, device, cpu_options)
 
     def generate_response(self, messages: List[Dict], model: str,
-                          max_new_tokens: int = 100, return_full_text: bool = False) -> Tuple[Any, Any, str]:
+                          max_new_tokens: int = 100, return_full_text: bool = False,
+                          stop_conditions: backends.StopConditions = None) -> Tuple[Any, Any, str]:
         """
         :param messages: for example
                 [
@@ -205,16 +259,128 @@ class HuggingfaceLocal(backends.Backend):
         :param model: model name
         :param max_new_tokens: How many tokens to generate ('at most', but no stop sequence is defined).
         :param return_full_text: If True, whole input context is returned.
+        :param stop_conditions: when the response is complete (the generation stops there and the rest is cut off)
         :return: the continuation
         """
         assert 0.0 <= self.temperature <= 1.0, "Temperature must be in [0.,1.]"
 
-        # load the model to the memory
-        if not self.model_loaded:
-            self.load_model(model)
-            logger.info(f"Finished loading huggingface model: {model}")
-            logger.info(f"Model device map: {self.model.hf_device_map}")
+        # load the model to the memory (if it is not in the pool yet); it is not unloaded while it generates
+        with self.models.lease(model) as pooled:
+            current_messages = self._prepare_messages(messages)
+
+            # apply chat template & tokenize (the prompt text is logged as is, instead of decoding the tokens again):
+            prompt_text = pooled.tokenizer.apply_chat_template(current_messages, tokenize=False)
+            prompt_tokens = pooled.tokenizer.encode(prompt_text, add_special_tokens=False, return_tensors="pt")
+            prompt_tokens = prompt_tokens.to(pooled.device)
+
+            prompt = {"inputs": prompt_text, "max_new_tokens": max_new_tokens,
+                      "temperature": self.temperature, "return_full_text": return_full_text}
+            if stop_conditions is not None:
+                prompt["stop_conditions"] = stop_conditions.to_dict()
+
+            # greedy decoding:
+            do_sample: bool = False
+            if self.temperature > 0.0:
+                do_sample = True
+
+            # test to check if temperature is properly set on this Backend object:
+            # logger.info(f"Currently used temperature for this instance of HuggingfaceLocal: {self.temperature}")
+
+            if self.engine_batch_size > 0:
+                # decode together with the concurrent calls (the engine keeps its own keys and values):
+                is_complete = None
+                if stop_conditions is not None:
+                    def is_complete(output_ids):
+                        return hf_stopping.is_complete(stop_conditions, pooled.tokenizer, output_ids)
+                engine = pooled.get_engine(self.engine_batch_size)
+                continuation = engine.generate(prompt_tokens[0].tolist(), max_new_tokens, self.temperature, is_complete)
+                cached_length = 0
+            else:
+                stopping_criteria = transformers.StoppingCriteriaList()
+                if stop_conditions is not None:
+                    stopping_criteria.append(hf_stopping.StopConditionsCriteria(stop_conditions, pooled.tokenizer,
+                                                                                prompt_tokens.shape[1]))
+                with hf_cpu.inference_context(pooled.cpu_options):
+                    model_output_ids, cached_length = self._generate(pooled, current_messages, prompt_tokens,
+                                                                     max_new_tokens, do_sample, stopping_criteria)
+                continuation = model_output_ids[0, prompt_tokens.shape[1]:].tolist()
+
+            response, response_text = self._decode_response(pooled, prompt_text, continuation, return_full_text)
+            response['cached_prompt_tokens'] = cached_length
+            if stop_conditions is not None and not return_full_text:
+                response_text = stop_conditions.truncate(response_text).strip()
+
+            return prompt, response, response_text
+
+    def _decode_response(self, pooled: hf_model_pool.PooledModel, prompt_text: str, continuation: List[int],
+                         return_full_text: bool) -> Tuple[Dict, str]:
+        """
+        Only the generated tokens are decoded; the prompt is not decoded again and cut off the output text.
+        :param prompt_text: the prompt as rendered by the chat template
+        :param continuation: the generated token ids
+        :return: the response object (the prompt text and the raw continuation) and the response text
+        """
+        model_output = prompt_text + pooled.tokenizer.decode(continuation)
+        response = {'response': model_output}
+        if not return_full_text:
+            response_text = pooled.tokenizer.decode(continuation, skip_special_tokens=True).strip()
+            response_text = cull_eos_tokens(response_text,
+                                            get_eos_strings(pooled.model_name) + [pooled.tokenizer.eos_token])
+        else:
+            response_text = model_output.strip()
+        return response, response_text
+
+    def _generate(self, pooled: hf_model_pool.PooledModel, current_messages: List[Dict], prompt_tokens: torch.Tensor,
+                  max_new_tokens: int, do_sample: bool,
+                  stopping_criteria: transformers.StoppingCriteriaList) -> Tuple[torch.Tensor, int]:
+        """
+        :return: the prompt and generated token ids, and the number of prompt tokens with reused keys and values
+        """
+        # reuse the keys and values of the conversation so far (only the new tokens are prefilled);
+        # the initial prompt of a conversation may share its instructions with those of previous episodes:
+        initial_prompt = all(message['role'] != "assistant" for message in current_messages)
+        cached_length, past_key_values = 0, None
+        if self.use_kv_cache:
+            cache = pooled.prefix_cache if initial_prompt else pooled.kv_cache
+            cached_length, past_key_values = cache.lookup(prompt_tokens[0].tolist())
+            logger.debug(f"Reusing the cached keys and values of {cached_length} of {prompt_tokens.shape[1]} "
+                         f"prompt tokens")
 
+        if do_sample:
+            model_outputs = pooled.model.generate(
+                prompt_tokens,
+                temperature=self.temperature,
+                max_new_tokens=max_new_tokens,
+                do_sample=do_sample,
+                past_key_values=past_key_values,
+                stopping_criteria=stopping_criteria,
+                return_dict_in_generate=True
+            )
+        else:
+            model_outputs = pooled.model.generate(
+                prompt_tokens,
+                max_new_tokens=max_new_tokens,
+                do_sample=do_sample,
+                past_key_values=past_key_values,
+                stopping_criteria=stopping_criteria,
+                return_dict_in_generate=True
+            )
+        model_output_ids = model_outputs.sequences
+
+        if self.use_kv_cache:
+            # the keys and values of the last generated token are not computed
+            output_past = hf_kv_cache.to_legacy_cache(model_outputs.past_key_values)
+            output_past_length = hf_kv_cache.past_length(output_past)
+            pooled.kv_cache.store(model_output_ids[0, :output_past_length].tolist(), output_past)
+            if initial_prompt:
+                pooled.prefix_cache.store(prompt_tokens[0].tolist(), output_past)
+        return model_output_ids, cached_length
+
+    def _prepare_messages(self, messages: List[Dict]) -> List[Dict]:
+        """
+        :return: a copy of the messages without an empty system message and with consecutive messages of the same
+                 role flattened
+        """
         # log current given messages list:
         # logger.info(f"Raw messages passed: {messages}")
 
@@ -237,69 +403,82 @@ class HuggingfaceLocal(backends.Backend):
 
         # log current flattened messages list:
         # logger.info(f"Flattened messages: {current_messages}")
+        return current_messages
 
-        # apply chat template & tokenize:
-        prompt_tokens = self.tokenizer.apply_chat_template(current_messages, return_tensors="pt")
-        prompt_tokens = prompt_tokens.to(self.device)
-
-        prompt_text = self.tokenizer.batch_decode(prompt_tokens)[0]
-        prompt = {"inputs": prompt_text, "max_new_tokens": max_new_tokens,
-                  "temperature": self.temperature, "return_full_text": return_full_text}
-
-        # greedy decoding:
-        do_sample: bool = False
-        if self.temperature > 0.0:
-            do_sample = True
-
-        # test to check if temperature is properly set on this Backend object:
-        # logger.info(f"Currently used temperature for this instance of HuggingfaceLocal: {self.temperature}")
-
-        if do_sample:
-            model_output_ids = self.model.generate(
-                prompt_tokens,
-                temperature=self.temperature,
-                max_new_tokens=max_new_tokens,
-                do_sample=do_sample
-            )
-        else:
-            model_output_ids = self.model.generate(
-                prompt_tokens,
-                max_new_tokens=max_new_tokens,
-                do_sample=do_sample
-            )
-
-        model_output = self.tokenizer.batch_decode(model_output_ids)[0]
-
-        response = {'response': model_output}
-
-        # cull input context; equivalent to transformers.pipeline method:
-        if not return_full_text:
-            response_text = model_output.replace(prompt_text, '').strip()
-
-            # handle Yi decoded output mismatch:
-            if model == MODEL_YI_34B_CHAT:
-                response_text = model_output.rsplit("assistant\n", maxsplit=1)[1]
-
-            # remove llama2 EOS token at the end of output:
-            if response_text[-4:len(response_text)] == "</s>":
-                response_text = response_text[:-4]
-            # remove openchat EOS token at the end of output:
-            if response_text[-15:len(response_text)] == "<|end_of_turn|>":
-                response_text = response_text[:-15]
-            # remove ChatML EOS token at the end of output:
-            if response_text[-10:len(response_text)] == "<|im_end|>":
-                response_text = response_text[:-10]
-            # remove DeepSeek EOS token at the end of output:
-            if response_text[-19:len(response_text)] == "<｜end▁of▁sentence｜>":
-                response_text = response_text[:-19]
-            # remove SUS EOS token at the end of output:
-            if response_text[-13:len(response_text)] == "<|endoftext|>":
-                response_text = response_text[:-13]
-
-        else:
-            response_text = model_output.strip()
+    def generate_batch(self, list_of_messages: List[List[Dict]], model: str,
+                       max_new_tokens: int = 100, return_full_text: bool = False) -> List[Tuple[Any, Any, str]]:
+        """
+        Generate the responses to several message lists in one batch. The prompts are left-padded and the
+        continuation of each sequence is sliced off by token length. The cached keys and values are not used.
+        :param list_of_messages: message lists as passed to generate_response
+        :param model: model name
+        :param max_new_tokens: How many tokens to generate ('at most', but no stop sequence is defined).
+        :param return_full_text: If True, whole input context is returned.
+        :return: the (prompt, response, response text) triples of generate_response, in the order of the messages
+        """
+        assert 0.0 <= self.temperature <= 1.0, "Temperature must be in [0.,1.]"
 
-        return prompt, response, response_text
+        # load the model to the memory (if it is not in the pool yet); it is not unloaded while it generates
+        with self.models.lease(model) as pooled:
+            prompts_text = [pooled.tokenizer.apply_chat_template(self._prepare_messages(messages), tokenize=False)
+                            for messages in list_of_messages]
+            prompts_tokens = [pooled.tokenizer.encode(prompt_text, add_special_tokens=False)
+                              for prompt_text in prompts_text]
+            pad_token_id = hf_batch.pad_token_id(pooled.tokenizer)
+            input_ids, attention_mask = hf_batch.left_pad(prompts_tokens, pad_token_id)
+
+            # greedy decoding:
+            do_sample: bool = False
+            if self.temperature > 0.0:
+                do_sample = True
+
+            with hf_cpu.inference_context(pooled.cpu_options):
+                if do_sample:
+                    model_output_ids = pooled.model.generate(
+                        input_ids.to(pooled.device),
+                        attention_mask=attention_mask.to(pooled.device),
+                        temperature=self.temperature,
+                        max_new_tokens=max_new_tokens,
+                        do_sample=do_sample,
+                        pad_token_id=pad_token_id
+                    )
+                else:
+                    model_output_ids = pooled.model.generate(
+                        input_ids.to(pooled.device),
+                        attention_mask=attention_mask.to(pooled.device),
+                        max_new_tokens=max_new_tokens,
+                        do_sample=do_sample,
+                        pad_token_id=pad_token_id
+                    )
+            continuations = hf_batch.continuations(model_output_ids, input_ids.shape[1],
+                                                   pooled.model.generation_config.eos_token_id)
+
+            results = []
+            for prompt_text, continuation in zip(prompts_text, continuations):
+                prompt = {"inputs": prompt_text, "max_new_tokens": max_new_tokens,
+                          "temperature": self.temperature, "return_full_text": return_full_text}
+                response, response_text = self._decode_response(pooled, prompt_text, continuation, return_full_text)
+                response['cached_prompt_tokens'] = 0
+                results.append((prompt, response, response_text))
+            return results
+
+    def end_episode(self):
+        """ The conversations of an episode are not continued in the next one (but its initial prompts are kept) """
+        for pooled in self.models:
+            if len(pooled.kv_cache):
+                logger.info(f"KV cache of {pooled.model_name}: {pooled.kv_cache.stats()}")
+            if pooled.prefix_cache.lookups:
+                logger.info(f"Prefix cache of {pooled.model_name}: {pooled.prefix_cache.stats()}")
+            pooled.kv_cache.clear()
+            if pooled.engine is not None:
+                logger.info(f"Generation engine of {pooled.model_name}: {pooled.engine.stats()}")
+
+    def prewarm(self, model_name: str):
+        if model_name not in self.models:
+            hf_loading.prewarm(get_hf_model_id(model_name))
+
+    def get_load_metrics(self, model_name: str) -> Dict:
+        return self.load_metrics.get(model_name, {})
 
     def supports(self, model_name: str):
         return model_name in SUPPORTED_MODELS
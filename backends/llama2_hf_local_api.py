@@ -3,10 +3,11 @@
 from typing import List, Dict, Tuple, Any, Optional
 import torch
 import backends
+from backends import hf_batch, hf_loading
 import transformers
 from transformers import AutoTokenizer, AutoModelForCausalLM
-import os
 import copy
+import time
 
 logger = backends.get_logger(__name__)
 
@@ -23,6 +24,13 @@ SUPPORTED_MODELS = [MODEL_LLAMA2_7B_HF, MODEL_LLAMA2_13B_HF, MODEL_LLAMA2_70B_HF
 NAME = "llama2-hf"
 
 
+def get_hf_model_id(model_name: str) -> str:
+    """
+    :return: the full id of the model on the HuggingFace hub
+    """
+    return f"meta-llama/{model_name.capitalize()}"
+
+
 class Llama2LocalHF(backends.Backend):
     def __init__(self):
         # load HF API key:
@@ -32,35 +40,31 @@ class Llama2LocalHF(backends.Backend):
         self.chat_models: List = [MODEL_LLAMA2_7B_C_HF, MODEL_LLAMA2_13B_C_HF, MODEL_LLAMA2_70B_C_HF]
         self.temperature: float = -1.
         self.model_loaded: bool = False
+        # the load time and peak RSS of the loaded model (see hf_loading.load_metrics):
+        self.load_metrics: Dict = {}
 
     def load_model(self, model_name: str):
         assert model_name in SUPPORTED_MODELS, f"{model_name} is not supported, please make sure the model name is correct."
         logger.info(f'Start loading llama2-hf model: {model_name}')
+        start = time.perf_counter()
 
-        # model cache handling
-        root_data_path = os.path.join(os.path.abspath(os.sep), "data")
-        # check if root/data exists:
-        if not os.path.isdir(root_data_path):
-            logger.info(f"{root_data_path} does not exist, creating directory.")
-            # create root/data:
-            os.mkdir(root_data_path)
-        CACHE_DIR = os.path.join(root_data_path, "huggingface_cache")
-
-        # full HF model id string:
-        hf_id_str = f"meta-llama/{model_name.capitalize()}"
+        # memory-mapped safetensors, no initialized weights before loading and the configured cache (see hf_loading):
+        model_kwargs = hf_loading.model_kwargs()
         # load tokenizer and model:
-        self.tokenizer = AutoTokenizer.from_pretrained(hf_id_str, token=self.api_key, device_map="auto",
-                                                       cache_dir=CACHE_DIR, verbose=False)
-        self.model = AutoModelForCausalLM.from_pretrained(hf_id_str, token=self.api_key,
-                                                          torch_dtype="auto", device_map="auto",
-                                                          cache_dir=CACHE_DIR)
+        self.tokenizer = AutoTokenizer.from_pretrained(get_hf_model_id(model_name), token=self.api_key,
+                                                       device_map="auto", cache_dir=model_kwargs["cache_dir"],
+                                                       verbose=False)
+        self.model = AutoModelForCausalLM.from_pretrained(get_hf_model_id(model_name), token=self.api_key,
+                                                          torch_dtype="auto", device_map="auto", **model_kwargs)
         # use CUDA if available:
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.model_name = model_name
         self.model_loaded = True
+        self.load_metrics = hf_loading.load_metrics(start)
+        logger.info(f"Load metrics of {model_name}: {self.load_metrics}")
 
     def generate_response(self, messages: List[Dict], model: str,
-                          max_new_tokens: Optional[int] = 100, top_p: float = 0.9) -> Tuple[str, Any, str]:
+                          max_new_tokens: Optional[int] = 100, top_p: float = 0.9) -> Tuple[Any, Any, str]:
         """
         :param messages: for example
                 [
@@ -75,21 +79,56 @@ class Llama2LocalHF(backends.Backend):
         :return: the continuation
         """
         assert 0.0 <= self.temperature <= 1.0, "Temperature must be in [0.,1.]"
+        self._ensure_model_loaded(model)
+
+        prompt, prompt_tokens = self._prepare_prompt(messages, model, max_new_tokens)
+        input_ids = torch.tensor([prompt_tokens], dtype=torch.long)
+        model_output_ids = self._generate(input_ids, torch.ones_like(input_ids), max_new_tokens, top_p,
+                                          hf_batch.pad_token_id(self.tokenizer))
+        continuation = model_output_ids[0, len(prompt_tokens):].tolist()
+        response, response_text = self._decode_response(prompt, continuation, model)
+        return prompt, response, response_text
 
+    def generate_batch(self, list_of_messages: List[List[Dict]], model: str,
+                       max_new_tokens: Optional[int] = 100, top_p: float = 0.9) -> List[Tuple[Any, Any, str]]:
+        """
+        Generate the responses to several message lists in one batch. The prompts are left-padded and the
+        continuation of each sequence is sliced off by token length.
+        :param list_of_messages: message lists as passed to generate_response
+        :param model: model name, chat models for chat-completion, otherwise text completion
+        :param max_new_tokens: Maximum generation length.
+        :param top_p: Top-P sampling parameter. Only applies when do_sample=True.
+        :return: the (prompt, response, response text) triples of generate_response, in the order of the messages
+        """
+        assert 0.0 <= self.temperature <= 1.0, "Temperature must be in [0.,1.]"
+        self._ensure_model_loaded(model)
+
+        prompts, prompts_tokens = zip(*[self._prepare_prompt(messages, model, max_new_tokens)
+                                        for messages in list_of_messages])
+        pad_token_id = hf_batch.pad_token_id(self.tokenizer)
+        input_ids, attention_mask = hf_batch.left_pad(prompts_tokens, pad_token_id)
+        model_output_ids = self._generate(input_ids, attention_mask, max_new_tokens, top_p, pad_token_id)
+        continuations = hf_batch.continuations(model_output_ids, input_ids.shape[1],
+                                               self.model.generation_config.eos_token_id)
+
+        results = []
+        for prompt, continuation in zip(prompts, continuations):
+            response, response_text = self._decode_response(prompt, continuation, model)
+            results.append((prompt, response, response_text))
+        return results
+
+    def _ensure_model_loaded(self, model: str):
         # load the model to the memory
         if not self.model_loaded:
             self.load_model(model)
             logger.info(f"Finished loading llama2-hf model: {model}")
             logger.info(f"Model device map: {self.model.hf_device_map}")
 
-        # greedy decoding:
-        do_sample: bool = False
-        if self.temperature > 0.0:
-            do_sample = True
-
-        # turn off redundant transformers warnings:
-        transformers.logging.set_verbosity_error()
-
+    def _prepare_prompt(self, messages: List[Dict], model: str, max_new_tokens: int) -> Tuple[Any, List[int]]:
+        """
+        :return: the prompt (the inputs as rendered by the chat template for chat models, otherwise the text of the
+                 messages) and its token ids
+        """
         # deepcopy messages to prevent reference issues:
         current_messages = copy.deepcopy(messages)
 
@@ -103,72 +142,71 @@ class Llama2LocalHF(backends.Backend):
                     current_messages[msg_idx - 1]['content'] += f" {message['content']}"
                     del current_messages[msg_idx]
 
-            # apply chat template & tokenize
-            prompt_tokens = self.tokenizer.apply_chat_template(current_messages, return_tensors="pt")
-            prompt_tokens = prompt_tokens.to(self.device)
-            # apply chat template for records:
-            prompt_text = self.tokenizer.batch_decode(prompt_tokens)[0]
+            # apply chat template & tokenize (the prompt text is logged as is, instead of decoding the tokens again):
+            prompt_text = self.tokenizer.apply_chat_template(current_messages, tokenize=False)
+            prompt_tokens = self.tokenizer.encode(prompt_text, add_special_tokens=False)
             prompt = {"inputs": prompt_text, "max_new_tokens": max_new_tokens,
                       "temperature": self.temperature}
-
-            if do_sample:
-                model_output_ids = self.model.generate(
-                    prompt_tokens,
-                    do_sample=do_sample,
-                    max_new_tokens=max_new_tokens,
-                    temperature=self.temperature,
-                    top_p=top_p
-                )
-            else:
-                model_output_ids = self.model.generate(
-                    prompt_tokens,
-                    do_sample=do_sample,
-                    max_new_tokens=max_new_tokens
-                )
-
-            model_output = self.tokenizer.batch_decode(model_output_ids)[0]
-
-            response = {"response": model_output}
-
-            # cull prompt from output:
-            response_text = model_output.replace(prompt_text, "").strip()
-            # remove EOS token at the end of output:
-            if response_text[-4:len(response_text)] == "</s>":
-                response_text = response_text[:-4]
-
-
-
         else:  # default (text completion)
             prompt = "\n".join([message["content"] for message in current_messages])
+            # add_bos_token=True, add_eos_token=False:
+            prompt_tokens = [self.tokenizer.bos_token_id] + self.tokenizer.encode(prompt, add_special_tokens=False)
+        return prompt, prompt_tokens
 
-            prompt_tokens = self.tokenizer.encode(
-                prompt,
-                add_bos_token=True,
-                add_eos_token=False,
-            )
+    def _generate(self, input_ids: torch.Tensor, attention_mask: torch.Tensor, max_new_tokens: int, top_p: float,
+                  pad_token_id: int) -> torch.Tensor:
+        """
+        :return: the prompt and generated token ids
+        """
+        # greedy decoding:
+        do_sample: bool = False
+        if self.temperature > 0.0:
+            do_sample = True
 
-            if do_sample:
-                model_output_ids = self.model.generate(
-                    prompt_tokens,
-                    do_sample=do_sample,
-                    max_new_tokens=max_new_tokens,
-                    temperature=self.temperature,
-                    top_p=top_p
-                )
-            else:
-                model_output_ids = self.model.generate(
-                    prompt_tokens,
-                    do_sample=do_sample,
-                    max_new_tokens=max_new_tokens
-                )
-
-            model_output = self.tokenizer.batch_decode(model_output_ids)[0]
-
-            response_text = model_output.replace(prompt, '').strip()
+        # turn off redundant transformers warnings:
+        transformers.logging.set_verbosity_error()
 
+        if do_sample:
+            return self.model.generate(
+                input_ids.to(self.device),
+                attention_mask=attention_mask.to(self.device),
+                do_sample=do_sample,
+                max_new_tokens=max_new_tokens,
+                temperature=self.temperature,
+                top_p=top_p,
+                pad_token_id=pad_token_id
+            )
+        return self.model.generate(
+            input_ids.to(self.device),
+            attention_mask=attention_mask.to(self.device),
+            do_sample=do_sample,
+            max_new_tokens=max_new_tokens,
+            pad_token_id=pad_token_id
+        )
+
+    def _decode_response(self, prompt: Any, continuation: List[int], model: str) -> Tuple[Dict, str]:
+        """
+        Only the generated tokens are decoded; the prompt is not decoded again and cut off the output text.
+        :param prompt: the prompt of _prepare_prompt
+        :param continuation: the generated token ids
+        :return: the response object and the response text
+        """
+        response_text = self.tokenizer.decode(continuation).strip()
+        # remove EOS token at the end of output:
+        if self.tokenizer.eos_token and response_text.endswith(self.tokenizer.eos_token):
+            response_text = response_text[:-len(self.tokenizer.eos_token)].strip()
+        if model in self.chat_models:
+            response = {"response": prompt["inputs"] + self.tokenizer.decode(continuation)}
+        else:
             response = {'response': response_text}
+        return response, response_text
 
-        return prompt, response, response_text
+    def prewarm(self, model_name: str):
+        if not self.model_loaded:
+            hf_loading.prewarm(get_hf_model_id(model_name), token=self.api_key)
+
+    def get_load_metrics(self, model_name: str) -> Dict:
+        return self.load_metrics if self.model_loaded and model_name == self.model_name else {}
 
     def supports(self, model_name: str):
         return model_name in SUPPORTED_MODELS
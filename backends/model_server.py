@@ -0,0 +1,164 @@
+"""
+A local http server that keeps models loaded and serves their responses, so that the benchmark runs of a pipeline
+do not load the same weights again (see model_server_api.py for the backend that forwards to it).
+
+    python3 scripts/cli.py model-server -m koala-13B-HF falcon-40b-instruct
+
+The endpoints follow the OpenAI chat completions API:
+
+    GET  /v1/models            the served models (with the load metrics of their backends)
+    POST /v1/chat/completions  {"model": ..., "messages": [...], "temperature": 0.0, "max_tokens": 100,
+                                "stop": [...], "max_lines": 1}
+
+The choices of a completion only hold the response text. The prompt and response objects of the serving backend
+(e.g. the prompt after applying the chat template) are added to the completion as "prompt" and "response", so that
+they can be logged by the game master as if the model was run in the benchmark process.
+"""
+import copy
+import http.server
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+import backends
+
+logger = backends.get_logger(__name__)
+
+# the environment variable with the base url of the model server (see model_server_api.py)
+MODEL_SERVER_URL = "CLEMBENCH_MODEL_SERVER"
+WARM_UP_MESSAGES = [{"role": "user", "content": "Hello"}]
+
+
+class ModelServer(http.server.ThreadingHTTPServer):
+
+    def __init__(self, address: Tuple[str, int], model_names: List[str], batch_size: int = 0):
+        """
+        :param address: the host and port to listen on
+        :param model_names: the models to load and serve
+        :param batch_size: decode the concurrent requests to a local HuggingFace model in continuous batches of up to
+                           this size (see hf_engine); 0: one request at a time per backend
+        """
+        super().__init__(address, ModelRequestHandler)
+        # do not forward to another model server (or to this one):
+        os.environ.pop(MODEL_SERVER_URL, None)
+        self.batch_size = batch_size
+        self.remotes: Dict[str, backends.Backend] = {}
+        self.locks: Dict[backends.Backend, threading.Lock] = {}
+        for model_name in model_names:
+            self.load(model_name)
+
+    def load(self, model_name: str):
+        """ Find the model's backend and generate a first response, so that the model is loaded """
+        remote = backends.lookup_by_model_name(model_name)
+        if remote is None:
+            raise ValueError(f"No backend found that supports {model_name}")
+        if self.batch_size > 0 and hasattr(remote, "engine_batch_size"):
+            remote.engine_batch_size = self.batch_size
+        self.remotes[model_name] = remote
+        self.locks.setdefault(remote, threading.Lock())
+        start = time.perf_counter()
+        self.generate(model_name, WARM_UP_MESSAGES, temperature=0.0, max_tokens=1)
+        logger.info(f"Loaded {model_name} in {time.perf_counter() - start:.1f}s")
+
+    def generate(self, model_name: str, messages: List[Dict], temperature: float, max_tokens: int = None,
+                 stop_conditions: backends.StopConditions = None):
+        """
+        :return: the (prompt, response, response text) triple of the model's backend
+        """
+        remote = self.remotes[model_name]
+        # a shallow copy with the request's temperature (it shares the loaded models with the original)
+        remote_copy = copy.copy(remote)
+        remote_copy.temperature = temperature
+        kwargs = {}
+        if max_tokens is not None:
+            kwargs["max_new_tokens"] = max_tokens
+        if stop_conditions is not None and remote.supports_stop_conditions:
+            kwargs["stop_conditions"] = stop_conditions
+        if getattr(remote, "engine_batch_size", 0) > 0:  # the engine queues the concurrent requests
+            return remote_copy.generate_response(messages, model_name, **kwargs)
+        with self.locks[remote]:
+            return remote_copy.generate_response(messages, model_name, **kwargs)
+
+
+class ModelRequestHandler(http.server.BaseHTTPRequestHandler):
+    server: ModelServer
+
+    def do_GET(self):
+        if urlsplit(self.path).path != "/v1/models":
+            self._send_error(404, "Not found")
+            return
+        models = [{"id": model_name, "object": "model", "owned_by": str(remote),
+                   "load_metrics": remote.get_load_metrics(model_name)}
+                  for model_name, remote in self.server.remotes.items()]
+        self._send(200, {"object": "list", "data": models})
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/v1/chat/completions":
+            self._send_error(404, "Not found")
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            model_name = request["model"]
+            messages = request["messages"]
+        except (ValueError, KeyError) as e:
+            self._send_error(400, f"Invalid request: {e}")
+            return
+        if model_name not in self.server.remotes:
+            self._send_error(404, f"The model {model_name} is not served")
+            return
+        stop_strings = request.get("stop") or []
+        if isinstance(stop_strings, str):
+            stop_strings = [stop_strings]
+        stop_conditions = None
+        if stop_strings or request.get("max_lines"):
+            stop_conditions = backends.StopConditions(stop_strings, request.get("max_lines"))
+        try:
+            prompt, response, response_text = self.server.generate(model_name, messages,
+                                                                    request.get("temperature", 0.0),
+                                                                    request.get("max_tokens"), stop_conditions)
+        except Exception as e:
+            logger.exception("Cannot generate a response of %s", model_name)
+            self._send_error(500, f"Cannot generate a response: {e}")
+            return
+        self._send(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model_name,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": response_text},
+                         "finish_reason": "stop"}],
+            "prompt": prompt,
+            "response": response
+        })
+
+    def _send_error(self, status: int, message: str):
+        self._send(status, {"error": {"message": message, "type": "invalid_request_error" if status < 500
+                                      else "server_error"}})
+
+    def _send(self, status: int, content: Dict):
+        body = json.dumps(content, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+
+def serve(model_names: List[str], host: str = "localhost", port: int = 8001, batch_size: int = 0):
+    server = ModelServer((host, port), model_names, batch_size)
+    url = f"http://{host}:{server.server_address[1]}"
+    print(f"Serving {', '.join(model_names)} at {url}/v1 (Ctrl+C to stop). To use it in the benchmark runs:")
+    print(f"export {MODEL_SERVER_URL}={url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
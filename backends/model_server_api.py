@@ -0,0 +1,115 @@
+""" Backend that forwards the requests to a model server (see model_server.py), which keeps the models loaded. """
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+from typing import List, Dict, Tuple, Any
+
+from retry import retry
+
+import backends
+from backends.model_server import MODEL_SERVER_URL
+
+logger = backends.get_logger(__name__)
+
+# seconds to wait for a response (the server might queue the request behind others)
+TIMEOUT = 600
+# seconds to wait for the list of served models (asked for in every model lookup, see supports)
+DISCOVERY_TIMEOUT = 2
+# seconds until a server that could not be reached is asked for its models again
+DISCOVERY_RETRY_DELAY = 60
+
+
+class LocalModelServer(backends.Backend):
+    supports_stop_conditions = True
+    # the served models are not loaded again by the local backends of this process
+    lookup_priority = 1
+
+    def __init__(self):
+        self.temperature: float = -1.
+        self.served_models: Dict[str, Dict[str, Dict]] = {}  # server url -> model name -> model entry
+        self.unreachable: Dict[str, float] = {}  # server url -> time.monotonic() of the failed discovery
+
+    @property
+    def base_url(self) -> str:
+        """ the url of the model server, if it is set in the environment (e.g. http://localhost:8001) """
+        return os.environ.get(MODEL_SERVER_URL, "").rstrip("/")
+
+    def list_models(self) -> List[str]:
+        return list(self._served_models())
+
+    def _served_models(self) -> Dict[str, Dict]:
+        base_url = self.base_url
+        if not base_url:
+            return {}
+        if base_url not in self.served_models:
+            failed_at = self.unreachable.get(base_url)
+            if failed_at is not None and time.monotonic() - failed_at < DISCOVERY_RETRY_DELAY:
+                return {}
+            try:
+                models = self._request("GET", "/v1/models", timeout=DISCOVERY_TIMEOUT)
+                self.served_models[base_url] = {item["id"]: item for item in models["data"]}
+                self.unreachable.pop(base_url, None)
+            except (urllib.error.URLError, OSError) as e:  # incl. timeouts
+                logger.warning(f"Cannot reach the model server at {base_url} (retry in {DISCOVERY_RETRY_DELAY}s): {e}")
+                self.unreachable[base_url] = time.monotonic()
+                return {}
+        return self.served_models[base_url]
+
+    @retry((urllib.error.URLError, OSError), tries=3, delay=1, logger=logger)  # incl. timeouts
+    def generate_response(self, messages: List[Dict], model: str,
+                          max_new_tokens: int = 100,
+                          stop_conditions: backends.StopConditions = None) -> Tuple[Any, Any, str]:
+        """
+        :param messages: for example
+                [
+                    {"role": "system", "content": "You are a helpful assistant."},
+                    {"role": "user", "content": "Who won the world series in 2020?"},
+                    {"role": "assistant", "content": "The Los Angeles Dodgers won the World Series in 2020."},
+                    {"role": "user", "content": "Where was it played?"}
+                ]
+        :param model: model name
+        :param max_new_tokens: How many tokens to generate ('at most', but no stop sequence is defined).
+        :param stop_conditions: when the response is complete (the generation stops there and the rest is cut off)
+        :return: the prompt and response objects of the serving backend, and the response text
+        """
+        assert 0.0 <= self.temperature <= 1.0, "Temperature must be in [0.,1.]"
+        request = {"model": model, "messages": messages, "temperature": self.temperature,
+                   "max_tokens": max_new_tokens}
+        if stop_conditions is not None:
+            request["stop"] = stop_conditions.stop_strings
+            request["max_lines"] = stop_conditions.max_lines
+        completion = self._request("POST", "/v1/chat/completions", request)
+        response_text = completion["choices"][0]["message"]["content"]
+        return completion["prompt"], completion["response"], response_text
+
+    def _request(self, method: str, path: str, content: Dict = None, timeout: float = TIMEOUT) -> Dict:
+        data = json.dumps(content).encode("utf-8") if content is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.load(response)
+        except urllib.error.HTTPError as e:  # the server's error message instead of the status only
+            raise RuntimeError(f"Model server error {e.code}: {_error_message(e)}") from None
+
+    def get_load_metrics(self, model_name: str) -> Dict:
+        """ the metrics of the server's load (the model was not loaded by this process) """
+        return self._served_models().get(model_name, {}).get("load_metrics", {})
+
+    def supports(self, model_name: str):
+        return model_name in self._served_models()
+
+
+def _error_message(error: urllib.error.HTTPError) -> str:
+    """
+    :return: the message of the server's JSON error; otherwise the body as is (e.g. the error page of a proxy) or the
+             reason of the status
+    """
+    body = error.read().decode("utf-8", errors="replace").strip()
+    try:
+        message = json.loads(body).get("error", {}).get("message")
+    except (ValueError, AttributeError):  # not a JSON object
+        message = None
+    return message or body or str(error.reason)
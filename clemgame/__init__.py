@@ -2,8 +2,8 @@ import importlib
 import sys
 import os
 import logging
-import logging.config
-import yaml
+
+from clemgame import log_utils
 
 BANNER = \
     r"""
@@ -19,25 +19,32 @@ print(BANNER)
 
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-# Configure logging
-with open(os.path.join(project_root, "logging.yaml")) as f:
-    conf = yaml.safe_load(f)
-    log_fn = conf["handlers"]["file_handler"]["filename"]
-    log_fn = os.path.join(project_root, log_fn)
-    conf["handlers"]["file_handler"]["filename"] = log_fn
-    logging.config.dictConfig(conf)
+
+# Configure logging (for the backends as well, see log_utils.py)
+log_utils.configure_logging(project_root)
+process_pool = log_utils.process_pool
 
 
 def get_logger(name):
     return logging.getLogger(name)
 
 
-# Load games dynamically from "games" sibling directory
-# Note: The games might use get_logger (circular import)
+# Load games dynamically from "games" sibling directory (only when needed, because the game masters import the
+# backends, see load_games). Note: The games might use get_logger (circular import)
 games_root = os.path.join(project_root, "games")
+games_modules = []
 if os.path.isdir(games_root):
     games_modules = [file for file in os.listdir(games_root)
                      if os.path.isdir(os.path.join(games_root, file)) and file not in ["__pycache__"]]
+_games_loaded = False
+
+
+def load_games():
+    """ Import the game masters of all games (once), which registers their game benchmarks """
+    global _games_loaded
+    if _games_loaded:
+        return
+    _games_loaded = True
     for game_module in games_modules:
         try:
             importlib.import_module(f"games.{game_module}.master")
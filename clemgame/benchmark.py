@@ -1,18 +1,23 @@
 """ Main entry point """
-from typing import List
+import collections
+import functools
+from typing import List, Tuple
+
+from tqdm import tqdm
 
 import clemgame
 
 from datetime import datetime
 
-from clemgame import string_utils
-from clemgame.clemgame import load_benchmarks, load_benchmark
+from clemgame import results_index, string_utils, transcript_server
+from clemgame.scoring import find_scoring, load_scorings
 
 logger = clemgame.get_logger(__name__)
 stdout_logger = clemgame.get_logger("benchmark.run")
 
 
 def list_games():
+    from clemgame.clemgame import load_benchmarks
     stdout_logger.info("Listing benchmark games:")
     games_list = load_benchmarks(do_setup=False)
     if not games_list:
@@ -22,7 +27,9 @@ def list_games():
         stdout_logger.info(" Game: %s -> %s", game.name, game.get_description())
 
 
-def run(game_name: str, temperature: float, models: List[str] = None, experiment_name: str = None):
+def run(game_name: str, temperature: float, models: List[str] = None, experiment_name: str = None,
+        prewarm: bool = False):
+    from clemgame.clemgame import load_benchmark
     assert 0.0 <= temperature <= 1.0, "Temperature must be in [0.,1.]"
     if experiment_name:
         logger.info("Only running experiment: %s", experiment_name)
@@ -33,21 +40,28 @@ def run(game_name: str, temperature: float, models: List[str] = None, experiment
         if experiment_name:
             benchmark.filter_experiment.append(experiment_name)
         time_start = datetime.now()
-        benchmark.run(player_backends=models, temperature=temperature)
+        benchmark.run(player_backends=models, temperature=temperature, prewarm=prewarm)
         time_end = datetime.now()
         logger.info(f"Run {benchmark.name} took {str(time_end - time_start)}")
     except Exception as e:
         logger.error(e, exc_info=True)
 
 
-def score(game_name: str, experiment_name: str = None):
+def score(game_name: str, experiment_name: str = None, jobs: int = 1, force: bool = False):
     logger.info("Scoring benchmark for: %s", game_name)
     if experiment_name:
         logger.info("Only scoring experiment: %s", experiment_name)
+    # the game scorers do not need the backends (only the games that are scored by their game master)
     if game_name == "all":
-        games_list = load_benchmarks(do_setup=False)
+        games_list = load_scorings()
     else:
-        games_list = [load_benchmark(game_name, do_setup=False)]
+        games_list = [find_scoring(game_name)]
+    if jobs > 1:
+        if experiment_name:
+            for benchmark in games_list:
+                benchmark.filter_experiment.append(experiment_name)
+        _run_in_parallel(games_list, jobs, "score", force)
+        return
     total_games = len(games_list)
     for idx, benchmark in enumerate(games_list):
         try:
@@ -55,7 +69,7 @@ def score(game_name: str, experiment_name: str = None):
                 benchmark.filter_experiment.append(experiment_name)
             stdout_logger.info(f"Score game {idx + 1} of {total_games}: {benchmark.name}")
             time_start = datetime.now()
-            benchmark.compute_scores()
+            benchmark.compute_scores(force=force)
             time_end = datetime.now()
             logger.info(f"Score {benchmark.name} took {str(time_end - time_start)}")
         except Exception as e:
@@ -63,7 +77,83 @@ def score(game_name: str, experiment_name: str = None):
             logger.error(e, exc_info=True)
 
 
-def transcripts(game_name: str, experiment_name: str = None):
+# The episode-wise tasks that can run in parallel:
+# the GameBenchmark (or GameScoring) method, the action (for logging), the progress description
+# and the hint for skipped episodes
+EPISODE_TASKS = {
+    "score": ("compute_episode_scores", "Scoring", "Scoring episodes", "use --force to re-score"),
+    "transcribe": ("build_episode_transcript", "Transcribe", "Building transcripts", "use --force to re-build")
+}
+
+
+def _run_in_parallel(games_list, jobs: int, task: str, force: bool):
+    """
+    Spread the episodes of all games over a pool of worker processes.
+    Each work unit is a (game, dialogue pair, experiment, episode) tuple, which is processed in isolation.
+    :param task: one of EPISODE_TASKS
+    """
+    _, action, progress_desc, skip_hint = EPISODE_TASKS[task]
+    units = []
+    for benchmark in games_list:
+        for dialogue_pair, experiment_dir, experiment_name, episode_dirs in benchmark.indexed_experiments(action):
+            units.extend((benchmark.name, dialogue_pair, experiment_dir, experiment_name, episode_dir)
+                         for episode_dir in episode_dirs)
+    stdout_logger.info(f"{action}: {len(units)} episodes of {len(games_list)} games with {jobs} processes")
+    time_start = datetime.now()
+    # larger chunks keep the episodes of an experiment together (cached experiment configs), but balance worse
+    chunk_size = max(1, min(64, len(units) // (jobs * 4)))
+    outcome_counts = collections.Counter()
+    run_episode = functools.partial(_run_episode, task=task, force=force)
+    # the workers send their log records to this process, which writes them to the log file
+    with clemgame.process_pool(jobs) as executor:
+        for game_name, outcome in tqdm(executor.map(run_episode, units, chunksize=chunk_size),
+                                       total=len(units), desc=progress_desc):
+            outcome_counts[(game_name, outcome)] += 1
+    for (game_name, outcome), count in sorted(outcome_counts.items()):
+        if outcome == "skipped":
+            stdout_logger.info(f"{game_name}: Skipped {count} up-to-date episodes ({skip_hint})")
+        if outcome == "error":
+            stdout_logger.error(f"{game_name}: '{count}' exceptions occurred: See clembench.log for details.")
+    time_end = datetime.now()
+    logger.info(f"{action}: {len(units)} episodes took {str(time_end - time_start)}")
+
+
+# per worker process: the game benchmarks (or scorings) and experiment configs already loaded
+_worker_benchmarks = {}
+_worker_experiment_configs = {}
+
+
+def _run_episode(unit: Tuple[str, str, str, str, str], task: str, force: bool = False) -> Tuple[str, str]:
+    """
+    :return: the game name and the outcome: 'done', 'skipped' (up-to-date) or 'error'
+    """
+    game_name, dialogue_pair, experiment_dir, experiment_name, episode_dir = unit
+    try:
+        if (task, game_name) not in _worker_benchmarks:
+            _worker_benchmarks[(task, game_name)] = _find_for_task(task, game_name)
+        benchmark = _worker_benchmarks[(task, game_name)]
+        experiment_key = (game_name, dialogue_pair, experiment_dir)
+        if experiment_key not in _worker_experiment_configs:
+            _worker_experiment_configs[experiment_key] = benchmark.load_results_json(
+                f"{experiment_dir}/experiment_{experiment_name}", dialogue_pair)
+        episode_method = getattr(benchmark, EPISODE_TASKS[task][0])
+        done = episode_method(dialogue_pair, _worker_experiment_configs[experiment_key],
+                              f"{experiment_dir}/{episode_dir}", force=force)
+        return game_name, "done" if done else "skipped"
+    except Exception:  # continue with other episodes if something goes wrong
+        logger.exception(f"{game_name}: Cannot {task} {experiment_dir}/{episode_dir} (but continue)")
+        return game_name, "error"
+
+
+def _find_for_task(task: str, game_name: str):
+    if task == "score":
+        return find_scoring(game_name)
+    from clemgame.clemgame import find_benchmark
+    return find_benchmark(game_name)
+
+
+def transcripts(game_name: str, experiment_name: str = None, jobs: int = 1, force: bool = False):
+    from clemgame.clemgame import load_benchmarks, load_benchmark
     logger.info("Building benchmark transcripts for: %s", game_name)
     if experiment_name:
         logger.info("Only transcribe experiment: %s", experiment_name)
@@ -71,6 +161,12 @@ def transcripts(game_name: str, experiment_name: str = None):
         games_list = load_benchmarks(do_setup=False)
     else:
         games_list = [load_benchmark(game_name, do_setup=False)]
+    if jobs > 1:
+        if experiment_name:
+            for benchmark in games_list:
+                benchmark.filter_experiment.append(experiment_name)
+        _run_in_parallel(games_list, jobs, "transcribe", force)
+        return
     total_games = len(games_list)
     for idx, benchmark in enumerate(games_list):
         try:
@@ -78,9 +174,29 @@ def transcripts(game_name: str, experiment_name: str = None):
                 benchmark.filter_experiment.append(experiment_name)
             stdout_logger.info(f"Transcribe game {idx + 1} of {total_games}: {benchmark.name}")
             time_start = datetime.now()
-            benchmark.build_transcripts()
+            benchmark.build_transcripts(force=force)
             time_end = datetime.now()
             logger.info(f"Building transcripts {benchmark.name} took {str(time_end - time_start)}")
         except Exception as e:
             stdout_logger.exception(e)
             logger.error(e, exc_info=True)
+
+
+def reindex(results_dir: str = None):
+    logger.info("Rebuilding the results index for: %s", results_dir if results_dir else "results")
+    time_start = datetime.now()
+    entries = results_index.rebuild(results_dir)
+    time_end = datetime.now()
+    stdout_logger.info(f"Indexed {len(entries)} episodes in {results_index.index_path(results_dir)}")
+    logger.info(f"Reindex took {str(time_end - time_start)}")
+
+
+def serve_models(models: List[str], host: str = "localhost", port: int = 8001, batch_size: int = 0):
+    from backends import model_server  # loads the backends only when serving
+    logger.info("Serving models: %s", models)
+    model_server.serve(models, host, port, batch_size)
+
+
+def serve_transcripts(host: str = "localhost", port: int = 8000, results_dir: str = None, cache_size: int = 256):
+    logger.info("Serving transcripts for: %s", results_dir if results_dir else "results")
+    transcript_server.serve(host, port, results_dir, cache_size)
@@ -1,7 +1,6 @@
 import abc
 import collections
-import copy
-import os.path
+import os
 from datetime import datetime
 from typing import List, Dict, Tuple, Any
 
@@ -9,14 +8,14 @@ from tqdm import tqdm
 
 import backends
 import clemgame
-from clemgame import file_utils, string_utils, transcript_utils
+from clemgame import results_index, string_utils, transcript_utils
+# the scoring does not need the backends (see clemgame.scoring); re-exported for the games
+from clemgame.scoring import GAMES_TO_IGNORE, set_recorder_log_level, GameResourceLocator, GameRecorder, \
+    GameScorer, GameScoring
 
 logger = clemgame.get_logger(__name__)
 stdout_logger = clemgame.get_logger("benchmark.run")
 
-# Showcases that should not be run for the overall benchmark (still can be run, when specified specifically)
-GAMES_TO_IGNORE = ["hellogame", "chatgame"]
-
 
 class Player(abc.ABC):
     """
@@ -35,6 +34,8 @@ class Player(abc.ABC):
         if not Player.is_programmatic(model_name) and not Player.is_human(model_name):
             self.remote: backends.Backend = backends.lookup_by_model_name(model_name)
         self.descriptor: str = None
+        # when the responses of the player are complete (local backends then stop generating early)
+        self.stop_conditions: backends.StopConditions = None
         logger.info("Player %s", self.get_description())
 
     def get_description(self) -> str:
@@ -53,7 +54,11 @@ class Player(abc.ABC):
                 raise AttributeError("No remote model initialized for player: " + self.get_description() + "."
                                      + " You probably tried to load a Player with a backend"
                                        " that is not available or could not be loaded.")
-            prompt, response, response_text = self.remote.generate_response(messages, self.model_name)
+            if self.stop_conditions is not None and self.remote.supports_stop_conditions:
+                prompt, response, response_text = self.remote.generate_response(
+                    messages, self.model_name, stop_conditions=self.stop_conditions)
+            else:
+                prompt, response, response_text = self.remote.generate_response(messages, self.model_name)
         call_duration = datetime.now() - call_start
         response["duration"] = str(call_duration)
         return prompt, response, response_text
@@ -90,210 +95,13 @@ class Player(abc.ABC):
         return model_name in Player.HUMAN_PLAYERS
 
 
-class GameResourceLocator(abc.ABC):
+def _lookup_remote(model_name: str) -> backends.Backend:
     """
-    Provides access to game specific resources
-
-    Note: You should access resource only via the game resource locator! The locator knows how to refer to them.
-    For example use: `gm.load_json("my_file")` which is located directly at your game directory `game/my_file.json`.
-    You can access subdirectories by giving `gm.load_json("sub/my_file")` in `game/sub/my_file.json`.
+    :return: the backend of a model player; None for programmatic and human players (or unsupported models)
     """
-
-    def __init__(self, name: str):
-        """
-        :param name: of the game
-        """
-        self.name = name
-        self.logger = clemgame.get_logger(self.__class__.__module__)
-
-    def file_path(self, file_name: str) -> str:
-        """
-        The absolute path to a game file. Sometimes we only need the path to a file, but not to load it.
-        :param file_name: can be a sub-path
-        :return: the absolute path to the file in the game directory
-        """
-        return file_utils.file_path(file_name, self.name)
-
-    def load_template(self, file_name: str) -> str:
-        """
-        Load a .template file from your game directory
-        :param file_name: can have subdirectories e.g. "sub/my_file"
-        :return: the file contents
-        """
-        return file_utils.load_template(file_name, self.name)
-
-    def load_json(self, file_name: str) -> Dict:
-        """
-        Load a .json file from your game (or game results) directory
-        :param file_name: can have subdirectories e.g. "sub/my_file"
-        :return: the file contents
-        """
-        return file_utils.load_json(file_name, self.name)
-
-    def load_results_json(self, file_name: str, dialogue_pair: str) -> Dict:
-        """
-        Load a .json file from your game (or game results) directory
-        :param file_name: can have subdirectories e.g. "sub/my_file"
-        :return: the file contents
-        """
-        return file_utils.load_results_json(file_name, dialogue_pair, self.name)
-
-    def load_csv(self, file_name: str) -> Dict:
-        """
-        Load a .csv file from your game directory
-        :param file_name: can have subdirectories e.g. "sub/my_file"
-        :return: the file contents
-        """
-        return file_utils.load_csv(file_name, self.name)
-
-    def load_file(self, file_name: str, file_ending: str = None) -> str:
-        """
-        Load an arbitrary file from your game directory
-        :param file_name: can have subdirectories e.g. "sub/my_file"
-        :param file_ending: if not given in file_name
-        :return: the file contents
-        """
-        return file_utils.load_file(file_name, self.name, file_ending=file_ending)
-
-    def store_file(self, data, file_name: str, sub_dir: str = None):
-        """
-        Store a file in your game directory. The top-level directory is 'games'.
-
-        :param sub_dir: automatically created when given; otherwise an error will be thrown.
-        :param data: to store
-        :param file_name: can have subdirectories e.g. "sub/my_file"
-        """
-        fp = file_utils.store_game_file(data, file_name, self.name, sub_dir=sub_dir)
-        self.logger.info("Game file stored to %s", fp)
-
-    def store_results_file(self, data, file_name: str, dialogue_pair: str, sub_dir: str = None):
-        """
-        Store a results file in your game results' directory. The top-level directory is 'results'.
-
-        :param sub_dir: automatically created when given; otherwise an error will be thrown.
-        :param data: to store
-        :param file_name: can have subdirectories e.g. "sub/my_file"
-        """
-        fp = file_utils.store_game_results_file(data, file_name, dialogue_pair, self.name, sub_dir=sub_dir)
-        self.logger.info("Results file stored to %s", fp)
-
-    def results_path_for(self, dialogue_pair: str):
-        return file_utils.game_results_dir_for(dialogue_pair, self.name)
-
-    def applies_to(self, game_name: str) -> bool:
-        return game_name == self.name
-
-
-class GameRecorder(GameResourceLocator):
-
-    def __init__(self, name: str):
-        super().__init__(name)
-        self.log_current_turn = -1
-        """ Stores players and turn during the runs """
-        self.interactions = {
-            "players": {},
-            "turns": []
-        }
-        """ Stores calls to the API """
-        self.requests = []
-        """ Stores values of score computation """
-        self.scores = {
-            "turn scores": {},
-            "episode scores": {},
-        }
-
-    def store_scores(self, dialogue_pair, game_record_dir):
-        self.store_results_file(self.scores, "scores.json", dialogue_pair, sub_dir=game_record_dir)
-
-    def log_next_turn(self):
-        """ Call this method to group interactions per turn """
-        self.log_current_turn += 1
-        self.interactions["turns"].append([])
-
-    def log_key(self, key: str, value: Any):
-        """Add a key and value to the internal log."""
-        self.interactions[key] = value
-        self.logger.info(f"{self.name}: Logged a game-specific interaction key: {key}.")
-
-    def log_players(self, players_dic: Dict):
-        self.interactions["players"] = players_dic
-        self.logger.info(f"{self.name}: Logged players metadata.")
-
-    def log_event(self, from_: str, to: str, action: Dict, call: Tuple[Any, Any] = None):
-        """
-        Add an event to the internal log. It can be only an action or an action
-        plus an API call that should have the same timestamp as the action.
-
-        call, if given, is a tuple whose first element is the input prompt
-        object (after API-specific manipulation) as passed to the API and the
-        second element is the raw response object as returned by the API.
-        """
-        assert self.log_current_turn >= 0, f"Call log_add_new_turn at least once " \
-                                           f"(log_current_turn={self.log_current_turn})"
-        timestamp = datetime.now().isoformat()
-        action_obj = {
-            "from": from_,
-            "to": to,
-            "timestamp": timestamp,
-            "action": action
-        }
-        self.interactions["turns"][self.log_current_turn].append(action_obj.copy())
-        self.logger.info(
-            f"{self.name}: Logged {action['type']} action ({from_}->{to}).")
-        if call:
-            call_obj = {
-                "timestamp": timestamp,
-                "manipulated_prompt_obj": self._needs_copy(call[0]),
-                "raw_response_obj": self._needs_copy(call[1])
-            }
-            self.requests.append(call_obj)
-            self.logger.info(f"{self.name}: Logged a call with timestamp {timestamp}")
-
-    @staticmethod
-    def _needs_copy(call_obj):
-        if isinstance(call_obj, Dict) or isinstance(call_obj, List):
-            return copy.deepcopy(call_obj)
-        elif isinstance(call_obj, str):
-            return call_obj[:]
-        return call_obj
-
-    def log_turn_score(self, turn_idx, score_name, score_value):
-        if isinstance(score_value, bool):
-            self.logger.warning(f"{self.name}: Score {score_name} value is boolean, this can break the eval!")
-        if turn_idx not in self.scores["turn scores"]:
-            self.scores["turn scores"][turn_idx] = {}
-        if score_name in self.scores["turn scores"][turn_idx]:
-            self.logger.warning(f"{self.name}: Score {score_name} overwritten at turn {turn_idx}!")
-        self.scores["turn scores"][turn_idx][score_name] = score_value
-        self.logger.info(f"{self.name}: Logged turn {turn_idx} score {score_name}={score_value}.")
-
-    def log_episode_score(self, score_name, score_value):
-        if score_name in self.scores["episode scores"]:
-            self.logger.warning(f"{self.name}: Episode score {score_name} overwritten!")
-        self.scores["episode scores"][score_name] = score_value
-        self.logger.info(f"{self.name}: Logged episode score {score_name}={score_value}.")
-
-    def store_records(self, dialogue_pair_desc: str, game_id: int, game_record_dir: str):
-        """Raise warnings if a mandatory element is empty or format is wrong."""
-        if not self.interactions["players"]:
-            self.logger.warning(f"Players metadada is missing!")
-        else:
-            for name in self.interactions["players"]:
-                """The transcript builder relies on specific player identifiers."""
-                try:
-                    assert name == "GM" or name.startswith("Player ")
-                except AssertionError:
-                    self.logger.warning(f"Invalid player identifiers, html builder won't work.")
-        if not self.interactions["turns"]:
-            self.logger.warning(f"Interaction logs are missing!")
-        if not self.requests:
-            self.logger.warning(f"No calls logged!")
-        self.store_results_file(self.interactions, "interactions.json",
-                                dialogue_pair_desc,
-                                sub_dir=game_record_dir)
-        self.store_results_file(self.requests, "requests.json",
-                                dialogue_pair_desc,
-                                sub_dir=game_record_dir)
+    if Player.is_programmatic(model_name) or Player.is_human(model_name):
+        return None
+    return backends.lookup_by_model_name(model_name)
 
 
 class GameMaster(GameRecorder):
@@ -333,6 +141,7 @@ class GameMaster(GameRecorder):
     def compute_scores(self, episode_interactions: Dict) -> None:
         """
         Loop over the game records to compute and log all turn and episode scores.
+        Note: Games that provide a GameScorer (see GameScoring.create_game_scorer) are scored without game master.
         """
         raise NotImplementedError()
 
@@ -529,7 +338,7 @@ class DialogueGameMaster(GameMaster):
         pass
 
 
-class GameBenchmark(GameResourceLocator):
+class GameBenchmark(GameScoring):
     """
     The GameBenchmark organizes the run of a particular collection of game instances
     which compose a benchmark for the game. It supports different experiment conditions for games.
@@ -538,7 +347,6 @@ class GameBenchmark(GameResourceLocator):
     def __init__(self, name: str):
         super().__init__(name)
         self.instances = None
-        self.filter_experiment: List[str] = []
 
     def get_description(self) -> str:
         """
@@ -551,108 +359,101 @@ class GameBenchmark(GameResourceLocator):
         # For now, we assume a single instances.json
         self.instances = self.load_json("in/instances.json")
 
-    def build_transcripts(self):
-        results_root = file_utils.results_root()
-        dialogue_partners = [file for file in os.listdir(results_root)
-                             if os.path.isdir(os.path.join(results_root, file))]
-        for dialogue_pair in dialogue_partners:
-            game_result_path = self.results_path_for(dialogue_pair)
-            if not os.path.exists(game_result_path) or not os.path.isdir(game_result_path):
-                stdout_logger.info("No results directory found at: " + game_result_path)
-                continue
-
-            model_pair = string_utils.to_model_pair(dialogue_pair)
-            model_pair = ["-".join(m.split("-")[:-1]) for m in model_pair]  # remove -t0.0
-
-            experiment_dirs = [file for file in os.listdir(game_result_path)
-                               if os.path.isdir(os.path.join(game_result_path, file))]
-            if not experiment_dirs:
-                stdout_logger.warning(f"{self.name}: No experiments for {dialogue_pair}")
-            for experiment_dir in experiment_dirs:
-                experiment_path = os.path.join(game_result_path, experiment_dir)
-                experiment_name = "_".join(experiment_dir.split("_")[1:])  # remove leading index number
-                if self.filter_experiment and experiment_name not in self.filter_experiment:
-                    stdout_logger.info(f"Skip experiment {experiment_name}")
-                    continue
-                stdout_logger.info(f"Transcribe: {experiment_name}")
-                experiment_config = self.load_results_json(f"{experiment_dir}/experiment_{experiment_name}",
-                                                           dialogue_pair)
-                episode_dirs = [file for file in os.listdir(experiment_path)
-                                if os.path.isdir(os.path.join(experiment_path, file))]
-                error_count = 0
-                for episode_dir in tqdm(episode_dirs, desc="Building transcripts"):
-                    try:
-                        rel_episode_path = f"{experiment_dir}/{episode_dir}"
-                        game_instance = self.load_results_json(f"{rel_episode_path}/instance", dialogue_pair)
-                        game_interactions = self.load_results_json(f"{rel_episode_path}/interactions", dialogue_pair)
-
-                        transcript = transcript_utils.build_transcript(game_interactions, experiment_config,
-                                                                       game_instance, dialogue_pair)
-                        self.store_results_file(transcript, "transcript.html",
-                                                dialogue_pair,
-                                                sub_dir=rel_episode_path)
-                        transcript_tex = transcript_utils.build_tex(game_interactions)
-                        self.store_results_file(transcript_tex, "transcript.tex",
-                                                dialogue_pair,
-                                                sub_dir=rel_episode_path)
-                    except Exception:  # continue with other episodes if something goes wrong
-                        self.logger.exception(f"{self.name}: Cannot transcribe {episode_dir} (but continue)")
-                        error_count += 1
-                if error_count > 0:
-                    stdout_logger.error(
-                        f"{self.name}: '{error_count}' exceptions occurred: See clembench.log for details.")
-
-    def compute_scores(self):
-        results_root = file_utils.results_root()
-        dialogue_partners = [file for file in os.listdir(results_root)
-                             if os.path.isdir(os.path.join(results_root, file))]
-        for dialogue_pair in dialogue_partners:
-            game_result_path = self.results_path_for(dialogue_pair)
-            if not os.path.exists(game_result_path) or not os.path.isdir(game_result_path):
-                stdout_logger.info("No results directory found at: " + game_result_path)
-                continue
-
-            model_pair = string_utils.to_model_pair(dialogue_pair)
-            model_pair = ["-".join(m.split("-")[:-1]) for m in model_pair]  # remove -t0.0
-
-            experiment_dirs = [file for file in os.listdir(game_result_path)
-                               if os.path.isdir(os.path.join(game_result_path, file))]
-            if not experiment_dirs:
-                stdout_logger.warning(f"{self.name}: No experiments for {dialogue_pair}")
-            for experiment_dir in experiment_dirs:
-                experiment_path = os.path.join(game_result_path, experiment_dir)
-                experiment_name = "_".join(experiment_dir.split("_")[1:])  # remove leading index number
-                if self.filter_experiment and experiment_name not in self.filter_experiment:
-                    stdout_logger.info(f"Skip experiment {experiment_name}")
-                    continue
-                stdout_logger.info(f"Scoring: {experiment_name}")
-                experiment_config = self.load_results_json(f"{experiment_dir}/experiment_{experiment_name}",
-                                                           dialogue_pair)
-                episode_dirs = [file for file in os.listdir(experiment_path)
-                                if os.path.isdir(os.path.join(experiment_path, file))]
-                error_count = 0
-                for episode_dir in tqdm(episode_dirs, desc="Scoring episodes"):
-                    try:
-                        rel_episode_path = f"{experiment_dir}/{episode_dir}"
-                        game_instance = self.load_results_json(f"{rel_episode_path}/instance",
-                                                               dialogue_pair)
-                        game_interactions = self.load_results_json(f"{rel_episode_path}/interactions",
-                                                                   dialogue_pair)
-
-                        game_master = self.create_game_master(experiment_config, model_pair)
-                        game_master.setup(**game_instance)
-                        game_master.compute_scores(game_interactions)
-                        game_master.store_scores(dialogue_pair, rel_episode_path)
-                    except Exception:  # continue with other episodes if something goes wrong
-                        self.logger.exception(f"{self.name}: Cannot score {episode_dir} (but continue)")
-                        error_count += 1
-                if error_count > 0:
-                    stdout_logger.error(
-                        f"{self.name}: '{error_count}' exceptions occurred: See clembench.log for details.")
+    def build_transcripts(self, force: bool = False):
+        """
+        Build the transcripts of the episodes of the game, skipping those that are up-to-date
+        (see build_episode_transcript).
+        :param force: re-build all transcripts
+        """
+        for dialogue_pair, experiment_dir, experiment_name, episode_dirs in self.indexed_experiments("Transcribe"):
+            experiment_config = self.load_results_json(f"{experiment_dir}/experiment_{experiment_name}",
+                                                       dialogue_pair)
+            error_count = 0
+            skip_count = 0
+            for episode_dir in tqdm(episode_dirs, desc="Building transcripts"):
+                try:
+                    if not self.build_episode_transcript(dialogue_pair, experiment_config,
+                                                         f"{experiment_dir}/{episode_dir}", force=force):
+                        skip_count += 1
+                except Exception:  # continue with other episodes if something goes wrong
+                    self.logger.exception(f"{self.name}: Cannot transcribe {episode_dir} (but continue)")
+                    error_count += 1
+            if skip_count > 0:
+                stdout_logger.info(f"{self.name}: Skipped {skip_count} up-to-date episodes (use --force to re-build)")
+            if error_count > 0:
+                stdout_logger.error(
+                    f"{self.name}: '{error_count}' exceptions occurred: See clembench.log for details.")
+
+    def build_episode_transcript(self, dialogue_pair: str, experiment_config: Dict, rel_episode_path: str,
+                                 force: bool = False) -> bool:
+        """
+        Build the transcript.html and transcript.tex of a single episode,
+        unless both are newer than the episode's interactions.json.
+        :param dialogue_pair: the results directory of the players e.g. 'mock-t0.0--mock-t0.0'
+        :param experiment_config: the experiment.json of the episode
+        :param rel_episode_path: the episode directory relative to the game results e.g. '0_high_en/episode_0'
+        :param force: build the transcripts even when they are up-to-date
+        :return: True, if the transcripts have been built; False, if the episode has been skipped
+        """
+        if not force and self._are_transcripts_up_to_date(dialogue_pair, rel_episode_path):
+            return False
+        game_instance = self.load_results_json(f"{rel_episode_path}/instance", dialogue_pair)
+        game_interactions = self.load_results_json(f"{rel_episode_path}/interactions", dialogue_pair)
+
+        transcript = transcript_utils.build_transcript(game_interactions, experiment_config,
+                                                       game_instance, dialogue_pair)
+        self.store_results_file(transcript, "transcript.html",
+                                dialogue_pair,
+                                sub_dir=rel_episode_path)
+        transcript_tex = transcript_utils.build_tex(game_interactions)
+        self.store_results_file(transcript_tex, "transcript.tex",
+                                dialogue_pair,
+                                sub_dir=rel_episode_path)
+        return True
 
-    def run(self, player_backends: List[str], temperature: float):
+    def _are_transcripts_up_to_date(self, dialogue_pair: str, rel_episode_path: str) -> bool:
+        episode_path = os.path.join(self.results_path_for(dialogue_pair), rel_episode_path)
+        try:
+            interactions_mtime = os.path.getmtime(os.path.join(episode_path, "interactions.json"))
+            return all(os.path.getmtime(os.path.join(episode_path, file_name)) >= interactions_mtime
+                       for file_name in ("transcript.html", "transcript.tex"))
+        except FileNotFoundError:
+            return False
+
+    def create_master_scorer(self, dialogue_pair: str, experiment: Dict, game_instance: Dict) -> GameMaster:
+        model_pair = string_utils.to_model_pair(dialogue_pair)
+        model_pair = ["-".join(m.split("-")[:-1]) for m in model_pair]  # remove -t0.0
+        game_master = self.create_game_master(experiment, model_pair)
+        game_master.setup(**game_instance)
+        return game_master
+
+    def prewarm_models(self, player_backends: List[str]):
+        """ Let the backends of the models prewarm their weights (see backends.Backend.prewarm) """
+        model_names = set(player_backends or [])
+        if not model_names:  # the dialogue partners of the experiments
+            for experiment in self.instances["experiments"]:
+                for dialogue_pair in experiment.get("dialogue_partners", []):
+                    model_names.update(dialogue_pair)
+        for model_name in model_names:
+            remote = _lookup_remote(model_name)
+            if remote is not None:
+                remote.prewarm(model_name)
+
+    def get_load_metrics(self, dialogue_pair: List[str]) -> Dict:
+        """
+        :return: the load metrics of the local models of the dialogue pair (see backends.Backend.get_load_metrics)
+        """
+        load_metrics = {}
+        for model_name in dialogue_pair:
+            remote = _lookup_remote(model_name)
+            if remote is not None and remote.get_load_metrics(model_name):
+                load_metrics[model_name] = remote.get_load_metrics(model_name)
+        return load_metrics
+
+    def run(self, player_backends: List[str], temperature: float, prewarm: bool = False):
         """
         Runs game-play on all game instances for a game.
+        With prewarm, local backends start to read the weights of the models from the disk before the first episode.
         There must be an instances.json with the following structure:
         "experiments": [ # this is required
             {
@@ -683,6 +484,8 @@ class GameBenchmark(GameResourceLocator):
         experiments: List = self.instances["experiments"]
         if not experiments:
             self.logger.warning(f"{self.name}: No experiments for %s", self.name)
+        if prewarm:
+            self.prewarm_models(player_backends)
         total_experiments = len(experiments)
         for experiment_idx, experiment in enumerate(experiments):
             experiment_name = experiment['name']
@@ -759,16 +562,24 @@ class GameBenchmark(GameResourceLocator):
                         game_master.setup(**game_instance)
                         game_master.play()
                         game_master.store_records(dialogue_pair_desc, game_id, episode_dir)
+                        results_index.add_episode(dialogue_pair_desc, self.name,
+                                                  experiment_record_dir, f"episode_{episode_counter}")
                     except Exception:  # continue with other episodes if something goes wrong
                         self.logger.exception(f"{self.name}: Exception for episode {game_id} (but continue)")
                         error_count += 1
+                    finally:
+                        # release the per-conversation state of the backends (e.g. cached keys and values)
+                        backends.configure(lambda backend: backend.end_episode())
                     episode_counter += 1
                 if error_count > 0:
                     stdout_logger.error(
                         f"{self.name}: '{error_count}' exceptions occurred: See clembench.log for details.")
-                # Add experiment duration and overwrite file
+                # Add experiment duration (and the load metrics of local models) and overwrite file
                 time_experiment_end = datetime.now() - time_experiment_start
                 experiment_config["duration"] = str(time_experiment_end)
+                model_loading = self.get_load_metrics(dialogue_pair)
+                if model_loading:
+                    experiment_config["model_loading"] = model_loading
                 self.store_results_file(experiment_config,
                                         f"experiment_{experiment_name}.json",
                                         dialogue_pair_desc,
@@ -786,67 +597,8 @@ class GameBenchmark(GameResourceLocator):
         raise NotImplementedError()
 
 
-class GameInstanceGenerator(GameResourceLocator):
-    """
-    Create all game instances for a game benchmark.
-
-    Results in a instances.json with the following structure:
-
-    "experiments": [ # this is required
-        {
-            "name": <experiment-name>, # this is required
-            "param1": "value1", # optional
-            "param2": "value2", # optional
-            "game_instances": [ # this is required
-                {"id": <value>, "initial_prompt": ... },
-                {"id": <value>, "initial_prompt": ... }
-            ]
-        }
-    ]
-    """
-
-    def __init__(self, name: str):
-        super().__init__(name)
-        self.instances = dict(experiments=list())
-
-    def add_experiment(self, experiment_name: str, dialogue_partners: List[Tuple[str, str]] = None) -> Dict:
-        """
-        Call this method and adjust the returned dict to configure the experiment.
-        For game instances use add_game_instance!
-        :param experiment_name: of the new game instance
-        :param dialogue_partners: a list of partner definitions for which the experiment will run
-        :return: a new game instance dict
-        """
-        experiment = collections.OrderedDict(name=experiment_name)
-        if dialogue_partners:
-            experiment["dialogue_partners"] = dialogue_partners
-        experiment["game_instances"] = list()
-        self.instances["experiments"].append(experiment)
-        return experiment
-
-    def add_game_instance(self, experiment: Dict, game_id):
-        """
-        Call this method and adjust the returned dict to configure the instance.
-        :param experiment: to which a new game instance should be added
-        :param game_id: of the new game instance
-        :return: a new game instance dict
-        """
-        game_instance = dict(game_id=game_id)
-        experiment["game_instances"].append(game_instance)
-        return game_instance
-
-    def on_generate(self):
-        raise NotImplementedError()
-
-    def generate(self):
-        self.on_generate()
-        self.store()
-
-    def store(self):
-        self.store_file(self.instances, "instances.json", sub_dir="in")
-
-
 def load_benchmarks(do_setup: bool = True) -> List[GameBenchmark]:
+    clemgame.load_games()
     game_benchmarks = []
     for gb_cls in GameBenchmark.__subclasses__():
         gb = gb_cls()  # subclasses should only get the model_name
@@ -866,6 +618,7 @@ def load_benchmark(game_name: str, do_setup: bool = True) -> GameBenchmark:
 
 
 def find_benchmark(game_name: str):
+    clemgame.load_games()
     for gb_cls in GameBenchmark.__subclasses__():
         gb = gb_cls()  # subclasses should only get the dialog_pair
         if gb.applies_to(game_name):
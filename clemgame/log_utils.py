@@ -0,0 +1,104 @@
+""" The logging setup of the clemgame package (from logging.yaml), also used by the backends, with the file writes behind a queue """
+import atexit
+import contextlib
+import logging
+import logging.config
+import logging.handlers
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+import yaml
+
+
+def configure_logging(project_root: str):
+    """ (Re-)configure logging from the project's logging.yaml and start the queue listener """
+    with open(os.path.join(project_root, "logging.yaml")) as f:
+        conf = yaml.safe_load(f)
+    log_fn = conf["handlers"]["file_handler"]["filename"]
+    log_fn = os.path.join(project_root, log_fn)
+    conf["handlers"]["file_handler"]["filename"] = log_fn
+    stop_queue_listener()
+    logging.config.dictConfig(conf)
+    start_queue_listener()
+
+
+def start_queue_listener():
+    """
+    Move the handlers of the root logger behind a queue, so that logging calls only enqueue the record
+    and a single listener thread does the (blocking) file writes.
+    """
+    root = logging.getLogger()
+    handlers = [h for h in root.handlers if not isinstance(h, logging.handlers.QueueHandler)]
+    if not handlers:
+        return
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.listener = listener
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    listener.start()
+
+
+def stop_queue_listener():
+    """Flush the queued records and stop the listener thread (if any) of the root logger."""
+    for handler in logging.getLogger().handlers:
+        listener = getattr(handler, "listener", None)
+        if listener is not None:
+            handler.listener = None
+            listener.stop()
+
+
+def detach_queue_listener():
+    """
+    Stop the listener thread (flushing the queued records) and let the current process write to the log handlers
+    directly.
+    """
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        listener = getattr(handler, "listener", None)
+        if listener is not None:
+            handler.listener = None
+            listener.stop()
+            root.removeHandler(handler)
+            for listener_handler in listener.handlers:
+                root.addHandler(listener_handler)
+
+
+@contextlib.contextmanager
+def process_pool(max_workers: int) -> Iterator[ProcessPoolExecutor]:
+    """
+    A pool of (forked) worker processes whose log records are written by a listener thread of this process, so that
+    only one process writes to (and rotates) the log file. The queue listener of this process is restarted after
+    the pool has exited.
+    """
+    # no fork while the listener thread holds the lock of a handler; this process writes to the handlers directly
+    detach_queue_listener()
+    root = logging.getLogger()
+    handlers = [h for h in root.handlers if not isinstance(h, logging.handlers.QueueHandler)]
+    log_queue = multiprocessing.Queue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_log_to_queue,
+                                 initargs=(log_queue,)) as executor:
+            yield executor
+    finally:
+        listener.stop()  # the workers have exited and flushed their records
+        log_queue.close()
+        start_queue_listener()
+
+
+def _log_to_queue(log_queue: multiprocessing.Queue):
+    """ the initializer of the worker processes: send the records of the root handlers to the parent's listener """
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+
+atexit.register(stop_queue_listener)
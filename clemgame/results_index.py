@@ -0,0 +1,113 @@
+"""
+A manifest of the played episodes in the results directory.
+
+The runner appends one line to results/index.jsonl per finished episode, so that scoring, transcription and
+evaluation can enumerate the episodes without walking the directory tree. Each line is a json object like:
+
+    {"dialogue_pair": "mock-t0.0--mock-t0.0", "game": "taboo", "experiment": "0_high_en", "episode": "episode_0"}
+
+where "experiment" and "episode" are the directory names below results/<dialogue_pair>/<game>.
+The index can be rebuilt from the directory tree with `python3 scripts/cli.py reindex`.
+"""
+import json
+import os
+from typing import Dict, List
+
+from clemgame import file_utils
+
+INDEX_FILE_NAME = "index.jsonl"
+EPISODE_MARKER_FILE = "interactions.json"
+
+
+def index_path(results_dir: str = None) -> str:
+    if results_dir is None:
+        results_dir = file_utils.results_root()
+    return os.path.join(results_dir, INDEX_FILE_NAME)
+
+
+def episode_key(entry: Dict) -> tuple:
+    return entry["dialogue_pair"], entry["game"], entry["experiment"], entry["episode"]
+
+
+def episode_path(entry: Dict, results_dir: str = None) -> str:
+    if results_dir is None:
+        results_dir = file_utils.results_root()
+    return os.path.join(results_dir, *episode_key(entry))
+
+
+def add_episode(dialogue_pair: str, game_name: str, experiment_dir: str, episode_dir: str,
+                results_dir: str = None):
+    """
+    Append a finished episode to the index. A single write per line keeps concurrent runs from interleaving.
+    A results directory without an index (e.g. from before the index existed) is indexed first, so that its
+    older episodes are not hidden by an index that only lists the new one.
+    """
+    entry = dict(dialogue_pair=dialogue_pair, game=game_name, experiment=experiment_dir, episode=episode_dir)
+    fp = index_path(results_dir)
+    os.makedirs(os.path.dirname(fp), exist_ok=True)
+    if not os.path.isfile(fp):
+        indexed = {episode_key(indexed_entry) for indexed_entry in rebuild(results_dir)}
+        if episode_key(entry) in indexed:  # the episode's interactions are already stored
+            return
+    with open(fp, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def rebuild(results_dir: str = None) -> List[Dict]:
+    """
+    Walk the results directory once and (over)write the index with all episodes that have interactions.
+    :return: the indexed episodes
+    """
+    if results_dir is None:
+        results_dir = file_utils.results_root()
+    entries = []
+    if not os.path.isdir(results_dir):
+        return entries
+    for dialogue_pair in _sub_dirs(results_dir):
+        pair_path = os.path.join(results_dir, dialogue_pair)
+        for game_name in _sub_dirs(pair_path):
+            game_path = os.path.join(pair_path, game_name)
+            for experiment_dir in _sub_dirs(game_path):
+                experiment_path = os.path.join(game_path, experiment_dir)
+                for episode_dir in _sub_dirs(experiment_path):
+                    if os.path.isfile(os.path.join(experiment_path, episode_dir, EPISODE_MARKER_FILE)):
+                        entries.append(dict(dialogue_pair=dialogue_pair, game=game_name,
+                                            experiment=experiment_dir, episode=episode_dir))
+    fp = index_path(results_dir)
+    tmp_fp = f"{fp}.{os.getpid()}.tmp"  # concurrent runs may rebuild at the same time
+    with open(tmp_fp, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    os.replace(tmp_fp, fp)
+    return entries
+
+
+def load_episodes(results_dir: str = None, game_name: str = None) -> List[Dict]:
+    """
+    Read the indexed episodes (in the order they were added, each episode once).
+    The index is built from the directory tree, if it does not exist yet.
+    :param results_dir: the results directory; default: results/ in the project root
+    :param game_name: only return the episodes of this game, if given
+    :return: the index entries
+    """
+    fp = index_path(results_dir)
+    if not os.path.isfile(fp):
+        entries = rebuild(results_dir)
+    else:
+        entries = []
+        with open(fp, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entries.append(json.loads(line))
+    unique_entries = {}
+    for entry in entries:
+        if game_name and entry["game"] != game_name:
+            continue
+        unique_entries[episode_key(entry)] = entry  # a re-run overwrites the episode directory
+    return list(unique_entries.values())
+
+
+def _sub_dirs(path: str) -> List[str]:
+    with os.scandir(path) as it:
+        return sorted(e.name for e in it if e.is_dir() and e.name != "__pycache__")
@@ -0,0 +1,446 @@
+"""
+The scoring of played episodes from their records only. Unlike clemgame.clemgame, this module does not import the
+backends (nor the game masters), so that scoring does not load any backend.
+"""
+import abc
+import collections
+import copy
+import hashlib
+import importlib
+import json
+import logging
+from datetime import datetime
+from typing import List, Dict, Tuple, Any
+
+from tqdm import tqdm
+
+import clemgame
+from clemgame import file_utils, results_index
+
+logger = clemgame.get_logger(__name__)
+stdout_logger = clemgame.get_logger("benchmark.run")
+
+# Showcases that should not be run for the overall benchmark (still can be run, when specified specifically)
+GAMES_TO_IGNORE = ["hellogame", "chatgame"]
+
+# Level of the GameRecorder messages that are emitted for every logged event and score (hot path)
+RECORDER_LOG_LEVEL = logging.INFO
+
+
+def set_recorder_log_level(level) -> None:
+    """
+    Set the level of the per-event and per-score GameRecorder messages for this run,
+    e.g. 'DEBUG' to keep them out of the clembench.log (with the default INFO configuration).
+    :param level: a logging level name or number
+    """
+    global RECORDER_LOG_LEVEL
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level: {level}")
+    RECORDER_LOG_LEVEL = level
+
+
+class GameResourceLocator(abc.ABC):
+    """
+    Provides access to game specific resources
+
+    Note: You should access resource only via the game resource locator! The locator knows how to refer to them.
+    For example use: `gm.load_json("my_file")` which is located directly at your game directory `game/my_file.json`.
+    You can access subdirectories by giving `gm.load_json("sub/my_file")` in `game/sub/my_file.json`.
+    """
+
+    def __init__(self, name: str):
+        """
+        :param name: of the game
+        """
+        self.name = name
+        self.logger = clemgame.get_logger(self.__class__.__module__)
+
+    def file_path(self, file_name: str) -> str:
+        """
+        The absolute path to a game file. Sometimes we only need the path to a file, but not to load it.
+        :param file_name: can be a sub-path
+        :return: the absolute path to the file in the game directory
+        """
+        return file_utils.file_path(file_name, self.name)
+
+    def load_template(self, file_name: str) -> str:
+        """
+        Load a .template file from your game directory
+        :param file_name: can have subdirectories e.g. "sub/my_file"
+        :return: the file contents
+        """
+        return file_utils.load_template(file_name, self.name)
+
+    def load_json(self, file_name: str) -> Dict:
+        """
+        Load a .json file from your game (or game results) directory
+        :param file_name: can have subdirectories e.g. "sub/my_file"
+        :return: the file contents
+        """
+        return file_utils.load_json(file_name, self.name)
+
+    def load_results_json(self, file_name: str, dialogue_pair: str) -> Dict:
+        """
+        Load a .json file from your game (or game results) directory
+        :param file_name: can have subdirectories e.g. "sub/my_file"
+        :return: the file contents
+        """
+        return file_utils.load_results_json(file_name, dialogue_pair, self.name)
+
+    def load_results_file(self, file_name: str, dialogue_pair: str) -> str:
+        """
+        Load an arbitrary file from your game results directory
+        :param file_name: can have subdirectories e.g. "sub/my_file"
+        :return: the file contents
+        """
+        return file_utils.load_results_file(file_name, dialogue_pair, self.name)
+
+    def load_csv(self, file_name: str) -> Dict:
+        """
+        Load a .csv file from your game directory
+        :param file_name: can have subdirectories e.g. "sub/my_file"
+        :return: the file contents
+        """
+        return file_utils.load_csv(file_name, self.name)
+
+    def load_file(self, file_name: str, file_ending: str = None) -> str:
+        """
+        Load an arbitrary file from your game directory
+        :param file_name: can have subdirectories e.g. "sub/my_file"
+        :param file_ending: if not given in file_name
+        :return: the file contents
+        """
+        return file_utils.load_file(file_name, self.name, file_ending=file_ending)
+
+    def store_file(self, data, file_name: str, sub_dir: str = None):
+        """
+        Store a file in your game directory. The top-level directory is 'games'.
+
+        :param sub_dir: automatically created when given; otherwise an error will be thrown.
+        :param data: to store
+        :param file_name: can have subdirectories e.g. "sub/my_file"
+        """
+        fp = file_utils.store_game_file(data, file_name, self.name, sub_dir=sub_dir)
+        self.logger.info("Game file stored to %s", fp)
+
+    def store_results_file(self, data, file_name: str, dialogue_pair: str, sub_dir: str = None):
+        """
+        Store a results file in your game results' directory. The top-level directory is 'results'.
+
+        :param sub_dir: automatically created when given; otherwise an error will be thrown.
+        :param data: to store
+        :param file_name: can have subdirectories e.g. "sub/my_file"
+        """
+        fp = file_utils.store_game_results_file(data, file_name, dialogue_pair, self.name, sub_dir=sub_dir)
+        self.logger.info("Results file stored to %s", fp)
+
+    def results_path_for(self, dialogue_pair: str):
+        return file_utils.game_results_dir_for(dialogue_pair, self.name)
+
+    def applies_to(self, game_name: str) -> bool:
+        return game_name == self.name
+
+
+class GameRecorder(GameResourceLocator):
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.log_current_turn = -1
+        """ Stores players and turn during the runs """
+        self.interactions = {
+            "players": {},
+            "turns": []
+        }
+        """ Stores calls to the API """
+        self.requests = []
+        """ Stores values of score computation """
+        self.scores = {
+            "turn scores": {},
+            "episode scores": {},
+        }
+
+    def store_scores(self, dialogue_pair, game_record_dir, fingerprint: Dict = None):
+        """
+        :param fingerprint: of the scoring inputs and code; stored along the scores to detect up-to-date episodes
+        """
+        scores = self.scores
+        if fingerprint:
+            scores = dict(self.scores, fingerprint=fingerprint)
+        self.store_results_file(scores, "scores.json", dialogue_pair, sub_dir=game_record_dir)
+
+    def log_next_turn(self):
+        """ Call this method to group interactions per turn """
+        self.log_current_turn += 1
+        self.interactions["turns"].append([])
+
+    def log_key(self, key: str, value: Any):
+        """Add a key and value to the internal log."""
+        self.interactions[key] = value
+        self.logger.log(RECORDER_LOG_LEVEL, "%s: Logged a game-specific interaction key: %s.", self.name, key)
+
+    def log_players(self, players_dic: Dict):
+        self.interactions["players"] = players_dic
+        self.logger.log(RECORDER_LOG_LEVEL, "%s: Logged players metadata.", self.name)
+
+    def log_event(self, from_: str, to: str, action: Dict, call: Tuple[Any, Any] = None):
+        """
+        Add an event to the internal log. It can be only an action or an action
+        plus an API call that should have the same timestamp as the action.
+
+        call, if given, is a tuple whose first element is the input prompt
+        object (after API-specific manipulation) as passed to the API and the
+        second element is the raw response object as returned by the API.
+        """
+        assert self.log_current_turn >= 0, f"Call log_add_new_turn at least once " \
+                                           f"(log_current_turn={self.log_current_turn})"
+        timestamp = datetime.now().isoformat()
+        action_obj = {
+            "from": from_,
+            "to": to,
+            "timestamp": timestamp,
+            "action": action
+        }
+        self.interactions["turns"][self.log_current_turn].append(action_obj.copy())
+        self.logger.log(RECORDER_LOG_LEVEL, "%s: Logged %s action (%s->%s).", self.name, action['type'], from_, to)
+        if call:
+            call_obj = {
+                "timestamp": timestamp,
+                "manipulated_prompt_obj": self._needs_copy(call[0]),
+                "raw_response_obj": self._needs_copy(call[1])
+            }
+            self.requests.append(call_obj)
+            self.logger.log(RECORDER_LOG_LEVEL, "%s: Logged a call with timestamp %s", self.name, timestamp)
+
+    @staticmethod
+    def _needs_copy(call_obj):
+        if isinstance(call_obj, Dict) or isinstance(call_obj, List):
+            return copy.deepcopy(call_obj)
+        elif isinstance(call_obj, str):
+            return call_obj[:]
+        return call_obj
+
+    def log_turn_score(self, turn_idx, score_name, score_value):
+        if isinstance(score_value, bool):
+            self.logger.warning("%s: Score %s value is boolean, this can break the eval!", self.name, score_name)
+        if turn_idx not in self.scores["turn scores"]:
+            self.scores["turn scores"][turn_idx] = {}
+        if score_name in self.scores["turn scores"][turn_idx]:
+            self.logger.warning("%s: Score %s overwritten at turn %s!", self.name, score_name, turn_idx)
+        self.scores["turn scores"][turn_idx][score_name] = score_value
+        self.logger.log(RECORDER_LOG_LEVEL, "%s: Logged turn %s score %s=%s.",
+                        self.name, turn_idx, score_name, score_value)
+
+    def log_episode_score(self, score_name, score_value):
+        if score_name in self.scores["episode scores"]:
+            self.logger.warning("%s: Episode score %s overwritten!", self.name, score_name)
+        self.scores["episode scores"][score_name] = score_value
+        self.logger.log(RECORDER_LOG_LEVEL, "%s: Logged episode score %s=%s.", self.name, score_name, score_value)
+
+    def store_records(self, dialogue_pair_desc: str, game_id: int, game_record_dir: str):
+        """Raise warnings if a mandatory element is empty or format is wrong."""
+        if not self.interactions["players"]:
+            self.logger.warning(f"Players metadada is missing!")
+        else:
+            for name in self.interactions["players"]:
+                """The transcript builder relies on specific player identifiers."""
+                try:
+                    assert name == "GM" or name.startswith("Player ")
+                except AssertionError:
+                    self.logger.warning(f"Invalid player identifiers, html builder won't work.")
+        if not self.interactions["turns"]:
+            self.logger.warning(f"Interaction logs are missing!")
+        if not self.requests:
+            self.logger.warning(f"No calls logged!")
+        self.store_results_file(self.interactions, "interactions.json",
+                                dialogue_pair_desc,
+                                sub_dir=game_record_dir)
+        self.store_results_file(self.requests, "requests.json",
+                                dialogue_pair_desc,
+                                sub_dir=game_record_dir)
+
+
+class GameScorer(GameRecorder):
+    """
+    The game scorer computes the scores of a played episode from its records only.
+
+    Unlike the game master, the scorer does not create players (and thus does not look up backends) nor load
+    any game resources: it is given only the experiment config and the game instance, so that it is cheap to
+    create for each episode and can be pickled to other processes.
+    """
+
+    def __init__(self, name: str, experiment: Dict, game_instance: Dict):
+        """
+        :param name: of the game
+        :param experiment: the experiment config of the episode
+        :param game_instance: the game instance of the episode
+        """
+        super().__init__(name)
+        self.experiment = experiment
+        self.game_instance = game_instance
+
+    def compute_scores(self, episode_interactions: Dict) -> None:
+        """
+        Loop over the game records to compute and log all turn and episode scores.
+        """
+        raise NotImplementedError()
+
+
+class GameScoring(GameResourceLocator):
+    """
+    Scores the indexed episodes of a game with the game scorer of its scorer module (games/<game>/scorer.py).
+
+    The scorer module provides a create_game_scorer(experiment, game_instance) function and optionally
+    a SCORES_VERSION (see get_scores_version).
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.filter_experiment: List[str] = []
+
+    def get_scores_version(self) -> int:
+        """
+        The version of the game's scoring code. Increase the SCORES_VERSION of the scorer module when the scores
+        computation changes, so that incremental scoring re-scores the already scored episodes.
+        :return: scores version
+        """
+        scorer_module = load_scorer_module(self.name)
+        return getattr(scorer_module, "SCORES_VERSION", 1)
+
+    def indexed_experiments(self, action: str) -> List[Tuple[str, str, str, List[str]]]:
+        """
+        Group the indexed episodes of this game by dialogue pair and experiment (see results_index).
+        :param action: for logging, e.g. 'Scoring'
+        :return: tuples of dialogue pair, experiment directory, experiment name and episode directories
+        """
+        episodes_by_experiment = collections.OrderedDict()
+        for entry in results_index.load_episodes(game_name=self.name):
+            experiment_key = (entry["dialogue_pair"], entry["experiment"])
+            episodes_by_experiment.setdefault(experiment_key, []).append(entry["episode"])
+        if not episodes_by_experiment:
+            stdout_logger.info(f"{self.name}: No episodes found in the results index")
+        experiments = []
+        for (dialogue_pair, experiment_dir), episode_dirs in episodes_by_experiment.items():
+            experiment_name = "_".join(experiment_dir.split("_")[1:])  # remove leading index number
+            if self.filter_experiment and experiment_name not in self.filter_experiment:
+                stdout_logger.info(f"Skip experiment {experiment_name}")
+                continue
+            stdout_logger.info(f"{action}: {experiment_name} ({dialogue_pair})")
+            experiments.append((dialogue_pair, experiment_dir, experiment_name, episode_dirs))
+        return experiments
+
+    def compute_scores(self, force: bool = False):
+        """
+        Score the episodes of the game, skipping those whose scores.json is up-to-date (see compute_episode_scores).
+        :param force: re-score all episodes
+        """
+        for dialogue_pair, experiment_dir, experiment_name, episode_dirs in self.indexed_experiments("Scoring"):
+            experiment_config = self.load_results_json(f"{experiment_dir}/experiment_{experiment_name}",
+                                                       dialogue_pair)
+            error_count = 0
+            skip_count = 0
+            for episode_dir in tqdm(episode_dirs, desc="Scoring episodes"):
+                try:
+                    if not self.compute_episode_scores(dialogue_pair, experiment_config,
+                                                       f"{experiment_dir}/{episode_dir}", force=force):
+                        skip_count += 1
+                except Exception:  # continue with other episodes if something goes wrong
+                    self.logger.exception(f"{self.name}: Cannot score {episode_dir} (but continue)")
+                    error_count += 1
+            if skip_count > 0:
+                stdout_logger.info(f"{self.name}: Skipped {skip_count} up-to-date episodes (use --force to re-score)")
+            if error_count > 0:
+                stdout_logger.error(
+                    f"{self.name}: '{error_count}' exceptions occurred: See clembench.log for details.")
+
+    def compute_episode_scores(self, dialogue_pair: str, experiment_config: Dict, rel_episode_path: str,
+                               force: bool = False) -> bool:
+        """
+        Score a single episode and store its scores.json, unless the stored scores have been computed
+        from the same instance.json and interactions.json with the same scores version.
+        :param dialogue_pair: the results directory of the players e.g. 'mock-t0.0--mock-t0.0'
+        :param experiment_config: the experiment.json of the episode
+        :param rel_episode_path: the episode directory relative to the game results e.g. '0_high_en/episode_0'
+        :param force: score the episode even when the scores are up-to-date
+        :return: True, if the episode has been scored; False, if it has been skipped
+        """
+        instance_file = self.load_results_file(f"{rel_episode_path}/instance.json", dialogue_pair)
+        interactions_file = self.load_results_file(f"{rel_episode_path}/interactions.json", dialogue_pair)
+        fingerprint = {
+            "scores version": self.get_scores_version(),
+            "inputs": hashlib.sha1((instance_file + interactions_file).encode("utf-8")).hexdigest()
+        }
+        if not force and self._load_scores_fingerprint(dialogue_pair, rel_episode_path) == fingerprint:
+            return False
+
+        game_instance = json.loads(instance_file)
+        game_interactions = json.loads(interactions_file)
+
+        scorer = self.create_game_scorer(experiment_config, game_instance)
+        if scorer is None:  # the game is scored by its game master
+            scorer = self.create_master_scorer(dialogue_pair, experiment_config, game_instance)
+        scorer.compute_scores(game_interactions)
+        scorer.store_scores(dialogue_pair, rel_episode_path, fingerprint=fingerprint)
+        return True
+
+    def _load_scores_fingerprint(self, dialogue_pair: str, rel_episode_path: str) -> Dict:
+        try:
+            return self.load_results_json(f"{rel_episode_path}/scores", dialogue_pair).get("fingerprint")
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def create_game_scorer(self, experiment: Dict, game_instance: Dict) -> GameScorer:
+        """
+        Games that implement a GameScorer (in their scorer module) are scored without setting up a game master
+        (and its players).
+
+        :return: the scorer for an episode of the game; None, if the game master computes the scores
+        """
+        scorer_module = load_scorer_module(self.name)
+        if scorer_module is None:
+            return None
+        return scorer_module.create_game_scorer(experiment, game_instance)
+
+    def create_master_scorer(self, dialogue_pair: str, experiment: Dict, game_instance: Dict) -> GameRecorder:
+        """
+        :return: the set up game master of an episode, for games that are scored by their game master
+        """
+        raise NotImplementedError(f"{self.name}: No game scorer (see games/{self.name}/scorer.py)")
+
+
+# the imported scorer modules by game name (None for games without)
+_scorer_modules = {}
+
+
+def load_scorer_module(game_name: str):
+    """
+    :return: the scorer module of the game (games/<game>/scorer.py); None, if the game has none
+    """
+    if game_name not in _scorer_modules:
+        module_name = f"games.{game_name}.scorer"
+        try:
+            _scorer_modules[game_name] = importlib.import_module(module_name)
+        except ModuleNotFoundError as e:
+            if e.name not in (module_name, f"games.{game_name}"):
+                raise
+            _scorer_modules[game_name] = None
+    return _scorer_modules[game_name]
+
+
+def find_scoring(game_name: str) -> GameScoring:
+    """
+    :return: the scoring of the game; the game benchmark (which imports the backends) only for games without scorer
+    """
+    if load_scorer_module(game_name) is not None:
+        return GameScoring(game_name)
+    from clemgame.clemgame import find_benchmark
+    return find_benchmark(game_name)
+
+
+def load_scorings() -> List[GameScoring]:
+    """
+    :return: the scorings of all games, except the showcases (see GAMES_TO_IGNORE)
+    """
+    return [find_scoring(game_name) for game_name in sorted(clemgame.games_modules)
+            if game_name not in GAMES_TO_IGNORE]
@@ -0,0 +1,198 @@
+"""
+A local http server that renders the transcripts of the played episodes on demand,
+so that building transcript.html and transcript.tex for all episodes (`cli.py transcribe`) becomes optional.
+
+    python3 scripts/cli.py serve-transcripts
+
+The index page lists the indexed episodes (see results_index) by dialogue pair, game and experiment.
+The transcripts are served at the same paths as in the results directory e.g.
+
+    /mock-t0.0--mock-t0.0/taboo/0_high_en/episode_0/transcript.html
+
+The rendered transcripts are kept in an LRU cache. A cached transcript is re-rendered, when the
+interactions.json of the episode changed (e.g. the episode has been played again).
+The episodes of the index are loaded once and again only when index.jsonl changed.
+"""
+import collections
+import functools
+import html
+import http.server
+import json
+import os
+import threading
+from typing import Dict, Tuple
+from urllib.parse import quote, unquote, urlsplit
+
+import clemgame
+from clemgame import file_utils, results_index, transcript_utils
+
+logger = clemgame.get_logger(__name__)
+stdout_logger = clemgame.get_logger("benchmark.run")
+
+TRANSCRIPT_FILES = {
+    "transcript.html": "text/html; charset=utf-8",
+    "transcript.tex": "text/plain; charset=utf-8"
+}
+
+
+class TranscriptServer(http.server.ThreadingHTTPServer):
+
+    def __init__(self, address: Tuple[str, int], results_dir: str = None, cache_size: int = 256):
+        """
+        :param address: the host and port to listen on
+        :param results_dir: the results directory; default: results/ in the project root
+        :param cache_size: the number of rendered transcripts to keep
+        """
+        super().__init__(address, TranscriptRequestHandler)
+        self.results_dir = results_dir if results_dir else file_utils.results_root()
+        self.render_transcript = functools.lru_cache(maxsize=cache_size)(self._render_transcript)
+        self.episodes: Dict[Tuple[str, str, str, str], Dict] = {}  # episode key -> index entry
+        self.episodes_version = None  # the modification time and size of the loaded index.jsonl
+        self.episodes_lock = threading.Lock()
+
+    def indexed_episodes(self) -> Dict[Tuple[str, str, str, str], Dict]:
+        """
+        :return: the index entries by episode key (loaded again only when index.jsonl changed)
+        """
+        with self.episodes_lock:
+            version = _file_version(results_index.index_path(self.results_dir))
+            if version is None or version != self.episodes_version:
+                entries = results_index.load_episodes(self.results_dir)  # rebuilds a missing index
+                self.episodes = {results_index.episode_key(entry): entry for entry in entries}
+                self.episodes_version = _file_version(results_index.index_path(self.results_dir))
+            return self.episodes
+
+    def find_episode(self, episode_key: Tuple[str, str, str, str]) -> Dict:
+        """
+        :return: the index entry of the episode; None, if the episode is not indexed
+        """
+        return self.indexed_episodes().get(episode_key)
+
+    def get_transcript(self, entry: Dict, file_name: str) -> str:
+        episode_path = results_index.episode_path(entry, self.results_dir)
+        interactions_mtime = os.path.getmtime(os.path.join(episode_path, "interactions.json"))
+        return self.render_transcript(results_index.episode_key(entry), file_name, interactions_mtime)
+
+    def _render_transcript(self, episode_key: Tuple[str, str, str, str], file_name: str,
+                           interactions_mtime: float) -> str:
+        """ Note: interactions_mtime is only part of the cache key """
+        dialogue_pair, game_name, experiment_dir, episode_dir = episode_key
+        experiment_path = os.path.join(self.results_dir, dialogue_pair, game_name, experiment_dir)
+        interactions = _load_json(os.path.join(experiment_path, episode_dir, "interactions.json"))
+        if file_name == "transcript.tex":
+            return transcript_utils.build_tex(interactions)
+        experiment_name = "_".join(experiment_dir.split("_")[1:])  # remove leading index number
+        experiment_config = _load_json(os.path.join(experiment_path, f"experiment_{experiment_name}.json"))
+        game_instance = _load_json(os.path.join(experiment_path, episode_dir, "instance.json"))
+        return transcript_utils.build_transcript(interactions, experiment_config, game_instance, dialogue_pair)
+
+    def build_index_page(self) -> str:
+        episodes = collections.defaultdict(list)
+        for entry in self.indexed_episodes().values():
+            episodes[(entry["dialogue_pair"], entry["game"], entry["experiment"])].append(entry)
+        page = [INDEX_HEADER]
+        current_pair, current_game = None, None
+        for dialogue_pair, game_name, experiment_dir in sorted(episodes):
+            if dialogue_pair != current_pair:
+                page.append(f"<h2>{html.escape(dialogue_pair)}</h2>\n")
+                current_pair, current_game = dialogue_pair, None
+            if game_name != current_game:
+                page.append(f"<h3>{html.escape(game_name)}</h3>\n")
+                current_game = game_name
+            entries = sorted(episodes[(dialogue_pair, game_name, experiment_dir)], key=_episode_number)
+            links = [_episode_link(entry) for entry in entries]
+            page.append(f"<p><b>{html.escape(experiment_dir)}</b>: {' '.join(links)}</p>\n")
+        if not episodes:
+            page.append(f"<p>No episodes found in {html.escape(self.results_dir)}</p>\n")
+        page.append(INDEX_FOOTER)
+        return "".join(page)
+
+
+class TranscriptRequestHandler(http.server.BaseHTTPRequestHandler):
+    server: TranscriptServer
+
+    def do_GET(self):
+        path = unquote(urlsplit(self.path).path)
+        if path in ("/", "/index.html"):
+            self._send(200, self.server.build_index_page(), "text/html; charset=utf-8")
+            return
+        parts = path.strip("/").split("/")
+        if len(parts) != 5 or parts[4] not in TRANSCRIPT_FILES:
+            self._send(404, "Not found", "text/plain; charset=utf-8")
+            return
+        entry = self.server.find_episode(tuple(parts[:4]))
+        if entry is None:  # only serve indexed episodes (this also rules out paths outside the results)
+            self._send(404, "Episode not found", "text/plain; charset=utf-8")
+            return
+        try:
+            transcript = self.server.get_transcript(entry, parts[4])
+        except Exception:
+            logger.exception("Cannot render %s", path)
+            self._send(500, "Cannot render the transcript: See clembench.log for details.",
+                       "text/plain; charset=utf-8")
+            return
+        self._send(200, transcript, TRANSCRIPT_FILES[parts[4]])
+
+    def _send(self, status: int, content: str, content_type: str):
+        body = content.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+
+INDEX_HEADER = '''<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Interaction Transcripts</title>
+</head>
+<body>
+<h1>Interaction Transcripts</h1>
+'''
+
+INDEX_FOOTER = '''
+</body>
+</html>
+'''
+
+
+def _episode_link(entry: Dict) -> str:
+    url = "/" + "/".join(quote(part) for part in results_index.episode_key(entry))
+    label = html.escape(entry["episode"].replace("episode_", ""))
+    return f'<a href="{url}/transcript.html">{label}</a> (<a href="{url}/transcript.tex">tex</a>)'
+
+
+def _episode_number(entry: Dict):
+    number = entry["episode"].split("_")[-1]
+    return (0, int(number), "") if number.isdigit() else (1, 0, entry["episode"])
+
+
+def _file_version(file_path: str):
+    """ the modification time and size of the file (None, if it does not exist) """
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _load_json(file_path: str) -> Dict:
+    with open(file_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def serve(host: str = "localhost", port: int = 8000, results_dir: str = None, cache_size: int = 256):
+    server = TranscriptServer((host, port), results_dir, cache_size)
+    stdout_logger.info(f"Serving the transcripts of {server.results_dir} at http://{host}:{port}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info("Transcript cache: %s", server.render_transcript.cache_info())
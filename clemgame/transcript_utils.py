@@ -85,6 +85,25 @@ TEX_FOOTER = '''
 '''
 
 
+def _split_tex_bubble(class_name: str):
+    """The parts of the TeX template before and after the message (which is the only part that varies)."""
+    rgb, speakers, cols_init, cols_end, ncols, width = TEX_BUBBLE_PARAMS[class_name]
+    marker = "\0"
+    bubble = TEX_TEMPLATE.substitute(cols_init=cols_init,
+                                     rgb=rgb,
+                                     speakers=speakers,
+                                     msg=marker,
+                                     cols_end=cols_end,
+                                     ncols=ncols,
+                                     width=width)
+    return tuple(bubble.split(marker))
+
+
+# The templates are rendered once: the header with the inlined css and the TeX bubbles for each speaker class
+HTML_HEADER_WITH_CSS = HTML_HEADER.format(CSS_STRING)
+TEX_BUBBLES = {class_name: _split_tex_bubble(class_name) for class_name in TEX_BUBBLE_PARAMS}
+
+
 def _get_class_name(event):
     if event['from'] == 'GM' and event['to'] == 'Player 1':
         return "gm-a"
@@ -100,10 +119,9 @@ def _get_class_name(event):
 
 def build_transcript(interactions: Dict, experiment_config: Dict, game_instance: Dict, dialogue_pair: str):
     """Create an html with the interaction transcript."""
-    transcript = HTML_HEADER.format(CSS_STRING)
     title = f"Interaction Transcript for {experiment_config['name']}, " \
             f"episode {game_instance['game_id']} with {dialogue_pair}."
-    transcript += top_info.format(title)
+    transcript = [HTML_HEADER_WITH_CSS, top_info.format(title)]
     # Collect all events over all turns (ignore turn boundaries here)
     events = [event for turn in interactions['turns'] for event in turn]
     for event in events:
@@ -113,13 +131,13 @@ def build_transcript(interactions: Dict, experiment_config: Dict, game_instance:
             speaker = f'Game Master: {event["action"]["type"]}'
         else:
             speaker = f"{event['from'].replace('GM', 'Game Master')} to {event['to'].replace('GM', 'Game Master')}"
-        transcript += HTML_TEMPLATE.format(speaker, class_name, msg_content)
-    transcript += HTML_FOOTER
-    return transcript
+        transcript.append(HTML_TEMPLATE.format(speaker, class_name, msg_content))
+    transcript.append(HTML_FOOTER)
+    return "".join(transcript)
 
 
 def build_tex(interactions: Dict):
-    tex = TEX_HEADER
+    tex = [TEX_HEADER]
     # Collect all events over all turns (ignore turn boundaries here)
     events = [event for turn in interactions['turns'] for event in turn]
     for event in events:
@@ -127,13 +145,7 @@ def build_tex(interactions: Dict):
         msg_content = event['action']['content']
         if isinstance(msg_content, str):
             msg_content = msg_content.replace('\n', '\\\\ \\tt ')
-        rgb, speakers, cols_init, cols_end, ncols, width = TEX_BUBBLE_PARAMS[class_name]
-        tex += TEX_TEMPLATE.substitute(cols_init=cols_init,
-                                       rgb=rgb,
-                                       speakers=speakers,
-                                       msg=msg_content,
-                                       cols_end=cols_end,
-                                       ncols=ncols,
-                                       width=width)
-    tex += TEX_FOOTER
-    return tex
+        bubble_start, bubble_end = TEX_BUBBLES[class_name]
+        tex.extend((bubble_start, f"{msg_content}", bubble_end))
+    tex.append(TEX_FOOTER)
+    return "".join(tex)
@@ -2,7 +2,8 @@
 Clembench Evaluation
 
 This script produces the main table with benchmark results, for all models
-and games in the given results directory structure.
+and games in the given results directory structure, and the bootstrap
+confidence intervals of the results (see bootstrap.py).
 
 """
 from argparse import ArgumentParser
@@ -10,10 +11,14 @@ from pathlib import Path
 
 import pandas as pd
 
+import evaluation.bootstrap as bootstrap
 import evaluation.evalutils as utils
+import evaluation.streaming as streaming
 import clemgame.metrics as clemmetrics
 
 TABLE_NAME = 'results'
+CI_TABLE_NAME = 'results_ci'
+CI_DIFFS_TABLE_NAME = 'results_ci_diffs'
 
 
 class PlayedScoreError(Exception):
@@ -33,27 +38,89 @@ def save_clem_table(df: pd.DataFrame, path: str) -> None:
     df_aux = df[df['metric'].isin(utils.MAIN_METRICS)]
 
     # compute mean benchscore and mean played (which is binary, so a proportion)
-    df_a = (df_aux.groupby(['game', 'model', 'metric'])
+    df_a = (df_aux.groupby(['game', 'model', 'metric'], observed=True)
                   .mean(numeric_only=True)
                   .reset_index())
+
+    # compute the std of benchscore
+    df_aux_b = df_aux[df_aux.metric == clemmetrics.BENCH_SCORE]
+    df_b = (df_aux_b.groupby(['game', 'model', 'metric'], observed=True)
+                    .std(numeric_only=True)
+                    .reset_index())
+    save_results_table(df_a, df_b, path)
+
+
+def save_clem_table_streaming(path: str,
+                              chunk_size: int = streaming.CHUNK_SIZE) -> None:
+    """Create benchmark results as a table, aggregating the scores in chunks.
+
+    The table is the same as with save_clem_table, but the scores are never
+    all in memory (see streaming.py).
+    """
+    stats = streaming.aggregate_episode_scores(path, chunk_size=chunk_size)
+    save_clem_table_from_stats(stats, path)
+
+
+def save_clem_table_incremental(path: str,
+                                chunk_size: int = streaming.CHUNK_SIZE,
+                                rebuild: bool = False) -> None:
+    """Create benchmark results as a table, updating the persisted statistics.
+
+    Only the scores of the dialogue pairs that were added or changed since
+    the last run are read (see streaming.update_state). The table is the
+    same as with save_clem_table.
+    """
+    stats = streaming.update_state(path, chunk_size=chunk_size,
+                                   rebuild=rebuild)
+    save_clem_table_from_stats(stats, path)
+
+
+def save_clem_table_from_stats(stats: pd.DataFrame, path: str) -> None:
+    """Create benchmark results as a table from the score statistics."""
+    metrics = stats.index.get_level_values('metric')
+    if clemmetrics.METRIC_PLAYED in metrics:
+        raise PlayedScoreError("Computed scores should not contain METRIC_PLAYED.")
+    # PLAYED is the complement of ABORTED, so it has the same variance
+    played = stats[metrics == clemmetrics.METRIC_ABORTED].copy()
+    played['sum'] = played['count'] - played['sum']
+    played = played.rename(
+        index={clemmetrics.METRIC_ABORTED: clemmetrics.METRIC_PLAYED},
+        level='metric')
+    stats = pd.concat([stats, played])
+
+    df_stats = streaming.stats_summary(
+        streaming.combine_stats(stats, ['game', 'model', 'metric']))
+    df_stats = df_stats.reset_index()
+    df_a = (df_stats[df_stats['metric'].isin(utils.MAIN_METRICS)]
+            [['game', 'model', 'metric', 'mean']]
+            .rename(columns={'mean': 'value'}))
+    df_b = (df_stats[df_stats['metric'] == clemmetrics.BENCH_SCORE]
+            [['game', 'model', 'metric', 'std']]
+            .rename(columns={'std': 'value'}))
+    save_results_table(df_a, df_b, path)
+
+
+def save_results_table(df_a: pd.DataFrame, df_b: pd.DataFrame,
+                       path: str) -> None:
+    """Save the results table from the mean main scores and their std.
+
+    :param df_a: the mean of each main metric, per game and model
+    :param df_b: the std of the benchscore, per game and model
+    """
+    df_a = df_a.copy()
     df_a.loc[df_a.metric == clemmetrics.METRIC_PLAYED, 'value'] *= 100
     df_a = df_a.round(2)
     df_a['metric'].replace(
         {clemmetrics.METRIC_PLAYED: '% '+clemmetrics.METRIC_PLAYED},
         inplace=True)
 
-    # compute the std of benchscore
-    df_aux_b = df_aux[df_aux.metric == clemmetrics.BENCH_SCORE]
-    df_b = (df_aux_b.groupby(['game', 'model', 'metric'])
-                    .std(numeric_only=True)
-                    .reset_index()
-                    .round(2))
+    df_b = df_b.round(2)
     df_b['metric'].replace(
         {clemmetrics.BENCH_SCORE: clemmetrics.BENCH_SCORE+' (std)'},
         inplace=True)
 
     # compute the macro-average main score over games, per model
-    df_all = (df_a.groupby(['model', 'metric'])
+    df_all = (df_a.groupby(['model', 'metric'], observed=True)
                   .mean(numeric_only=True)
                   .reset_index()
                   .round(2))
@@ -87,25 +154,81 @@ def save_clem_table(df: pd.DataFrame, path: str) -> None:
     print(f'\n Saved results into {path}/{TABLE_NAME}.csv and .html')
 
 
+def save_ci_tables(df: pd.DataFrame, path: str,
+                   n_resamples: int = bootstrap.N_RESAMPLES) -> None:
+    """Create tables with the bootstrap confidence intervals of the results.
+
+    The bootstrap results are cached in the results folder and only computed
+    again when the scores changed.
+    """
+    cache_file = Path(path) / bootstrap.CACHE_FILE
+    df_ci, df_ci_diffs = bootstrap.load_or_bootstrap_cis(
+        df, cache_file, n_resamples=n_resamples)
+    df_ci.to_csv(Path(path) / f'{CI_TABLE_NAME}.csv', index=False)
+    df_ci_diffs.to_csv(Path(path) / f'{CI_DIFFS_TABLE_NAME}.csv', index=False)
+    print(f' Saved confidence intervals into {path}/{CI_TABLE_NAME}.csv '
+          f'and {CI_DIFFS_TABLE_NAME}.csv')
+
+
 if __name__ == '__main__':
     parser = ArgumentParser()
     parser.add_argument("-p", "--results_path",
                         type=str,
                         default='./results',
                         help="Path to the results folder containing scores.")
+    parser.add_argument("--no_cache",
+                        action='store_true',
+                        help="Read all scores files, ignoring the scores "
+                             "cache in the results folder.")
+    parser.add_argument("--resamples",
+                        type=int,
+                        default=bootstrap.N_RESAMPLES,
+                        help="Number of bootstrap resamples for the "
+                             "confidence intervals. 0 to skip them. "
+                             f"Default: {bootstrap.N_RESAMPLES}.")
+    parser.add_argument("--streaming",
+                        action='store_true',
+                        help="Aggregate the scores files in chunks, without "
+                             "keeping all scores in memory (for very large "
+                             "results folders). The confidence intervals "
+                             "need all scores, so they are skipped.")
+    parser.add_argument("--chunk_size",
+                        type=int,
+                        default=streaming.CHUNK_SIZE,
+                        help="Number of scores files read at once with "
+                             f"--streaming. Default: {streaming.CHUNK_SIZE}.")
+    parser.add_argument("--incremental",
+                        action='store_true',
+                        help="Update the statistics persisted in the results "
+                             "folder with the dialogue pairs that were added "
+                             "or changed since the last run, instead of "
+                             "reading all scores files. As with --streaming, "
+                             "the confidence intervals are skipped.")
+    parser.add_argument("--rebuild_state",
+                        action='store_true',
+                        help="Aggregate all dialogue pairs again with "
+                             "--incremental.")
     args = parser.parse_args()
 
-    # Get all episode scores as a pandas dataframe
-    scores = utils.load_scores(path=args.results_path)
-    df_episode_scores = utils.build_df_episode_scores(scores)
-
-    # Create the PLAYED variable, inferring it from ABORTED
-    if clemmetrics.METRIC_PLAYED in df_episode_scores['metric'].unique():
-        raise PlayedScoreError("Computed scores should not contain METRIC_PLAYED.")
-    aux = df_episode_scores[df_episode_scores["metric"] == clemmetrics.METRIC_ABORTED].copy()
-    aux["metric"] = clemmetrics.METRIC_PLAYED
-    aux["value"] = 1 - aux["value"]
-    # We need ignore_index=True to reset the indices (otherwise we have duplicates)
-    df_episode_scores = pd.concat([df_episode_scores, aux], ignore_index=True)
-
-    save_clem_table(df_episode_scores, args.results_path)
+    if args.incremental:
+        save_clem_table_incremental(args.results_path, args.chunk_size,
+                                    rebuild=args.rebuild_state)
+    elif args.streaming:
+        save_clem_table_streaming(args.results_path, args.chunk_size)
+    else:
+        # Get all episode scores as a pandas dataframe
+        _, _, df_episode_scores = utils.load_score_tables(
+            path=args.results_path, use_cache=not args.no_cache)
+
+        # Create the PLAYED variable, inferring it from ABORTED
+        if clemmetrics.METRIC_PLAYED in df_episode_scores['metric'].unique():
+            raise PlayedScoreError("Computed scores should not contain METRIC_PLAYED.")
+        aux = df_episode_scores[df_episode_scores["metric"] == clemmetrics.METRIC_ABORTED].copy()
+        aux["metric"] = clemmetrics.METRIC_PLAYED
+        aux["value"] = 1 - aux["value"]
+        # We need ignore_index=True to reset the indices (otherwise we have duplicates)
+        df_episode_scores = pd.concat([df_episode_scores, aux], ignore_index=True)
+
+        save_clem_table(df_episode_scores, args.results_path)
+        if args.resamples > 0:
+            save_ci_tables(df_episode_scores, args.results_path, args.resamples)
@@ -0,0 +1,66 @@
+"""
+Benchmark for building the score dataframes
+
+This script times utils.build_df_episode_scores and
+utils.build_df_turn_scores on a synthetic archive of scores, e.g.
+
+    python3 evaluation/benchmark_dataframes.py --episodes 100000
+
+The synthetic archive mimics the structure returned by utils.load_scores,
+so no results directory is needed.
+"""
+import random
+import time
+from argparse import ArgumentParser
+
+import evaluation.evalutils as utils
+import clemgame.metrics as clemmetrics
+
+
+def build_synthetic_scores(n_episodes: int, n_turns: int, seed: int = 42,
+                           n_games: int = 7, n_models: int = 11,
+                           n_experiments: int = 5) -> dict:
+    """Create scores for n_episodes spread over games, models, experiments."""
+    rng = random.Random(seed)
+    turn_metrics = [clemmetrics.METRIC_REQUEST_COUNT,
+                    clemmetrics.METRIC_REQUEST_COUNT_PARSED,
+                    clemmetrics.METRIC_REQUEST_COUNT_VIOLATED,
+                    'Accuracy']
+    episode_metrics = utils.COMMON_METRICS[:]
+    episode_metrics.remove(clemmetrics.METRIC_PLAYED)
+    scores = {}
+    for idx in range(n_episodes):
+        game = f'game{idx % n_games}'
+        model = f'model{(idx // n_games) % n_models}'
+        experiment = f'{idx % n_experiments}_experiment'
+        episode = f'episode_{idx}'
+        turns = {str(turn): {metric: float(rng.randint(0, 3))
+                             for metric in turn_metrics}
+                 for turn in range(n_turns)}
+        episodes = {metric: rng.random() for metric in episode_metrics}
+        scores[(game, model, experiment, episode)] = {'turns': turns,
+                                                     'episodes': episodes}
+    return scores
+
+
+def time_build(build_df, scores: dict) -> None:
+    """Build the dataframe once and print its size and the time it took."""
+    start = time.perf_counter()
+    df = build_df(scores)
+    duration = time.perf_counter() - start
+    memory = df.memory_usage(deep=True).sum() / 2**20
+    print(f'{build_df.__name__}: {len(df)} rows in {duration:.2f}s '
+          f'({memory:.1f} MiB)')
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument("--episodes", type=int, default=100000,
+                        help="Number of synthetic episodes. Default: 100000.")
+    parser.add_argument("--turns", type=int, default=5,
+                        help="Number of turns per episode. Default: 5.")
+    args = parser.parse_args()
+
+    synthetic_scores = build_synthetic_scores(args.episodes, args.turns)
+    time_build(utils.build_df_episode_scores, synthetic_scores)
+    time_build(utils.build_df_turn_scores, synthetic_scores)
@@ -0,0 +1,217 @@
+"""
+Bootstrap confidence intervals for the main benchmark results.
+
+The episodes of each game are resampled once per bootstrap round and the
+same resampled episodes are used for all models, which makes the differences
+between models paired (all models play the same game instances). From the
+resampled % Played and Quality Score of each (game, model), the macro
+averages over games and the clemscore are computed as in bencheval.
+
+The bootstrap is vectorized with NumPy (one index array per game and chunk
+of rounds) and its results are cached, keyed by a fingerprint of the scores.
+"""
+import hashlib
+import itertools
+import json
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import evaluation.evalutils as utils
+import clemgame.metrics as clemmetrics
+
+N_RESAMPLES = 1000
+CONFIDENCE = 95
+SEED = 42
+# upper bound for the number of values resampled at once (memory)
+CHUNK_VALUES = 5_000_000
+# cache of the bootstrap results (in the results or the eval directory)
+CACHE_FILE = 'bootstrap_cache.json'
+
+PLAYED = '% ' + clemmetrics.METRIC_PLAYED
+QUALITY = 'Quality Score'
+AVERAGE_PLAYED = 'Average ' + PLAYED
+AVERAGE_QUALITY = 'Average ' + QUALITY
+CLEMSCORE = 'clemscore'
+
+CI_COLUMNS = ['game', 'model', 'metric', 'value', 'ci_low', 'ci_high']
+DIFF_COLUMNS = ['model_a', 'model_b', 'metric', 'difference',
+                'ci_low', 'ci_high']
+
+
+def episode_matrices(df: pd.DataFrame) -> tuple:
+    """Arrange the played and main scores as (episodes, models) per game.
+
+    :param df: episode scores with the METRIC_PLAYED and BENCH_SCORE rows
+    :return: the models and, for each game, the played and the main score
+             matrices (NaN for episodes a model did not play or aborted)
+    """
+    df_aux = df[df['metric'].isin(utils.MAIN_METRICS)]
+    df_wide = df_aux.pivot(index=['game', 'experiment', 'episode', 'model'],
+                           columns='metric', values='value')
+    models = sorted(df_aux['model'].unique())
+    matrices = {}
+    for game, game_df in df_wide.groupby(level='game', observed=True):
+        game_df = game_df.droplevel('game')
+        played = game_df[clemmetrics.METRIC_PLAYED].unstack('model')
+        quality = game_df[clemmetrics.BENCH_SCORE].unstack('model')
+        matrices[game] = (
+            played.reindex(columns=models).to_numpy(dtype=float),
+            quality.reindex(index=played.index,
+                            columns=models).to_numpy(dtype=float))
+    return models, matrices
+
+
+def bootstrap_means(values: np.ndarray, n_resamples: int,
+                    rng: np.random.Generator) -> np.ndarray:
+    """Resample the episodes (rows) and average them per model (column).
+
+    :return: the means of shape (n_resamples, models)
+    """
+    n_episodes, n_models = values.shape
+    chunk = max(1, CHUNK_VALUES // max(1, n_episodes * n_models))
+    means = []
+    for start in range(0, n_resamples, chunk):
+        size = min(chunk, n_resamples - start)
+        indices = rng.integers(0, n_episodes, size=(size, n_episodes))
+        means.append(_nanmean(values[indices], axis=1))
+    if not means:
+        return np.empty((0, n_models))
+    return np.concatenate(means, axis=0)
+
+
+def bootstrap_cis(df: pd.DataFrame, n_resamples: int = N_RESAMPLES,
+                  confidence: float = CONFIDENCE, seed: int = SEED) -> tuple:
+    """Compute the results with bootstrap confidence intervals.
+
+    The values are the ones of the results table (see bencheval); the
+    intervals are percentile intervals of the resampled values.
+
+    :param df: episode scores with the METRIC_PLAYED and BENCH_SCORE rows
+    :return: the results with intervals (CI_COLUMNS) per game ('all' for the
+             averages, '-' for the clemscore) and the paired differences
+             between all pairs of models (DIFF_COLUMNS)
+    """
+    rng = np.random.default_rng(seed)
+    models, matrices = episode_matrices(df)
+    percentiles = [(100 - confidence) / 2, 100 - (100 - confidence) / 2]
+
+    def interval(samples):
+        if samples.shape[0] == 0:
+            return np.full((2, samples.shape[1]), np.nan)
+        return _nanpercentile(samples, percentiles, axis=0)
+
+    rows = []
+    played_means, quality_means = [], []
+    played_samples, quality_samples = [], []
+    for game, (played, quality) in matrices.items():
+        played_means.append(np.round(_nanmean(played, axis=0) * 100, 2))
+        quality_means.append(np.round(_nanmean(quality, axis=0), 2))
+        # the same resampled episodes for played and quality (paired)
+        state = rng.bit_generator.state
+        played_samples.append(bootstrap_means(played, n_resamples, rng) * 100)
+        rng.bit_generator.state = state
+        quality_samples.append(bootstrap_means(quality, n_resamples, rng))
+        for metric, values, samples in [
+                (PLAYED, played_means[-1], played_samples[-1]),
+                (QUALITY, quality_means[-1], quality_samples[-1])]:
+            rows.extend(_ci_rows(game, models, metric, values,
+                                 interval(samples)))
+
+    # macro averages over games and clemscore, as in the results table
+    played_all = np.round(_nanmean(np.array(played_means), axis=0), 2)
+    quality_all = np.round(_nanmean(np.array(quality_means), axis=0), 2)
+    clemscore = np.round(played_all / 100 * quality_all, 2)
+    played_all_samples = _nanmean(np.array(played_samples), axis=0)
+    quality_all_samples = _nanmean(np.array(quality_samples), axis=0)
+    clemscore_samples = played_all_samples / 100 * quality_all_samples
+    summaries = [
+        ('all', AVERAGE_PLAYED, played_all, played_all_samples),
+        ('all', AVERAGE_QUALITY, quality_all, quality_all_samples),
+        ('-', CLEMSCORE, clemscore, clemscore_samples)]
+    for game, metric, values, samples in summaries:
+        rows.extend(_ci_rows(game, models, metric, values, interval(samples)))
+    df_cis = pd.DataFrame(rows, columns=CI_COLUMNS)
+
+    diff_rows = []
+    for (idx_a, model_a), (idx_b, model_b) in itertools.combinations(
+            enumerate(models), 2):
+        for _, metric, values, samples in summaries:
+            differences = samples[:, [idx_a]] - samples[:, [idx_b]]
+            ci_low, ci_high = interval(differences)[:, 0]
+            diff_rows.append((model_a, model_b, metric,
+                              round(values[idx_a] - values[idx_b], 2),
+                              round(ci_low, 2), round(ci_high, 2)))
+    df_diffs = pd.DataFrame(diff_rows, columns=DIFF_COLUMNS)
+    return df_cis, df_diffs
+
+
+def load_or_bootstrap_cis(df: pd.DataFrame, cache_file: str,
+                          n_resamples: int = N_RESAMPLES,
+                          confidence: float = CONFIDENCE,
+                          seed: int = SEED) -> tuple:
+    """Return the cached bootstrap results, if the scores did not change.
+
+    Otherwise compute them (see bootstrap_cis) and update the cache.
+    """
+    fingerprint = scores_fingerprint(df, n_resamples, confidence, seed)
+    try:
+        cache = utils.load_json(cache_file)
+        if cache['fingerprint'] == fingerprint:
+            return (pd.DataFrame(cache['cis'], columns=CI_COLUMNS),
+                    pd.DataFrame(cache['diffs'], columns=DIFF_COLUMNS))
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+    df_cis, df_diffs = bootstrap_cis(df, n_resamples, confidence, seed)
+    cache = {'fingerprint': fingerprint,
+             'cis': df_cis.values.tolist(),
+             'diffs': df_diffs.values.tolist()}
+    with open(cache_file, 'w') as file:
+        json.dump(cache, file)
+    return df_cis, df_diffs
+
+
+def scores_fingerprint(df: pd.DataFrame, *params) -> str:
+    """Hash the scores that the bootstrap depends on and its parameters."""
+    df_aux = df[df['metric'].isin(utils.MAIN_METRICS)]
+    df_aux = df_aux[['game', 'model', 'experiment', 'episode', 'metric',
+                     'value']].astype({'value': float})
+    fingerprint = hashlib.sha1(repr(params).encode())
+    fingerprint.update(pd.util.hash_pandas_object(
+        df_aux.astype(str), index=False).to_numpy())
+    return fingerprint.hexdigest()
+
+
+def get_interval(df_cis: pd.DataFrame, game: str, metric: str,
+                 models: list) -> tuple:
+    """Return the lower and upper bounds of the models (NaN if missing)."""
+    df_aux = (df_cis[(df_cis['game'] == game) & (df_cis['metric'] == metric)]
+              .set_index('model')
+              .reindex(models))
+    return (df_aux['ci_low'].to_numpy(dtype=float),
+            df_aux['ci_high'].to_numpy(dtype=float))
+
+
+def _ci_rows(game, models, metric, values, intervals) -> list:
+    return [(game, model, metric, _round(value), _round(ci_low),
+             _round(ci_high))
+            for model, value, ci_low, ci_high
+            in zip(models, values, intervals[0], intervals[1])]
+
+
+def _round(value) -> float:
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def _nanmean(values: np.ndarray, axis: int) -> np.ndarray:
+    # all-NaN slices (e.g. all episodes aborted) are expected and stay NaN
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        return np.nanmean(values, axis=axis)
+
+
+def _nanpercentile(values: np.ndarray, q: list, axis: int) -> np.ndarray:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        return np.nanpercentile(values, q, axis=axis)
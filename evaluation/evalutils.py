@@ -2,22 +2,34 @@
 Auxiliary functions for plots and tables.
 """
 
+import functools
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Iterator
 
 import json
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-import seaborn as sns
 from tqdm import tqdm
 
+import clemgame
 import clemgame.metrics as clemmetrics
+from clemgame import results_index
 
 EVAL_DIR = 'results_eval'
 RESULTS_DIR = './results'
 SEP = '---'
 FLOAT_FORMAT = "%.2f"
 
+# number of threads that read the scores files
+LOAD_THREADS = 16
+# name of the cached score tables in the results directory
+SCORES_CACHE = 'scores_cache'
+
+# columns of the scores dataframes that are stored as categories
+CATEGORICAL_COLUMNS = ['game', 'model', 'experiment', 'metric']
+
 # metrics that go in the main results table
 MAIN_METRICS = [clemmetrics.METRIC_PLAYED, clemmetrics.BENCH_SCORE]
 
@@ -102,26 +114,18 @@ metric_lims = {
 
 def savefig(name: str) -> None:
     """Save a plt figure."""
+    # imported here, so that only plotting needs matplotlib and seaborn
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     sns.despine(left=False, right=False, top=False, bottom=False)
     plt.tight_layout()
     plt.savefig(name, bbox_inches='tight')
     plt.close()
 
 
-def parse_directory_name(name: str) -> dict:
-    """Extract information from the directory name structure."""
-
-    splits = str(name).split('/')
-    model, game, experiment, episode, _ = splits[-5:]
-    return {'game': game,
-            'model': model,
-            'experiment': experiment,
-            'episode': episode}
-
-
-def name_as_tuple(name: str) -> tuple:
-    """Turn the file path name into a tuple."""
-    return (name['game'], name['model'], name['experiment'], name['episode'])
+def index_entry_as_tuple(entry: dict) -> tuple:
+    """Turn a results index entry into a (game, model, experiment, episode) tuple."""
+    return (entry['game'], entry['dialogue_pair'], entry['experiment'], entry['episode'])
 
 
 def load_json(path: str) -> dict:
@@ -131,47 +135,189 @@ def load_json(path: str) -> dict:
     return data
 
 
-def load_scores(game_name: str = None, path: str = RESULTS_DIR) -> dict:
+def load_scores(game_name: str = None, path: str = RESULTS_DIR,
+                threads: int = LOAD_THREADS) -> dict:
     """Get all turn and episodes scores and return them in a dictionary."""
-    # https://stackoverflow.com/a/18394205
-    score_files = list(Path(path).rglob("*scores.json"))
-    print(f'Loading {len(score_files)} JSON files.')
+    episodes = results_index.load_episodes(path, game_name=game_name)
+    print(f'Loading scores of {len(episodes)} indexed episodes.')
+    files = [(index_entry_as_tuple(entry),
+              os.path.join(results_index.episode_path(entry, path),
+                           'scores.json'))
+             for entry in episodes]
+    scores = load_score_files(files, threads)
+    print(f'Retrieved {len(scores)} JSON files with scores.')
+    return scores
+
+
+def load_score_files(files: list, threads: int = LOAD_THREADS,
+                     progress: bool = True) -> dict:
+    """Read scores.json files with a pool of threads.
+
+    :param files: (game, model, experiment, episode) tuples and file paths
+    :param progress: show a progress bar
+    :return: the turn and episode scores by tuple, in the order of the files;
+             files that do not exist (episodes not scored yet) are left out
+    """
+    def load(file_path):
+        try:
+            return load_json(file_path)
+        except FileNotFoundError:
+            return None  # episode not scored (yet)
+
     scores = {}
-    for path in tqdm(score_files, desc="Loading scores"):
-        if game_name:
-            if game_name not in str(path):
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        loaded = executor.map(load, [file_path for _, file_path in files])
+        for (naming, _), data in tqdm(zip(files, loaded), total=len(files),
+                                      desc="Loading scores",
+                                      disable=not progress):
+            if data is None:
                 continue
-        naming = name_as_tuple(parse_directory_name(path))
-        if naming not in scores:
-            data = load_json(path)
             scores[naming] = {}
             scores[naming]['turns'] = data['turn scores']
             scores[naming]['episodes'] = data['episode scores']
-        else:
-            print(f'Repeated file {naming}!')
-    print(f'Retrieved {len(scores)} JSON files with scores.')
     return scores
 
 
-def load_interactions(game_name: str = None) -> dict:
-    """Get all interaction records and return them in a dictionary."""
-    # https://stackoverflow.com/a/18394205
-    interaction_files = list(Path(RESULTS_DIR).rglob("*interactions.json"))
-    print(f'Loading {len(interaction_files)} JSON files.')
-    interactions = {}
-    for path in tqdm(interaction_files, desc="Loading interactions"):
-        if game_name:
-            if game_name not in str(path):
-                continue
-        naming = name_as_tuple(parse_directory_name(path))
-        if naming not in interactions:
-            data = load_json(path)
-            instance = load_json(str(path).replace('interactions.json', 'instance.json'))
-            interactions[naming] = (data, instance)
-        else:
-            print(f'Repeated file {naming}!')
-    print(f'Retrieved {len(interactions)} JSON files with interactions.')
-    return interactions
+def load_score_tables(path: str = RESULTS_DIR, game_name: str = None,
+                      use_cache: bool = True,
+                      threads: int = LOAD_THREADS) -> tuple:
+    """Get all turn and episode scores as dataframes.
+
+    The flattened scores are cached in Parquet files in the results directory
+    (see SCORES_CACHE), so that only the scores.json files that changed since
+    the last run (by path and modification time) are read again. The
+    dataframes are the same as build_df_turn_scores(load_scores()) and
+    build_df_episode_scores(load_scores()).
+
+    :return: the (game, model, experiment, episode) tuples of the scored
+             episodes, the turn scores and the episode scores dataframes
+    """
+    files = list_score_files(path, game_name)
+    cache = read_scores_cache(path) if use_cache else None
+    cached_paths = set()
+    if cache is not None:
+        cached_mtimes = dict(zip(cache['files']['path'],
+                                 cache['files']['mtime']))
+        cached_paths = {rel_path for _, rel_path, mtime in files
+                        if cached_mtimes.get(rel_path) == mtime}
+    stale = [(naming, rel_path) for naming, rel_path, _ in files
+             if rel_path not in cached_paths]
+    print(f'Loading scores of {len(files)} scored episodes '
+          f'({len(files) - len(stale)} cached).')
+    scores = load_score_files([(naming, os.path.join(path, rel_path))
+                               for naming, rel_path in stale], threads)
+    stale_paths = [rel_path for naming, rel_path in stale
+                   if naming in scores]
+
+    tables = {}
+    for table, build_df in [('turns', build_df_turn_scores),
+                            ('episodes', build_df_episode_scores)]:
+        df_new = build_df(scores)
+        # the rows of each episode follow each other (in the order of scores)
+        row_counts = [len(data['episodes']) if table == 'episodes'
+                      else sum(len(turn) for turn in data['turns'].values())
+                      for data in scores.values()]
+        df_new['path'] = np.repeat(stale_paths, row_counts)
+        if cache is not None:
+            df_cached = cache[table]
+            df_new = pd.concat(
+                [df_cached[df_cached['path'].isin(cached_paths)], df_new],
+                ignore_index=True)
+        tables[table] = df_new
+
+    if use_cache and stale_paths:
+        files_df = pd.DataFrame([(rel_path, mtime)
+                                 for _, rel_path, mtime in files],
+                                columns=['path', 'mtime'])
+        write_scores_cache(path, tables, files_df, cache, game_name)
+
+    # same row order as without cache: the order of the results index
+    ordinals = {rel_path: n for n, (_, rel_path, _) in enumerate(files)}
+    for table, df in tables.items():
+        order = np.argsort(df['path'].map(ordinals).to_numpy(),
+                           kind='stable')
+        df = df.iloc[order].drop(columns='path').reset_index(drop=True)
+        for col in CATEGORICAL_COLUMNS:
+            df[col] = pd.Categorical(df[col].astype(object))
+        tables[table] = df
+    print(f'Retrieved scores of {len(files)} episodes.')
+    keys = [naming for naming, _, _ in files]
+    return keys, tables['turns'], tables['episodes']
+
+
+def list_score_files(path: str = RESULTS_DIR, game_name: str = None) -> list:
+    """List the scores.json files of the scored episodes in the results index.
+
+    :return: (game, model, experiment, episode) tuples, the paths relative to
+             the results directory and the modification times (ns)
+    """
+    files = []
+    for entry in results_index.load_episodes(path, game_name=game_name):
+        rel_path = os.path.join(*results_index.episode_key(entry),
+                                'scores.json')
+        try:
+            mtime = os.stat(os.path.join(path, rel_path)).st_mtime_ns
+        except FileNotFoundError:
+            continue  # episode not scored (yet)
+        files.append((index_entry_as_tuple(entry), rel_path, mtime))
+    return files
+
+
+def scores_cache_file(path: str, table: str) -> str:
+    """Return the path of a table of the scores cache."""
+    return os.path.join(path, f'{SCORES_CACHE}.{table}.parquet')
+
+
+def read_scores_cache(path: str) -> dict:
+    """Read the cached score tables; None, if there is no (usable) cache."""
+    try:
+        return {table: pd.read_parquet(scores_cache_file(path, table))
+                for table in ['turns', 'episodes', 'files']}
+    except ImportError:
+        print('Scores are not cached: pyarrow is not installed.')
+    except (OSError, ValueError):
+        pass  # no cache yet (or written by an incompatible version)
+    return None
+
+
+def write_scores_cache(path: str, tables: dict, files_df: pd.DataFrame,
+                       cache: dict = None, game_name: str = None) -> None:
+    """Replace the cached score tables (keeping the other games, if filtered).
+    """
+    tables = dict(tables, files=files_df)
+    if cache is not None and game_name is not None:
+        for table, df_cached in cache.items():
+            game_paths = df_cached['path'].str.split(os.sep).str[1]
+            tables[table] = pd.concat(
+                [df_cached[game_paths != game_name], tables[table]],
+                ignore_index=True)
+    try:
+        for table, df in tables.items():
+            file_path = scores_cache_file(path, table)
+            df.to_parquet(file_path + '.tmp', index=False)
+            os.replace(file_path + '.tmp', file_path)
+    except ImportError:
+        pass  # already reported when reading the cache
+    except (OSError, ValueError, TypeError) as error:
+        # e.g. pyarrow's ArrowTypeError for values that do not fit a column
+        print(f'Cannot cache the scores: {error}')
+
+
+def load_interactions(game_name: str = None,
+                      path: str = RESULTS_DIR) -> Iterator[tuple]:
+    """Iterate over all interaction records, one episode at a time.
+
+    :return: (game, model, experiment, episode) tuples and
+             (interactions, instance) pairs, read only when requested
+    """
+    episodes = results_index.load_episodes(path, game_name=game_name)
+    print(f'Loading interactions of {len(episodes)} indexed episodes.')
+    for entry in tqdm(episodes, desc="Loading interactions"):
+        naming = index_entry_as_tuple(entry)
+        episode_path = results_index.episode_path(entry, path)
+        data = load_json(os.path.join(episode_path, 'interactions.json'))
+        instance = load_json(os.path.join(episode_path, 'instance.json'))
+        yield naming, (data, instance)
 
 
 def create_eval_subdirs(path: str) -> None:
@@ -206,29 +352,62 @@ def create_eval_tree(levels: list) -> None:
 def build_df_turn_scores(scores: dict) -> pd.DataFrame:
     """Create dataframe with all turn scores."""
     cols = ['game', 'model', 'experiment', 'episode', 'turn', 'metric', 'value']
-    df_turn_scores = pd.DataFrame(columns=cols)
+    columns = {col: [] for col in cols}
     for name, data in tqdm(scores.items(), desc="Build turn scores dataframe"):
         (game, model, experiment, episode) = name
         for turn, turn_data in data['turns'].items():
-            for metric_name, metric_value in turn_data.items():
-                new_row = [game, model, experiment, episode, turn,
-                           metric_name, metric_value]
-                df_turn_scores.loc[len(df_turn_scores)] = new_row
-    return df_turn_scores
+            n_metrics = len(turn_data)
+            columns['game'].extend([game] * n_metrics)
+            columns['model'].extend([model] * n_metrics)
+            columns['experiment'].extend([experiment] * n_metrics)
+            columns['episode'].extend([episode] * n_metrics)
+            columns['turn'].extend([turn] * n_metrics)
+            columns['metric'].extend(turn_data.keys())
+            columns['value'].extend(turn_data.values())
+    return build_df_from_columns(columns)
 
 
 def build_df_episode_scores(scores: dict) -> pd.DataFrame:
     """Create dataframe with all episode scores."""
     cols = ['game', 'model', 'experiment', 'episode', 'metric', 'value']
-    df_episode_scores = pd.DataFrame(columns=cols)
+    columns = {col: [] for col in cols}
     desc = "Build episode scores dataframe"
     for name, data in tqdm(scores.items(), desc=desc):
         (game, model, experiment, episode) = name
-        for metric_name, metric_value in data['episodes'].items():
-            new_row = [game, model, experiment, episode,
-                       metric_name, metric_value]
-            df_episode_scores.loc[len(df_episode_scores)] = new_row
-    return df_episode_scores
+        n_metrics = len(data['episodes'])
+        columns['game'].extend([game] * n_metrics)
+        columns['model'].extend([model] * n_metrics)
+        columns['experiment'].extend([experiment] * n_metrics)
+        columns['episode'].extend([episode] * n_metrics)
+        columns['metric'].extend(data['episodes'].keys())
+        columns['value'].extend(data['episodes'].values())
+    return build_df_from_columns(columns)
+
+
+def build_df_from_columns(columns: dict) -> pd.DataFrame:
+    """Create a scores dataframe at once from its column lists.
+
+    The label columns are categorical, so that the many repeated game, model,
+    experiment and metric names are stored only once. Note: group by these
+    columns with observed=True, otherwise pandas creates groups for all
+    combinations of the categories.
+    """
+    df = pd.DataFrame({
+        col: pd.Categorical(values) if col in CATEGORICAL_COLUMNS else values
+        for col, values in columns.items() if col != 'value'})
+    try:
+        df['value'] = np.array(columns['value'], dtype=float)
+    except (TypeError, ValueError):
+        df['value'] = pd.Series(columns['value'], dtype=object)
+    return df
+
+
+def remove_unused_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """Drop the categories that do not occur in a (filtered) dataframe."""
+    df = df.copy()
+    for col in df.select_dtypes('category').columns:
+        df[col] = df[col].cat.remove_unused_categories()
+    return df
 
 
 def filter_df_by_key(df: pd.DataFrame, value_dict: dict) -> pd.DataFrame:
@@ -236,108 +415,105 @@ def filter_df_by_key(df: pd.DataFrame, value_dict: dict) -> pd.DataFrame:
     df_filtered = df
     for key, value in value_dict.items():
         df_filtered = df_filtered[(df_filtered[key] == value)]
-    return df_filtered
+    # pivot keeps the order of the categories only without unused ones
+    return remove_unused_categories(df_filtered)
 
 
 def save_raw_scores(df_turn_scores: pd.DataFrame,
                     df_episode_scores: pd.DataFrame,
-                    scores: dict) -> None:
+                    keys: list,
+                    jobs: int = 1) -> None:
     """Create .csv files with all the scores"""
     name = create_file_name('', 'turn', 'tables', 'scores_raw', 'csv')
     df_turn_scores.to_csv(name)
     name = create_file_name('', 'episode', 'tables', 'scores_raw', 'csv')
     df_episode_scores.to_csv(name)
-    save_raw_episode_scores(scores.keys(), df_episode_scores)
-    save_raw_turn_scores(scores.keys(), df_turn_scores)
+    save_raw_episode_scores(keys, df_episode_scores, jobs)
+    save_raw_turn_scores(keys, df_turn_scores, jobs)
     print('Saved raw scores into .csv files.')
 
 
-def save_raw_episode_scores(keys: list, df_scores: pd.DataFrame) -> None:
+# the raw score tables of each game, from the most to the least detailed level:
+# the columns to group by (below the game) and the pivot index and columns
+# (no pivot index: the metric and value columns as they are)
+RAW_EPISODE_SCORE_LEVELS = [
+    (['model', 'experiment', 'episode'], None, None),
+    (['model', 'experiment'], 'episode', ['metric']),
+    (['model'], ['episode'], ['experiment', 'metric']),
+    ([], ['model', 'episode'], ['experiment', 'metric'])
+]
+RAW_TURN_SCORE_LEVELS = [
+    (['model', 'experiment', 'episode'], 'turn', ['metric']),
+    (['model', 'experiment'], ['episode', 'turn'], ['metric']),
+    (['model'], ['episode', 'turn'], ['experiment', 'metric']),
+    ([], ['model', 'episode', 'turn'], ['experiment', 'metric'])
+]
+
+
+def save_raw_episode_scores(keys: list, df_scores: pd.DataFrame,
+                            jobs: int = 1) -> None:
     """Create csv files with episode scores for each level."""
-    desc = "Saving raw episode scores"
-    for game, model, experiment, episode in tqdm(keys, desc=desc):
-        # all results
-        filter_dic = {'game': game, 'model': model,
-                      'experiment': experiment, 'episode': episode}
-        df_aux = filter_df_by_key(df_scores, filter_dic)
-        df_aux = df_aux[['metric', 'value']]
-        prefix = f'{EVAL_DIR}/{game}/{model}/{experiment}/{episode}/{EVAL_DIR}'
-        name = f'{prefix}/episode-level/tables/scores_raw.csv'
-        df_aux.to_csv(name)
-
-        # by experiment
-        filter_dic = {'game': game, 'model': model, 'experiment': experiment}
-        df_aux = filter_df_by_key(df_scores, filter_dic)
-        df_aux = df_aux.pivot(index='episode',
-                              columns=['metric'],
-                              values='value')
-        prefix = f'{EVAL_DIR}/{game}/{model}/{experiment}/{EVAL_DIR}'
-        name = f'{prefix}/episode-level/tables/scores_raw.csv'
-        df_aux.to_csv(name)
-
-        # by model
-        filter_dic = {'game': game, 'model': model}
-        df_aux = filter_df_by_key(df_scores, filter_dic)
-        df_aux = df_aux.pivot(index=['episode'],
-                              columns=['experiment', 'metric'],
-                              values='value')
-        prefix = f'{EVAL_DIR}/{game}/{model}/{EVAL_DIR}/episode-level'
-        name = f'{prefix}/tables/scores_raw.csv'
-        df_aux.to_csv(name)
-
-        # by game
-        filter_dic = {'game': game}
-        df_aux = filter_df_by_key(df_scores, filter_dic)
-        df_aux = df_aux.pivot(index=['model', 'episode'],
-                              columns=['experiment', 'metric'],
-                              values='value') 
-        prefix = f'{EVAL_DIR}/{game}/{EVAL_DIR}'
-        name = f'{prefix}/episode-level/tables/scores_raw.csv'
-        df_aux.to_csv(name)
-
-
-def save_raw_turn_scores(keys: list, df_scores: pd.DataFrame) -> None:
+    save_raw_scores_by_game(keys, df_scores, 'episode',
+                            RAW_EPISODE_SCORE_LEVELS,
+                            "Saving raw episode scores", jobs)
+
+
+def save_raw_turn_scores(keys: list, df_scores: pd.DataFrame,
+                         jobs: int = 1) -> None:
     """Create csv files with turn scores for each level."""
-    desc = "Saving raw turn scores"
-    for game, model, experiment, episode in tqdm(keys, desc=desc):
-        # all results
-        filter_dic = {'game': game, 'model': model,
-                      'experiment': experiment, 'episode': episode}
-        df_aux = filter_df_by_key(df_scores, filter_dic)
-        df_aux = df_aux.pivot(index='turn', columns=['metric'], values='value')
-        prefix = f'{EVAL_DIR}/{game}/{model}/{experiment}/{episode}/{EVAL_DIR}'
-        name = f'{prefix}/turn-level/tables/scores_raw.csv'
-        df_aux.to_csv(name)
-
-        # by experiment
-        filter_dic = {'game': game, 'model': model, 'experiment': experiment}
-        df_aux = filter_df_by_key(df_scores, filter_dic)
-        df_aux = df_aux.pivot(index=['episode', 'turn'],
-                              columns=['metric'],
-                              values='value')
-        prefix = f'{EVAL_DIR}/{game}/{model}/{experiment}/{EVAL_DIR}'
-        name = f'{prefix}/turn-level/tables/scores_raw.csv'
-        df_aux.to_csv(name)
-
-        # by model
-        filter_dic = {'game': game, 'model': model}
-        df_aux = filter_df_by_key(df_scores, filter_dic)
-        df_aux = df_aux.pivot(index=['episode', 'turn'],
-                              columns=['experiment', 'metric'],
-                              values='value') 
-        prefix = f'{EVAL_DIR}/{game}/{model}/{EVAL_DIR}'
-        name = f'{prefix}/turn-level/tables/scores_raw.csv'
-        df_aux.to_csv()
-
-        # by game
-        filter_dic = {'game': game}
-        df_aux = filter_df_by_key(df_scores, filter_dic)
-        df_aux = df_aux.pivot(index=['model', 'episode', 'turn'],
-                              columns=['experiment', 'metric'],
-                              values='value') 
-        prefix = f'{EVAL_DIR}/{game}/{EVAL_DIR}'
-        name = f'{prefix}/turn-level/tables/scores_raw.csv'
-        df_aux.to_csv(name)
+    save_raw_scores_by_game(keys, df_scores, 'turn', RAW_TURN_SCORE_LEVELS,
+                            "Saving raw turn scores", jobs)
+
+
+def save_raw_scores_by_game(keys: list, df_scores: pd.DataFrame, level: str,
+                            score_levels: list, desc: str,
+                            jobs: int = 1) -> None:
+    """Split the scores once by game and save the tables of each game.
+
+    With jobs > 1, the games are saved by a pool of worker processes.
+    """
+    keys_by_game = {}
+    for key in keys:
+        keys_by_game.setdefault(key[0], []).append(key)
+    game_dfs = dict(iter(df_scores.groupby('game', observed=True)))
+    # episodes without scores get (empty) tables as well
+    games = [(game_keys, game_dfs.get(game, df_scores.iloc[0:0]))
+             for game, game_keys in keys_by_game.items()]
+    save_game = functools.partial(save_raw_game_scores, level=level,
+                                  score_levels=score_levels)
+    if jobs > 1 and len(games) > 1:
+        # the workers send their log records to this process
+        with clemgame.process_pool(jobs) as executor:
+            list(tqdm(executor.map(save_game, games), total=len(games),
+                      desc=desc))
+    else:
+        for game in tqdm(games, desc=desc):
+            save_game(game)
+
+
+def save_raw_game_scores(game: tuple, level: str, score_levels: list) -> None:
+    """Save the raw score tables of one game, each file exactly once."""
+    keys, game_df = game
+    # plain labels, so that pivot sorts them just like for unfiltered data
+    game_df = game_df.astype({col: object for col
+                              in game_df.select_dtypes('category').columns})
+    for group_cols, index, columns in score_levels:
+        n_levels = len(group_cols)
+        groups = {(): game_df}
+        if group_cols:
+            groups = {names if isinstance(names, tuple) else (names,): df
+                      for names, df in game_df.groupby(group_cols)}
+        for names in dict.fromkeys(key[1:1 + n_levels] for key in keys):
+            df_aux = groups.get(names, game_df.iloc[0:0])
+            if index is None:
+                df_aux = df_aux[['metric', 'value']]
+            else:
+                df_aux = df_aux.pivot(index=index, columns=columns,
+                                      values='value')
+            subfolders = '/'.join([keys[0][0], *names])
+            name = (f'{EVAL_DIR}/{subfolders}/{EVAL_DIR}/{level}-level/'
+                    f'tables/scores_raw.csv')
+            df_aux.to_csv(name)
 
 
 def create_file_name(subfolders: str, level: str, kind: str,
@@ -353,7 +529,7 @@ def create_file_name(subfolders: str, level: str, kind: str,
 def get_metrics_in_zero_one(df: pd.DataFrame) -> list:
     """Return metrics whose values are in the interval [0, 1]."""
     metrics_in_zero_one = []
-    for metric, metric_df in df.groupby('metric'):
+    for metric, metric_df in df.groupby('metric', observed=True):
         if metric_df['value'].min() >= 0.0 and metric_df['value'].max() <= 1.0:
             metrics_in_zero_one.append(metric)
     return metrics_in_zero_one
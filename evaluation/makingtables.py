@@ -21,31 +21,31 @@ def save_multiple_formats(options, df):
 
 def build_dispersion_table(catcolumns, df):
     """Group by categories and build table with dispersion statistics."""
-    mean = (df.groupby(catcolumns)['value']
+    mean = (df.groupby(catcolumns, observed=True)['value']
               .mean(numeric_only=True)
               .rename('mean')
               .to_frame())
-    median = (df.groupby(catcolumns)['value']
+    median = (df.groupby(catcolumns, observed=True)['value']
                 .median(numeric_only=True)
                 .rename('median')
                 .to_frame())
-    var = (df.groupby(catcolumns)['value']
+    var = (df.groupby(catcolumns, observed=True)['value']
              .var(numeric_only=True)
              .rename('var')
              .to_frame())
-    std = (df.groupby(catcolumns)['value']
+    std = (df.groupby(catcolumns, observed=True)['value']
              .std(numeric_only=True)
              .rename('std')
              .to_frame())
-    minimum = (df.groupby(catcolumns)['value']
+    minimum = (df.groupby(catcolumns, observed=True)['value']
                  .min(numeric_only=True)
                  .rename('min')
                  .to_frame())
-    maximum = (df.groupby(catcolumns)['value']
+    maximum = (df.groupby(catcolumns, observed=True)['value']
                  .max(numeric_only=True)
                  .rename('max')
                  .to_frame())
-    skew = (df.groupby(catcolumns)['value']
+    skew = (df.groupby(catcolumns, observed=True)['value']
               .skew(numeric_only=True)
               .rename('skew')
               .to_frame())
@@ -75,14 +75,14 @@ def save_paper_table(df):
     df_aux = df[df['metric'].isin(utils.MAIN_METRICS)]
     categories = ['game', 'model', 'metric']
     # mean over all experiments
-    df_mean = (df_aux.groupby(categories)
+    df_mean = (df_aux.groupby(categories, observed=True)
                      .mean(numeric_only=True)
                      .rename({'value': 'mean'}, axis=1)
                      .reset_index())
     df_mean.loc[df_mean.metric == clemmetrics.METRIC_PLAYED, 'mean'] *= 100
     df_mean = df_mean.round(2)
     # standard deviation over all experiments
-    df_std = (df_aux.groupby(categories)
+    df_std = (df_aux.groupby(categories, observed=True)
                     .std(numeric_only=True)
                     .rename({'value': 'std'}, axis=1)
                     .reset_index()
@@ -133,10 +133,19 @@ def save_clem_score_table(df_paper: pd.DataFrame) -> None:
     return df_aux
 
 
+def save_ci_tables(df_ci: pd.DataFrame, df_ci_diffs: pd.DataFrame) -> None:
+    """Save the bootstrap confidence intervals (see bootstrap.py)."""
+    options = ['', 'episode', 'tables', 'bench-ci-table']
+    save_multiple_formats(options, df_ci)
+    options = ['', 'episode', 'tables', 'bench-ci-diffs-table']
+    save_multiple_formats(options, df_ci_diffs)
+
+
 def make_overview_by_game(df: pd.DataFrame) -> None:
     """Create one table by game with all metrics by experiment and model."""
-    for game, game_df in df.groupby('game'):
-        results_df = (game_df.groupby(['model', 'experiment', 'metric'])
+    for game, game_df in df.groupby('game', observed=True):
+        results_df = (game_df.groupby(['model', 'experiment', 'metric'],
+                                      observed=True)
                              .mean(numeric_only=True)
                              .reset_index()
                              .pivot(index=['model', 'experiment'],
@@ -159,7 +168,7 @@ def make_overview_by_game(df: pd.DataFrame) -> None:
         # as long it gets logged (even if only a nan) for all games
         # that actually got played; we only care for the count
         aux_counts = (game_df[game_df.metric == 'Played']
-                      .groupby(['model', 'experiment', 'metric'])
+                      .groupby(['model', 'experiment', 'metric'], observed=True)
                       .count()
                       .rename(columns={'episode': 'n'})
                       .reset_index()
@@ -175,7 +184,7 @@ def make_overview_by_game(df: pd.DataFrame) -> None:
 
 def make_detailed_overview_by_game(df: pd.DataFrame) -> None:
     """Create one table by game with all metrics by experiment and model."""
-    for game, game_df in df.groupby('game'):
+    for game, game_df in df.groupby('game', observed=True):
         results_df = (game_df.drop('game', axis=1)
                              .sort_values(by=['metric', 'episode'])
                              .pivot(index=['model', 'experiment'],
@@ -24,33 +24,47 @@ additional directory called results_eval containing two directories
 """
 
 import argparse
-import matplotlib.pyplot as plt
-import numpy as np
+import os
+
 import pandas as pd
-import seaborn as sns
-import sklearn.metrics as metrics
 from tqdm import tqdm
 
+import evaluation.bootstrap as bootstrap
 import evaluation.evalutils as utils
-import evaluation.plotting as plotting
 import evaluation.makingtables as tables
 import clemgame.metrics as clemmetrics
 
-sns.set(font='Futura', style="white")
-
 parser = argparse.ArgumentParser()
 parser.add_argument('--no_plots', action='store_true',
                     help='Do not generate plots.')
+parser.add_argument('-j', '--jobs', type=int, default=1,
+                    help='Number of processes to save the raw scores of '
+                         'the games and to render the plots in parallel.')
+parser.add_argument('--force_plots', action='store_true',
+                    help='Render all plots, also those whose data did not '
+                         'change since they were rendered.')
+parser.add_argument('--errorbar', choices=['se', 'ci'], default='se',
+                    help='Error bars of the other plots: +/- 2 standard '
+                         'errors, or bootstrapped 95%% confidence intervals '
+                         '(slow).')
+parser.add_argument('--no_cache', action='store_true',
+                    help='Read all scores files, ignoring the scores cache.')
+parser.add_argument('--resamples', type=int, default=bootstrap.N_RESAMPLES,
+                    help='Number of bootstrap resamples for the confidence '
+                         'intervals of the main results.')
 args = parser.parse_args()
 
 if args.no_plots:
     print('Only tables will be created, all plots skipped!')
+else:
+    # matplotlib and seaborn are only imported when plots are requested
+    import evaluation.plotting as plotting
+    # the plots are collected as tasks and rendered at the end
+    plot_tasks = []
 
-scores = utils.load_scores()
-utils.create_eval_tree(scores.keys())
-
-df_turn_scores = utils.build_df_turn_scores(scores)
-df_episode_scores = utils.build_df_episode_scores(scores)
+episode_keys, df_turn_scores, df_episode_scores = utils.load_score_tables(
+    use_cache=not args.no_cache)
+utils.create_eval_tree(episode_keys)
 
 # Create the PLAYED variable
 aux = df_episode_scores[df_episode_scores["metric"] == "Aborted"].copy()
@@ -61,13 +75,14 @@ df_episode_scores = pd.concat([df_episode_scores, aux], ignore_index=True)
 
 GAMES = df_turn_scores['game'].unique().tolist()
 MODELS = df_turn_scores['model'].unique().tolist()
-EXPERIMENTS = list(set([x[:3] for x in scores]))
-EPISODES = scores.keys()
+EXPERIMENTS = list(set([x[:3] for x in episode_keys]))
+EPISODES = episode_keys
 ZERO_ONE_EPISODE_SCORES = utils.get_metrics_in_zero_one(df_episode_scores)
 ZERO_ONE_TURN_SCORES = utils.get_metrics_in_zero_one(df_turn_scores)
 
 # Save tables with raw scores
-utils.save_raw_scores(df_turn_scores, df_episode_scores, scores)
+utils.save_raw_scores(df_turn_scores, df_episode_scores, episode_keys,
+                      args.jobs)
 
 for key, value in utils.short_names.items():
     df_turn_scores['model'] = df_turn_scores['model'].str.replace(key, value)
@@ -94,6 +109,13 @@ df_paper = tables.save_paper_table(df_episode_scores)
 # Clem score table
 df_clem = tables.save_clem_score_table(df_paper)
 
+# Bootstrap confidence intervals of % played, quality score and clemscore,
+# computed once (or loaded from the cache) and passed to the plots
+df_ci, df_ci_diffs = bootstrap.load_or_bootstrap_cis(
+    df_episode_scores, os.path.join(utils.EVAL_DIR, bootstrap.CACHE_FILE),
+    n_resamples=args.resamples)
+tables.save_ci_tables(df_ci, df_ci_diffs)
+
 # Games vs. models with episode scores dispersion metrics across 
 # all episodes and experiments
 bench_table = tables.make_stats_table(df_episode_scores)
@@ -107,28 +129,32 @@ if not args.no_plots:
     df_01, df_other = utils.filter_metrics_in_zero_one(df_episode_scores,
                                                        ZERO_ONE_EPISODE_SCORES)
     if not df_01.empty:
-        plotting.plot_escore_benchmark(df_01, '_in01')       # (2a)
+        plot_tasks.append((plotting.plot_escore_benchmark,
+                           (df_01, '_in01')))                  # (2a)
     if not df_other.empty:
-        plotting.plot_escore_benchmark(df_other, '_other')   # (2b)
+        plot_tasks.append((plotting.plot_escore_benchmark,
+                           (df_other, '_other')))              # (2b)
 
     # Stacked bar plots with success, lose and aborted
     # micro average
-    plotting.plot_stacked_micro_bar(df_episode_scores, df_clem)
+    plot_tasks.append((plotting.plot_stacked_micro_bar,
+                       (df_episode_scores, df_clem)))
     # macro_average
-    plotting.plot_stacked_macro_bar(df_episode_scores, df_clem)
+    plot_tasks.append((plotting.plot_stacked_macro_bar,
+                       (df_episode_scores, df_clem)))
 
     # polygons
-    plotting.plot_polygons(df_episode_scores)
+    plot_tasks.append((plotting.plot_polygons, (df_episode_scores,)))
 
     # scatter plots with (% played, quality score) for each model
     # we generate for the benchmark, for each game and for each experiment
-    plotting.plot_paper_scatter(df_paper)
+    plot_tasks.append((plotting.plot_paper_scatter, (df_paper, df_ci)))
 
     # lineplots with quality score for each model across experiments
-    plotting.plot_lines(df_episode_scores)
+    plot_tasks.append((plotting.plot_lines, (df_episode_scores,)))
 
     # barplots with clem score for each model 
-    plotting.plot_clem_score(df_clem)
+    plot_tasks.append((plotting.plot_clem_score, (df_clem, df_ci)))
 
 # ----------------------- Benchmark: Turn-Level Scores ------------------------
 #
@@ -148,22 +174,30 @@ tables.make_detailed_overview_by_game(df_episode_scores)
 
 # Plots
 if not args.no_plots:
-    for game in tqdm(GAMES, desc="Generating game-specific plots"):
-        act_df = df_episode_scores[df_episode_scores.game == game]
+    for game in tqdm(GAMES, desc="Collecting game-specific plots"):
+        act_df = utils.remove_unused_categories(
+            df_episode_scores[df_episode_scores.game == game])
         # overview of all episode scores
-        plotting.plot_escores_game(act_df, game)
-        plotting.plot_escores_line_game(act_df, game)
+        plot_tasks.append((plotting.plot_escores_game, (act_df, game)))
+        plot_tasks.append((plotting.plot_escores_line_game, (act_df, game)))
         # one plot for each metric
-        for metric, metric_df in act_df.groupby('metric'):
+        for metric, metric_df in act_df.groupby('metric', observed=True):
             lims = utils.get_metric_lims(metric, ZERO_ONE_EPISODE_SCORES)
-            plotting.plot_escores_game_metric(metric_df, game, metric, lims)
-            plotting.plot_escores_line_game_metric(metric_df, game, metric, lims)
+            plot_tasks.append((plotting.plot_escores_game_metric,
+                               (metric_df, game, metric, lims)))
+            plot_tasks.append((plotting.plot_escores_line_game_metric,
+                               (metric_df, game, metric, lims)))
         # overview of turn scores
         # there should not be nans, removing them here for now
-        act_df = df_turn_scores[df_turn_scores.game == game].dropna()
+        act_df = utils.remove_unused_categories(
+            df_turn_scores[df_turn_scores.game == game].dropna())
         # overview of all turn scores
-        plotting.plot_tscores_game(act_df, game)
+        plot_tasks.append((plotting.plot_tscores_game, (act_df, game)))
         # one plot for each metric
-        for metric, metric_df in act_df.groupby('metric'):
+        for metric, metric_df in act_df.groupby('metric', observed=True):
             lims = utils.get_metric_lims(metric, ZERO_ONE_TURN_SCORES)
-            plotting.plot_tscores_game_metric(metric_df, game, metric, lims)
+            plot_tasks.append((plotting.plot_tscores_game_metric,
+                               (metric_df, game, metric, lims)))
+
+    plotting.render_plots(plot_tasks, jobs=args.jobs, force=args.force_plots,
+                          errorbar=args.errorbar)
@@ -1,18 +1,38 @@
 """
 Functions that create evaluation plots.
+
+Each plot function saves one figure and returns its file name. The plots
+can be rendered as independent tasks (see render_plots), on a pool of worker
+processes, skipping the plots whose input data did not change.
 """
 
+import hashlib
+import json
+import os
+
+import matplotlib
+matplotlib.use('Agg')  # render to files only (also in worker processes)
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
+from tqdm import tqdm
 
 from matplotlib.colors import ListedColormap, to_rgba
 from matplotlib.patches import Polygon
 
+import clemgame
+import evaluation.bootstrap as bootstrap
 import evaluation.evalutils as utils
 import clemgame.metrics as clemmetrics
 
+sns.set(font='Futura', style="white")
+
+# increase to render all plots again after changing the plot functions
+PLOTS_VERSION = 2
+# file in the eval directory with the input fingerprints of rendered plots
+PLOTS_FINGERPRINTS = 'plots.json'
+
 ABORTED = clemmetrics.METRIC_ABORTED
 
 COLORS = ['darkorange', 'teal', 'firebrick', 'purple', 'darkgoldenrod',
@@ -20,10 +40,17 @@ COLORS = ['darkorange', 'teal', 'firebrick', 'purple', 'darkgoldenrod',
 
 STACK_COLORS = ['darkolivegreen', 'indianred', 'gray']
 
+# error bars of the seaborn plots: +/- 2 standard errors (closed form, the
+# default), or seaborn's bootstrapped 95% confidence intervals, which are slow
+# to compute in every plot; the confidence intervals of the main results are
+# computed once (see bootstrap.py) and passed to the plots
+ERRORBARS = {'se': ('se', 2), 'ci': ('ci', 95)}
+ERRORBAR = ERRORBARS['se']
+
 
 # ------------------------ Evaluation of the Benchmark ------------------------
 # Overview plots
-def plot_escore_benchmark(df: pd.DataFrame, ending: str) -> None:
+def plot_escore_benchmark(df: pd.DataFrame, ending: str) -> str:
     "Create benchmark overview with subplots for all games."
     n_games = len(df.game.unique())
     n_models = len(df.model.unique())
@@ -31,12 +58,13 @@ def plot_escore_benchmark(df: pd.DataFrame, ending: str) -> None:
     fig, all_axes = plt.subplots(n_games, 1, figsize=(15, n_games * 5))
     axs = all_axes.flatten()
 
-    for n, (game, df_group) in enumerate(df.groupby('game')):
+    for n, (game, df_group) in enumerate(df.groupby('game', observed=True)):
         g = sns.barplot(data=df_group,
                         x='metric',
                         y='value',
                         hue='model',
                         hue_order=utils.ROW_ORDER[:-2],
+                        errorbar=ERRORBAR,
                         errwidth=0.8,
                         ax=axs[n])
         axs[n].set_title(game, loc='left', fontsize=22)
@@ -57,6 +85,7 @@ def plot_escore_benchmark(df: pd.DataFrame, ending: str) -> None:
     name = f'overview{ending}'
     path = utils.create_file_name('', 'episode', 'plots', name, 'pdf')
     utils.savefig(path)
+    return path
 
 
 def plot_stacked_micro_bar(df, df_clem):
@@ -70,7 +99,7 @@ def plot_stacked_micro_bar(df, df_clem):
                            values='value')
                     .reset_index()
                     .drop(columns=['game', 'experiment', 'episode'])
-                    .groupby('model')
+                    .groupby('model', observed=True)
                     .sum()
                     .sort_values(axis=1, by='metric', ascending=False))
     percs = 100 * df_aux.div(df_aux.sum(axis=1), axis=0)
@@ -88,6 +117,7 @@ def plot_stacked_micro_bar(df, df_clem):
     name = 'succes-lose-aborted_micro-avr'
     path = utils.create_file_name('', 'episode', 'plots', name, 'pdf')
     utils.savefig(path)
+    return path
 
 
 def plot_stacked_macro_bar(df, df_clem):
@@ -98,10 +128,10 @@ def plot_stacked_macro_bar(df, df_clem):
     """
 
     df_aux = df[df.metric.isin(utils.GAMEPLAY_METRICS)]
-    df_aux = 100 * (df_aux.groupby(['model', 'game', 'metric'])
+    df_aux = 100 * (df_aux.groupby(['model', 'game', 'metric'], observed=True)
                           .mean(numeric_only=True)
                           .reset_index()
-                          .groupby(['model', 'metric'])
+                          .groupby(['model', 'metric'], observed=True)
                           .mean(numeric_only=True))
     df_aux = (df_aux.reset_index()
                     .pivot(columns='metric', index=['model']))
@@ -121,10 +151,16 @@ def plot_stacked_macro_bar(df, df_clem):
     name = 'succes-lose-aborted_macro-avr'
     path = utils.create_file_name('', 'episode', 'plots', name, 'pdf')
     utils.savefig(path)
+    return path
 
 
-def plot_paper_scatter(df_paper: pd.DataFrame) -> None:
-    """Create scatter plot with % played vs. quality score."""
+def plot_paper_scatter(df_paper: pd.DataFrame,
+                       df_ci: pd.DataFrame = None) -> str:
+    """Create scatter plot with % played vs. quality score.
+
+    With the bootstrap results (see bootstrap.py), the confidence intervals
+    of both averages are drawn as error bars.
+    """
     dots = (df_paper['all'].to_frame()
                            .reset_index()
                            .pivot(index=['model'], columns=['metric']))
@@ -138,6 +174,15 @@ def plot_paper_scatter(df_paper: pd.DataFrame) -> None:
                         y=('all', clemmetrics.BENCH_SCORE),
                         hue=dots.index,
                         s=100)
+    if df_ci is not None:
+        played = dots[('all', clemmetrics.METRIC_PLAYED)]
+        quality = dots[('all', clemmetrics.BENCH_SCORE)]
+        g.errorbar(played, quality,
+                   xerr=ci_errors(df_ci, 'all', bootstrap.AVERAGE_PLAYED,
+                                  played),
+                   yerr=ci_errors(df_ci, 'all', bootstrap.AVERAGE_QUALITY,
+                                  quality),
+                   fmt='none', ecolor='gray', elinewidth=0.8, zorder=0)
     sns.move_legend(g, loc='center right', bbox_to_anchor=(1.3, 0.8))
     for idx, row in dots.iterrows():
         if idx not in ('4--4', '3.5--4', 'flc--flc', 'ost--ost'):
@@ -162,17 +207,41 @@ def plot_paper_scatter(df_paper: pd.DataFrame) -> None:
     name = 'played-quality-paper'
     path = utils.create_file_name('', 'episode', 'plots', name, 'pdf')
     utils.savefig(path)
+    return path
 
 
-def plot_clem_score(df_clem):
-    """Create barplot with the clem score for each mode."""
+def plot_clem_score(df_clem, df_ci=None):
+    """Create barplot with the clem score for each mode.
+
+    With the bootstrap results (see bootstrap.py), the confidence intervals
+    are drawn as error bars.
+    """
     fig = plt.figure(figsize=(7, 5))
-    sns.barplot(df_clem, x='model', y='clemscore', color='slategray')
+    g = sns.barplot(df_clem, x='model', y='clemscore', color='slategray',
+                    errorbar=None)
+    if df_ci is not None:
+        clemscores = df_clem.set_index('model')['clemscore']
+        g.errorbar(range(len(clemscores)), clemscores,
+                   yerr=ci_errors(df_ci, '-', bootstrap.CLEMSCORE,
+                                  clemscores),
+                   fmt='none', ecolor='black', elinewidth=0.8)
     plt.ylim(-5, 105)
     plt.grid(alpha=0.5)
     name = 'clemscore'
     path = utils.create_file_name('', 'episode', 'plots', name, 'pdf')
     utils.savefig(path)
+    return path
+
+
+def ci_errors(df_ci: pd.DataFrame, game: str, metric: str,
+              values: pd.Series) -> np.ndarray:
+    """Return the error bar lengths of the values (indexed by model)."""
+    ci_low, ci_high = bootstrap.get_interval(df_ci, game, metric,
+                                             list(values.index))
+    values = values.to_numpy(dtype=float)
+    errors = np.array([values - ci_low, ci_high - values])
+    # no error bars for models without intervals
+    return np.clip(np.nan_to_num(errors), 0, None)
 
 
 def ccw_sort(p):
@@ -190,7 +259,7 @@ def plot_polygons(df):
     fig, ax_list = plt.subplots(3, 4, figsize=(9, 6), sharey=True, sharex=True)
     axs = ax_list.flatten()
 
-    for n, (model, model_df) in enumerate(df.groupby('model')):
+    for n, (model, model_df) in enumerate(df.groupby('model', observed=True)):
         rows = model_df.metric.isin(utils.MAIN_METRICS)
         df_aux = model_df[rows]
         df_aux = (df_aux.pivot(index=['game', 'experiment', 'episode'],
@@ -201,7 +270,7 @@ def plot_polygons(df):
 
         # create the x and y coordinates for each game
         dots = []
-        for game, game_df in df_aux.groupby('game'):
+        for game, game_df in df_aux.groupby('game', observed=True):
             overall_means = (game_df.mean(numeric_only=True)
                                     .fillna(0))
             # replace missing score by 0 when all aborted
@@ -238,12 +307,13 @@ def plot_polygons(df):
     plt.tight_layout()
     path = utils.create_file_name('', 'episode', 'plots', 'polygons', 'pdf')
     utils.savefig(path)
+    return path
 
 
 def plot_lines(df):
     """Plot lineplot comparing models across experiments."""
     aux_df = (df[df.metric == clemmetrics.BENCH_SCORE]
-              .groupby(['game', 'model', 'experiment'])
+              .groupby(['game', 'model', 'experiment'], observed=True)
               .mean(numeric_only=True)
               .reset_index())
     g = sns.catplot(aux_df,
@@ -255,6 +325,7 @@ def plot_lines(df):
                     x='experiment',
                     y='value',
                     kind='point',
+                    errorbar=ERRORBAR,
                     aspect=2.5)
     g.set(ylim=(-5, 105))
     sns.move_legend(g, loc="upper center", ncols=len(aux_df.model.unique()),
@@ -262,6 +333,7 @@ def plot_lines(df):
     plt.tight_layout()
     path = utils.create_file_name('', 'episode', 'plots', 'lines', 'pdf')
     utils.savefig(path)
+    return path
 
 
 def plot_escores_game(act_df, game):
@@ -279,17 +351,19 @@ def plot_escores_game(act_df, game):
                     hue='model',
                     dodge=False,
                     kind='bar',
+                    errorbar=ERRORBAR,
                     sharey=False,
                     sharex=False,
                     aspect=1.4)
     plt.suptitle(f'Overview of Episode Scores: {game}', y=1.)
     path = utils.create_file_name(game, 'episode', 'plots', '_overview', 'pdf')
     utils.savefig(path)
+    return path
 
 
 def plot_escores_line_game(act_df, game):
     """Plot lineplot for a game, across experiments."""
-    act_df = (act_df.groupby(['model', 'experiment', 'metric'])
+    act_df = (act_df.groupby(['model', 'experiment', 'metric'], observed=True)
                     .mean(numeric_only=True)
                     .reset_index())
     g = sns.catplot(act_df,
@@ -301,6 +375,7 @@ def plot_escores_line_game(act_df, game):
                     order=sorted(act_df.experiment.unique()),
                     y='value',
                     kind='point',
+                    errorbar=ERRORBAR,
                     aspect=1.5)
     sns.move_legend(g, loc="upper center", ncols=len(act_df.model.unique()),
                     bbox_to_anchor=(0.5, 1.03))
@@ -308,6 +383,7 @@ def plot_escores_line_game(act_df, game):
     name = '_overview-lines'
     path = utils.create_file_name(game, 'episode', 'plots', name, 'pdf')
     utils.savefig(path)
+    return path
 
 
 def plot_escores_game_metric(metric_df, game, metric, lims):
@@ -325,6 +401,7 @@ def plot_escores_game_metric(metric_df, game, metric, lims):
                     hue_order=utils.ROW_ORDER[:-2],
                     dodge=False,
                     kind='bar',
+                    errorbar=ERRORBAR,
                     sharey=False,
                     sharex=False,
                     aspect=1.4)
@@ -333,6 +410,7 @@ def plot_escores_game_metric(metric_df, game, metric, lims):
     name = f'_overview_{metric}'
     path = utils.create_file_name(game, 'episode', 'plots', name, 'pdf')
     utils.savefig(path)
+    return path
 
 
 def plot_escores_line_game_metric(metric_df, game, metric, lims):
@@ -354,6 +432,7 @@ def plot_escores_line_game_metric(metric_df, game, metric, lims):
     name = f'_overview-lines_{metric}'
     path = utils.create_file_name(game, 'episode', 'plots', name, 'pdf')
     utils.savefig(path)
+    return path
 
 
 def plot_tscores_game(act_df, game):
@@ -368,11 +447,12 @@ def plot_tscores_game(act_df, game):
                       sharex=False,
                       legend_out=True,
                       aspect=1.6)
-    g.map(sns.lineplot, 'turn', 'value')
+    g.map(sns.lineplot, 'turn', 'value', errorbar=ERRORBAR)
     g.add_legend(loc="center left", bbox_to_anchor=(1, 0.5))
     plt.suptitle(f'Overview of Turn Scores: {game}', y=1.1)
     path = utils.create_file_name(game, 'turn', 'plots', '_overview', 'pdf')
     utils.savefig(path)
+    return path
 
 
 def plot_tscores_game_metric(metric_df, game, metric, lims):
@@ -386,10 +466,98 @@ def plot_tscores_game_metric(metric_df, game, metric, lims):
                       sharex=False,
                       legend_out=True,
                       aspect=1.4)
-    g.map(sns.lineplot, 'turn', 'value')
+    g.map(sns.lineplot, 'turn', 'value', errorbar=ERRORBAR)
     g.add_legend(loc="center left", bbox_to_anchor=(1, 0.5))
     g.set(ylim=lims)
     plt.suptitle(f'Overview of Turn Scores: {game} | {metric}', y=1.1)
     name = f'_overview_{metric}'
     path = utils.create_file_name(game, 'turn', 'plots', name, 'pdf')
     utils.savefig(path)
+    return path
+
+
+# ------------------------------- Plot Tasks ----------------------------------
+# A plot task is a (plot function, arguments) tuple.
+def plot_task_key(task: tuple) -> str:
+    """Identify a plot task by its function and non-dataframe arguments."""
+    function, args = task
+    labels = [repr(arg) for arg in args if not isinstance(arg, pd.DataFrame)]
+    return ' | '.join([function.__name__, *labels])
+
+
+def plot_fingerprint(task: tuple) -> str:
+    """Hash the plot function and its input data."""
+    function, args = task
+    fingerprint = hashlib.sha1(
+        f'{PLOTS_VERSION} {ERRORBAR} {function.__name__}'.encode())
+    for arg in args:
+        if isinstance(arg, pd.DataFrame):
+            fingerprint.update(repr((list(arg.columns), list(arg.index.names),
+                                     [str(dtype) for dtype in arg.dtypes])
+                                    ).encode())
+            fingerprint.update(
+                pd.util.hash_pandas_object(arg, index=True).to_numpy())
+        else:
+            fingerprint.update(repr(arg).encode())
+    return fingerprint.hexdigest()
+
+
+def run_plot_task(task: tuple) -> str:
+    """Render one plot and return its file name; None, if it failed."""
+    function, args = task
+    try:
+        return function(*args)
+    except Exception as error:
+        plt.close('all')
+        print(f'Cannot render the plot {plot_task_key(task)}: {error!r}')
+        return None
+
+
+def render_plots(tasks: list, jobs: int = 1, force: bool = False,
+                 errorbar: str = 'se') -> None:
+    """Render the plots whose input data changed since they were rendered.
+
+    :param tasks: the plot tasks
+    :param jobs: the number of worker processes
+    :param force: render all plots
+    :param errorbar: the error bars of the seaborn plots (see ERRORBARS)
+    """
+    global ERRORBAR
+    # set before the workers are forked, which inherit it
+    ERRORBAR = ERRORBARS[errorbar]
+    fingerprints_path = os.path.join(utils.EVAL_DIR, PLOTS_FINGERPRINTS)
+    try:
+        rendered = utils.load_json(fingerprints_path)
+    except (FileNotFoundError, ValueError):
+        rendered = {}
+    todo = []
+    for task in tasks:
+        key = plot_task_key(task)
+        fingerprint = plot_fingerprint(task)
+        previous = rendered.get(key)
+        if (not force and previous is not None
+                and previous['fingerprint'] == fingerprint
+                and os.path.isfile(previous['path'])):
+            continue
+        todo.append((key, fingerprint, task))
+    print(f'Rendering {len(todo)} plots ({len(tasks) - len(todo)} unchanged).')
+    todo_tasks = [task for _, _, task in todo]
+    if jobs > 1 and len(todo) > 1:
+        # the workers send their log records to this process
+        with clemgame.process_pool(jobs) as executor:
+            paths = list(tqdm(executor.map(run_plot_task, todo_tasks),
+                              total=len(todo), desc="Rendering plots"))
+    else:
+        paths = [run_plot_task(task)
+                 for task in tqdm(todo_tasks, desc="Rendering plots")]
+    failed = 0
+    for (key, fingerprint, _), path in zip(todo, paths):
+        if path is None:
+            rendered.pop(key, None)
+            failed += 1
+            continue
+        rendered[key] = {'fingerprint': fingerprint, 'path': path}
+    with open(fingerprints_path, 'w') as file:
+        json.dump(rendered, file, indent=2)
+    if failed:
+        print(f'{failed} plots could not be rendered.')
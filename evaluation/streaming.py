@@ -0,0 +1,217 @@
+"""
+Streaming aggregation of the episode scores.
+
+Instead of building a dataframe with all scores of all episodes, the
+scores.json files are read in chunks and only running statistics are kept
+for each (game, model, experiment, metric): the count, the sum and the sum of
+squared deviations from the mean (M2, as in Welford's algorithm). The memory
+is proportional to the number of groups, not to the number of episodes.
+
+The statistics of the chunks, and of the experiments when the groups are
+combined, are merged with the parallel version of Welford's algorithm
+(Chan et al.), so the means and standard deviations are the ones that pandas
+computes on the full dataframe.
+
+The statistics can be persisted per dialogue pair in the results directory
+(see STATE_FILE), so that after adding a model only the scores of the new or
+changed dialogue pairs are read (see update_state).
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+import evaluation.evalutils as utils
+
+STATS_KEYS = ['game', 'model', 'experiment', 'metric']
+STATS_COLUMNS = ['count', 'sum', 'm2']
+# number of scores.json files read at once
+CHUNK_SIZE = 10000
+# persisted statistics per dialogue pair, in the results directory
+STATE_FILE = 'results_state.json'
+# increase to aggregate all dialogue pairs again after changing the statistics
+STATE_VERSION = 1
+
+
+def aggregate_episode_scores(path: str = utils.RESULTS_DIR,
+                             game_name: str = None,
+                             chunk_size: int = CHUNK_SIZE,
+                             threads: int = utils.LOAD_THREADS,
+                             files: list = None) -> pd.DataFrame:
+    """Compute the statistics of all episode scores, chunk by chunk.
+
+    :param files: the scores.json files to read (see utils.list_score_files);
+                  default: all scored episodes in the results directory
+    :return: the STATS_COLUMNS indexed by the STATS_KEYS
+    """
+    if files is None:
+        files = utils.list_score_files(path, game_name)
+    print(f'Aggregating scores of {len(files)} scored episodes '
+          f'in chunks of {chunk_size}.')
+    stats = empty_stats()
+    with tqdm(total=len(files), desc="Aggregating scores") as progress:
+        for start in range(0, len(files), chunk_size):
+            chunk = [(naming, os.path.join(path, rel_path))
+                     for naming, rel_path, _ in files[start:start + chunk_size]]
+            df_chunk = read_episode_scores(chunk, threads)
+            stats = merge_stats(stats, chunk_stats(df_chunk))
+            progress.update(len(chunk))
+    return stats
+
+
+def read_episode_scores(files: list,
+                        threads: int = utils.LOAD_THREADS) -> pd.DataFrame:
+    """Read the episode scores of some scores.json files into a dataframe."""
+    scores = utils.load_score_files(files, threads, progress=False)
+    rows = [(game, model, experiment, metric, value)
+            for (game, model, experiment, _), data in scores.items()
+            for metric, value in data['episodes'].items()]
+    df = pd.DataFrame(rows, columns=STATS_KEYS + ['value'])
+    df['value'] = df['value'].astype(float)
+    return df
+
+
+def empty_stats() -> pd.DataFrame:
+    """Return statistics without any groups."""
+    index = pd.MultiIndex.from_tuples([], names=STATS_KEYS)
+    return pd.DataFrame({col: pd.Series(dtype=float)
+                         for col in STATS_COLUMNS}, index=index)
+
+
+def chunk_stats(df: pd.DataFrame) -> pd.DataFrame:
+    """Compute the statistics of the scores in a dataframe, per group."""
+    grouped = df.groupby(STATS_KEYS, observed=True)['value']
+    stats = grouped.agg(['count', 'sum'])
+    # sum of squared deviations (0 for groups with less than two scores)
+    stats['m2'] = (grouped.var(ddof=0) * stats['count']).fillna(0)
+    return stats.astype(float)
+
+
+def merge_stats(stats_a: pd.DataFrame, stats_b: pd.DataFrame) -> pd.DataFrame:
+    """Merge the statistics of two sets of scores, group by group."""
+    stats_a, stats_b = stats_a.align(stats_b, fill_value=0)
+    count = stats_a['count'] + stats_b['count']
+    delta = _mean(stats_b) - _mean(stats_a)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correction = delta ** 2 * stats_a['count'] * stats_b['count'] / count
+    merged = pd.DataFrame({
+        'count': count,
+        'sum': stats_a['sum'] + stats_b['sum'],
+        'm2': stats_a['m2'] + stats_b['m2'] + correction.fillna(0)})
+    return merged
+
+
+def combine_stats(stats: pd.DataFrame, by: list) -> pd.DataFrame:
+    """Merge the statistics of the groups with the same values in by.
+
+    E.g. by=['game', 'model', 'metric'] combines the experiments.
+    """
+    stats = stats.copy()
+    grouped = stats.groupby(level=by, observed=True)
+    combined = grouped[['count', 'sum']].sum()
+    # M2 of the union: the M2 of the groups plus their spread around the mean
+    group_totals = pd.DataFrame({'count': grouped['count'].transform('sum'),
+                                 'sum': grouped['sum'].transform('sum')})
+    deviations = (_mean(stats) - _mean(group_totals)) ** 2
+    stats['spread'] = (stats['count'] * deviations).fillna(0)
+    grouped = stats.groupby(level=by, observed=True)
+    combined['m2'] = grouped['m2'].sum() + grouped['spread'].sum()
+    return combined
+
+
+def stats_summary(stats: pd.DataFrame) -> pd.DataFrame:
+    """Add the mean and the (sample) standard deviation of each group.
+
+    As in pandas, the mean of a group without scores and the standard
+    deviation of a group with less than two scores are NaN.
+    """
+    stats = stats.copy()
+    stats['mean'] = _mean(stats)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = stats['m2'] / (stats['count'] - 1)
+    stats['std'] = np.sqrt(variance.where(stats['count'] > 1))
+    return stats
+
+
+def _mean(stats: pd.DataFrame) -> pd.Series:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return stats['sum'] / stats['count'].where(stats['count'] > 0)
+
+
+def update_state(path: str = utils.RESULTS_DIR,
+                 chunk_size: int = CHUNK_SIZE,
+                 threads: int = utils.LOAD_THREADS,
+                 rebuild: bool = False) -> pd.DataFrame:
+    """Aggregate the scores of the dialogue pairs that changed since last time.
+
+    A dialogue pair changed, when one of its scores.json files was added,
+    removed or modified. The statistics of the other pairs are taken from the
+    persisted state, which is then updated.
+
+    :param rebuild: aggregate all dialogue pairs
+    :return: the statistics of all scores (see aggregate_episode_scores)
+    """
+    files_by_pair = {}
+    for file in utils.list_score_files(path):
+        naming = file[0]
+        files_by_pair.setdefault(naming[1], []).append(file)
+    state = {} if rebuild else load_state(path)
+    pairs, changed = {}, []
+    for pair, files in files_by_pair.items():
+        fingerprint = files_fingerprint(files)
+        if pair in state and state[pair]['fingerprint'] == fingerprint:
+            pairs[pair] = state[pair]
+        else:
+            changed.append(pair)
+    print(f'Updating the statistics of {len(changed)} of '
+          f'{len(files_by_pair)} dialogue pairs.')
+    for pair in changed:
+        files = files_by_pair[pair]
+        pairs[pair] = {
+            'fingerprint': files_fingerprint(files),
+            'stats': aggregate_episode_scores(path, chunk_size=chunk_size,
+                                              threads=threads, files=files)}
+    if changed or set(state) != set(pairs):
+        save_state(path, pairs)
+    if not pairs:
+        return empty_stats()
+    return pd.concat([entry['stats'] for entry in pairs.values()])
+
+
+def files_fingerprint(files: list) -> str:
+    """Hash the paths and modification times of scores.json files."""
+    fingerprint = hashlib.sha1()
+    for _, rel_path, mtime in sorted(files, key=lambda file: file[1]):
+        fingerprint.update(f'{rel_path} {mtime}\n'.encode())
+    return fingerprint.hexdigest()
+
+
+def load_state(path: str) -> dict:
+    """Load the persisted statistics by dialogue pair; empty, if outdated."""
+    try:
+        state = utils.load_json(os.path.join(path, STATE_FILE))
+    except (FileNotFoundError, ValueError):
+        return {}
+    if state.get('version') != STATE_VERSION:
+        return {}
+    return {pair: {'fingerprint': entry['fingerprint'],
+                   'stats': pd.DataFrame(entry['stats'],
+                                         columns=STATS_KEYS + STATS_COLUMNS)
+                              .set_index(STATS_KEYS)}
+            for pair, entry in state['pairs'].items()}
+
+
+def save_state(path: str, pairs: dict) -> None:
+    """Persist the statistics by dialogue pair (replacing the file at once)."""
+    state = {'version': STATE_VERSION,
+             'pairs': {pair: {'fingerprint': entry['fingerprint'],
+                              'stats': entry['stats'].reset_index()
+                                                     .values.tolist()}
+                       for pair, entry in pairs.items()}}
+    file_path = os.path.join(path, STATE_FILE)
+    with open(file_path + '.tmp', 'w') as file:
+        json.dump(state, file)
+    os.replace(file_path + '.tmp', file_path)
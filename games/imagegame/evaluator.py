@@ -1,3 +1,10 @@
+import functools
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+EMPTY_CELL = '▢'
+
 
 def get_size(grid):
     rows = grid.strip().split('\n')
@@ -11,39 +18,102 @@ def get_size(grid):
 
     return row_size, column_size
 
-def evaluate(target, generated):
 
-    if get_size(target) != get_size(generated):
-        return 0.0, 0.0, 0.0
+@functools.lru_cache(maxsize=4096)
+def parse_grid(grid: str) -> np.ndarray:
+    """
+    Parse a grid into an array of its (lower-cased) cells. The arrays are cached, because the same grids
+    (the targets, the empty grid and often the generated grids) are scored over and over again.
+    Note: The returned array is read-only, because it is shared.
+    :param grid: the rows separated by newlines and the cells by spaces
+    :return: the cells as an array of shape (rows, columns)
+    :raise ValueError: if the rows have different numbers of cells
+    """
+    rows = [[cell.lower() for cell in row.split(' ')] for row in grid.strip().split('\n')]
+    if len(set(len(row) for row in rows)) != 1:
+        raise ValueError(f"Grid rows have different numbers of cells: {grid!r}")
+    cells = np.array(rows)
+    cells.setflags(write=False)
+    return cells
+
 
+def evaluate(target, generated):
+    precision_recall_f1 = evaluate_batch([target], [generated])[0]
+    if precision_recall_f1 is None:
+        raise ValueError(f"Cannot evaluate the generated grid: {generated!r}")
+    return precision_recall_f1
+
+
+def evaluate_batch(targets: List[str], generated: List[str]) -> List[Optional[Tuple[float, float, float]]]:
+    """
+    Compute precision, recall and F1 (in percent) of the generated grids against the target grids.
+    The cell matches are counted for all grids (of the same size) at once.
+    :param targets: the target grids
+    :param generated: the generated grids (one for each target grid)
+    :return: precision, recall and F1 for each pair; all 0.0 for grids of different sizes (see get_size);
+             None, if the grids cannot be evaluated (no filled cells or too short rows of the generated grid)
+    """
+    results = [None] * len(targets)
+    pairs_by_shape = {}
+    for idx, (target, generation) in enumerate(zip(targets, generated)):
+        try:
+            target_cells, generated_cells = parse_grid(target), parse_grid(generation)
+        except ValueError:  # rows of different lengths: compare the cells row by row
+            if get_size(target) != get_size(generation):
+                results[idx] = 0.0, 0.0, 0.0
+            else:
+                results[idx] = _evaluate_rows(target, generation)
+            continue
+        if target_cells.shape != generated_cells.shape:
+            results[idx] = 0.0, 0.0, 0.0
+            continue
+        pairs_by_shape.setdefault(target_cells.shape, []).append((idx, target_cells, generated_cells))
+
+    for pairs in pairs_by_shape.values():
+        target_cells = np.stack([target for _, target, _ in pairs])
+        generated_cells = np.stack([generation for _, _, generation in pairs])
+        matches = target_cells == generated_cells
+        target_filled = target_cells != EMPTY_CELL
+        generated_filled = generated_cells != EMPTY_CELL
+        recall_counts = (matches & target_filled).sum(axis=(1, 2))
+        total_recall_counts = target_filled.sum(axis=(1, 2))
+        precision_counts = (matches & generated_filled).sum(axis=(1, 2))
+        total_precision_counts = generated_filled.sum(axis=(1, 2))
+        for (idx, _, _), recall_counter, total_recall_counter, precision_counter, total_precision_counter in zip(
+                pairs, recall_counts.tolist(), total_recall_counts.tolist(),
+                precision_counts.tolist(), total_precision_counts.tolist()):
+            if total_recall_counter == 0 or total_precision_counter == 0:
+                continue
+            results[idx] = _precision_recall_f1(recall_counter, total_recall_counter,
+                                                precision_counter, total_precision_counter)
+    return results
+
+
+def _evaluate_rows(target: str, generated: str) -> Optional[Tuple[float, float, float]]:
+    """ The cell by cell evaluation of grids whose rows have different lengths (see evaluate_batch) """
     target_rows = target.strip().split('\n')
     generated_rows = generated.strip().split('\n')
-
-    recall_counter = 0
-    total_recall_counter = 0
-
-    precision_counter = 0
-    total_precision_counter = 0
-
-    for r_index in range(0, len(target_rows)):
-
-        target_cells = target_rows[r_index].split(' ')
-        generated_cells = generated_rows[r_index].split(' ')
-
-        for c_index in range(0, len(target_cells)):
-
-            if target_cells[c_index] != '▢':
-                total_recall_counter += 1
-
-                if target_cells[c_index].lower() == generated_cells[c_index].lower():
-                    recall_counter += 1
-
-            if generated_cells[c_index] != '▢':
-                total_precision_counter += 1
-
-                if target_cells[c_index].lower() == generated_cells[c_index].lower():
-                    precision_counter += 1
-
+    recall_counter, total_recall_counter, precision_counter, total_precision_counter = 0, 0, 0, 0
+    try:
+        for target_row, generated_row in zip(target_rows, generated_rows):
+            target_cells = target_row.split(' ')
+            generated_cells = generated_row.split(' ')
+            for c_index in range(0, len(target_cells)):
+                is_match = target_cells[c_index].lower() == generated_cells[c_index].lower()
+                if target_cells[c_index] != EMPTY_CELL:
+                    total_recall_counter += 1
+                    recall_counter += is_match
+                if generated_cells[c_index] != EMPTY_CELL:
+                    total_precision_counter += 1
+                    precision_counter += is_match
+    except IndexError:
+        return None
+    if total_recall_counter == 0 or total_precision_counter == 0:
+        return None
+    return _precision_recall_f1(recall_counter, total_recall_counter, precision_counter, total_precision_counter)
+
+
+def _precision_recall_f1(recall_counter, total_recall_counter, precision_counter, total_precision_counter):
     recall = round(recall_counter/float(total_recall_counter), 4)
     precision = round(precision_counter / float(total_precision_counter), 4)
 
@@ -59,20 +129,58 @@ def evaluate(target, generated):
 
     return precision, recall, f1
 
-def calculate_flipped_pixels(previous, current):
-    target_rows = previous.strip().split('\n')
-    generated_rows = current.strip().split('\n')
 
+def calculate_flipped_pixels(previous, current):
+    flipped_count = calculate_flipped_pixels_batch([previous], [current])[0]
+    if flipped_count is None:
+        raise ValueError(f"Cannot compare the grids: {previous!r} and {current!r}")
+    return flipped_count
+
+
+def calculate_flipped_pixels_batch(previous: List[str], current: List[str]) -> List[Optional[int]]:
+    """
+    Count the cells that changed from each previous grid to the current grid.
+    The changed cells are counted for all grids (of the same size) at once.
+    :param previous: the grids before
+    :param current: the grids after (one for each previous grid)
+    :return: the number of changed cells for each pair; None, if the grids cannot be compared
+             (the current grid has fewer rows or cells than the previous one)
+    """
+    results = [None] * len(previous)
+    pairs_by_shape = {}
+    for idx, (previous_grid, current_grid) in enumerate(zip(previous, current)):
+        try:
+            previous_cells, current_cells = parse_grid(previous_grid), parse_grid(current_grid)
+        except ValueError:  # rows of different lengths: compare the cells row by row
+            results[idx] = _count_flipped_rows(previous_grid, current_grid)
+            continue
+        rows, columns = previous_cells.shape
+        if current_cells.shape[0] < rows or current_cells.shape[1] < columns:
+            continue
+        # additional cells of the current grid are not counted
+        pairs_by_shape.setdefault((rows, columns), []).append((idx, previous_cells, current_cells[:rows, :columns]))
+
+    for pairs in pairs_by_shape.values():
+        previous_cells = np.stack([previous_grid for _, previous_grid, _ in pairs])
+        current_cells = np.stack([current_grid for _, _, current_grid in pairs])
+        flipped_counts = (previous_cells != current_cells).sum(axis=(1, 2))
+        for (idx, _, _), flipped_count in zip(pairs, flipped_counts.tolist()):
+            results[idx] = flipped_count
+    return results
+
+
+def _count_flipped_rows(previous: str, current: str) -> Optional[int]:
+    """ The cell by cell comparison of grids whose rows have different lengths (see calculate_flipped_pixels_batch) """
+    previous_rows = previous.strip().split('\n')
+    current_rows = current.strip().split('\n')
+    if len(current_rows) < len(previous_rows):
+        return None
     flipped_counter = 0
-
-    for r_index in range(0, len(target_rows)):
-
-        target_cells = target_rows[r_index].split(' ')
-        generated_cells = generated_rows[r_index].split(' ')
-
-        for c_index in range(0, len(target_cells)):
-
-            if target_cells[c_index].lower() != generated_cells[c_index].lower():
-                flipped_counter += 1
-
+    for previous_row, current_row in zip(previous_rows, current_rows):
+        previous_cells = previous_row.split(' ')
+        current_cells = current_row.split(' ')
+        if len(current_cells) < len(previous_cells):
+            return None
+        flipped_counter += sum(previous_cell.lower() != current_cell.lower()
+                               for previous_cell, current_cell in zip(previous_cells, current_cells))
     return flipped_counter
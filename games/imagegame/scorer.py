@@ -0,0 +1,213 @@
+from typing import Dict
+
+from clemgame import metrics
+from clemgame.scoring import GameScorer
+from games.imagegame.evaluator import evaluate_batch, calculate_flipped_pixels_batch
+import re
+import math
+
+GAME_NAME = "imagegame"
+
+PLAYER_B_PATTERN = r'^\n*([A-Z▢]\s){4}[A-Z▢]\n([A-Z▢]\s){4}[A-Z▢]\n([A-Z▢]\s){4}[A-Z▢]\n([A-Z▢]\s){4}[A-Z▢]\n([A-Z▢]\s){4}[A-Z▢]\n*$'
+TERMINATE_PATTERN = r'^Instruction:\s*(DONE|Done|done)'
+
+EMPTY_GRID = '▢ ▢ ▢ ▢ ▢\n▢ ▢ ▢ ▢ ▢\n▢ ▢ ▢ ▢ ▢\n▢ ▢ ▢ ▢ ▢\n▢ ▢ ▢ ▢ ▢'
+
+
+class ImageGameScorer(GameScorer):
+
+    def __init__(self, experiment: Dict, game_instance: Dict):
+        super().__init__(GAME_NAME, experiment, game_instance)
+        self.player_b_pattern = re.compile(PLAYER_B_PATTERN)
+        self.terminate_pattern = re.compile(TERMINATE_PATTERN)
+
+    def compute_scores(self, episode_interactions: Dict) -> None:
+
+        precision, recall, f1 = 0, 0, 0
+
+        flipped_count_sum = 0
+        expression_length_sum = 0
+        expression_number_of_tokens = 0
+
+        episode_request_count = 0
+        episode_parsed_request_count = 0
+        episode_violated_request_count = 0
+
+        aborted = False
+        number_of_turns = 0
+
+        # loop over each turn and collect the played turns, so that their grids are scored all at once
+        played_turns = []
+        for t_index, turn in enumerate(episode_interactions["turns"]):
+
+            turn_request_count = 0
+            turn_parsed_request_count = 0
+            turn_violated_request_count = 0
+
+            # Player 1 message
+            player_1_message = turn[1]['action']['content']
+
+            # Player generates "DONE"
+            match = self.terminate_pattern.match(player_1_message)
+            if match:
+                break
+
+            turn_request_count += 1
+            episode_request_count += 1
+
+            # check the Player 1 message if it matches the rule, start with "Instruction:"
+            player_1_message_matched = False
+            if player_1_message.startswith('Instruction:'):
+                if '\n' in player_1_message:
+                    parsed_instruction = player_1_message.split('\n')[0]
+                    player_1_message = parsed_instruction
+                player_1_message_matched = True
+
+
+            if player_1_message_matched:
+                turn_parsed_request_count += 1
+                episode_parsed_request_count += 1
+            else:
+                turn_violated_request_count += 1
+                episode_violated_request_count += 1
+                aborted = True
+                # do not continue processing the rest of the turn when the game is aborted
+                break
+
+            # check if the turn includes the Player 2 message
+            # in case the turn doesn't include an item and index position 4, it means the game has been aborted
+            if len(turn) < 4:
+                aborted = True
+                break
+
+            # Player 2 message
+            player_2_message = turn[4]['action']['content']
+            turn_request_count += 1
+            episode_request_count += 1
+
+            # check Player 2 message if it matches the instruction => grid
+            match = self.player_b_pattern.match(player_2_message)
+            if match:
+                turn_parsed_request_count += 1
+                episode_parsed_request_count += 1
+            else:
+                turn_violated_request_count += 1
+                episode_violated_request_count += 1
+                aborted = True
+                break
+
+            # number of turns other
+            number_of_turns += 1
+            played_turns.append((t_index, player_1_message, player_2_message,
+                                 turn_request_count, turn_parsed_request_count, turn_violated_request_count))
+
+        # calculate player-specific and turn-specific metrics
+        turn_grids = [player_2_message for _, _, player_2_message, _, _, _ in played_turns]
+        turn_scores = evaluate_batch([self.game_instance['target_grid']] * len(turn_grids), turn_grids)
+        # the first grid is compared to the empty grid
+        flipped_counts = calculate_flipped_pixels_batch([EMPTY_GRID] + turn_grids[:-1], turn_grids)
+
+        for played_turn, turn_score, flipped_count in zip(played_turns, turn_scores, flipped_counts):
+            t_index, player_1_message, _, turn_request_count, turn_parsed_request_count, \
+                turn_violated_request_count = played_turn
+
+            # keep the scores of the previous turn, when the grid cannot be evaluated
+            if turn_score is not None:
+                precision, recall, f1 = turn_score
+
+            # Player 1 - message length
+            expression_length = len(player_1_message.replace('Instruction:', '').strip())
+            self.log_turn_score(t_index, 'Generated Expression Length', expression_length)
+            expression_length_sum += expression_length
+
+            # Player 1 - number of tokens in the generated expression
+            number_of_tokens = len(player_1_message.replace('Instruction:', '').strip().split(' '))
+            self.log_turn_score(t_index, 'Generated Expression Number of Tokens', number_of_tokens)
+            expression_number_of_tokens += number_of_tokens
+
+            self.log_turn_score(t_index, 'Precision', precision)
+            self.log_turn_score(t_index, 'Recall', recall)
+            self.log_turn_score(t_index, 'F1', f1)
+
+            # flipped pixel counts
+            if flipped_count is None:
+                flipped_count = 0
+            flipped_count_sum += flipped_count
+            self.log_turn_score(t_index, 'Changed Cell Count', flipped_count)
+
+            # request count, parsed & violated request counts
+            self.log_turn_score(t_index, metrics.METRIC_REQUEST_COUNT,
+                                turn_request_count)
+            self.log_turn_score(t_index, metrics.METRIC_REQUEST_COUNT_PARSED,
+                                turn_parsed_request_count)
+            self.log_turn_score(t_index, metrics.METRIC_REQUEST_COUNT_VIOLATED,
+                                turn_violated_request_count)
+
+        # Episode level logging
+        if aborted:
+            # if aborted give NaN value to all metrics
+            self.log_episode_score('Precision', math.nan)
+            self.log_episode_score('Recall', math.nan)
+            self.log_episode_score('F1', math.nan)
+            self.log_episode_score(metrics.BENCH_SCORE, math.nan)
+
+            # average of flipped pixel counts
+            self.log_episode_score('Average Changed Cell Count', math.nan)
+
+            # average of expression length
+            self.log_episode_score('Average Generated Instruction Length', math.nan)
+
+            # average of number of tokens in generated expression
+            self.log_episode_score('Average Generated Expression Number of Tokens', math.nan)
+
+            # the last turn scores are also the scores for the episode
+            self.log_episode_score(metrics.METRIC_SUCCESS, 0)
+
+            # lose ratio
+            self.log_episode_score(metrics.METRIC_LOSE, 0)
+
+            # aborted ratio
+            self.log_episode_score(metrics.METRIC_ABORTED, 1)
+        else:
+            # the last turn scores are also the scores for the episode
+            self.log_episode_score('Precision', precision)
+            self.log_episode_score('Recall', recall)
+            self.log_episode_score('F1', f1)
+            self.log_episode_score(metrics.BENCH_SCORE, f1)
+
+            # average of flipped pixel counts
+            flipped_count_sum = round(flipped_count_sum / float(number_of_turns), 4)
+            self.log_episode_score('Average Changed Cell Count', flipped_count_sum)
+
+            # average of expression length
+            expression_length_sum = round(expression_length_sum / float(number_of_turns), 4)
+            self.log_episode_score('Average Generated Instruction Length', expression_length_sum)
+
+            # average of number of tokens in generated expression
+            expression_number_of_tokens = round(expression_number_of_tokens / float(number_of_turns), 4)
+            self.log_episode_score('Average Generated Expression Number of Tokens', expression_number_of_tokens)
+
+            # the last turn scores are also the scores for the episode
+            self.log_episode_score(metrics.METRIC_SUCCESS, 1 if f1 >= 99 else 0)
+
+            # lose ratio
+            self.log_episode_score(metrics.METRIC_LOSE, 0 if f1 >= 99 else 1)
+
+            # aborted ratio
+            self.log_episode_score(metrics.METRIC_ABORTED, 0)
+
+        # request count, parsed & violated request counts
+        self.log_episode_score(metrics.METRIC_REQUEST_COUNT, episode_request_count)
+        self.log_episode_score(metrics.METRIC_REQUEST_COUNT_VIOLATED, episode_violated_request_count)
+        self.log_episode_score(metrics.METRIC_REQUEST_COUNT_PARSED, episode_parsed_request_count)
+
+        # request success ratio
+        if episode_request_count == 0:
+            self.log_episode_score(metrics.METRIC_REQUEST_SUCCESS, 0)
+        else:
+            request_success_ratio = round(episode_parsed_request_count / float(episode_request_count), 4)
+            self.log_episode_score(metrics.METRIC_REQUEST_SUCCESS, request_success_ratio)
+
+
+def create_game_scorer(experiment: Dict, game_instance: Dict) -> GameScorer:
+    return ImageGameScorer(experiment, game_instance)
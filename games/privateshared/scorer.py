@@ -0,0 +1,116 @@
+"""
+Compute the scores of a played PrivateShared episode from its records.
+"""
+
+from typing import List, Dict, Tuple
+
+import numpy as np
+from sklearn.metrics import accuracy_score as acc_score
+from sklearn.metrics import cohen_kappa_score
+
+import clemgame.metrics as ms
+from clemgame.scoring import GameScorer
+
+from games.privateshared.constants import GAME_NAME
+
+
+class PrivateSharedScorer(GameScorer):
+    """Compute the scores of a played PrivateShared episode."""
+    def __init__(self, experiment: Dict, game_instance: Dict):
+        super().__init__(GAME_NAME, experiment, game_instance)
+
+    def _compute_turn_scores(self, logs: Dict, turn: int) -> Tuple[List, List]:
+        """Compute and log turn-level scores."""
+        # common scores
+        reqs = logs[ms.METRIC_REQUEST_COUNT][turn]
+        p_reqs = logs[ms.METRIC_REQUEST_COUNT_PARSED][turn]
+        v_reqs = logs[ms.METRIC_REQUEST_COUNT_VIOLATED][turn]
+
+        self.log_turn_score(turn, ms.METRIC_REQUEST_COUNT, reqs)
+        self.log_turn_score(turn, ms.METRIC_REQUEST_COUNT_PARSED, p_reqs)
+        self.log_turn_score(turn, ms.METRIC_REQUEST_COUNT_VIOLATED, v_reqs)
+
+        # specific scores
+        turn_gt, turn_pred = self._get_gold_pred(logs['probes'][turn])
+        acc = acc_score(turn_gt, turn_pred)
+        self.log_turn_score(turn, 'Accuracy', acc)
+        if turn != 0:
+            # no slot in the first probing round
+            # -1 because the probing turn ids are shifted one step
+            filled = int(logs['Filled Slots'][turn - 1])
+            self.log_turn_score(turn, 'Slot Filled?', filled)
+
+        return turn_gt, turn_pred
+
+    def _compute_episode_scores(self,
+                                gold: List,
+                                pred: List,
+                                logs: Dict,
+                                aborted: bool
+                                ) -> None:
+        """Compute and log episode-level scores."""
+        # specific scores
+        acc = acc_score(gold, pred) if not aborted else np.nan
+        kappa = cohen_kappa_score(gold, pred) if not aborted else np.nan
+        # we truncate kappa to be between 0 and 1
+        trunc_kappa = max(0, kappa) if not aborted else np.nan
+        filled = logs['Filled Slots']
+        sf_acc = sum(filled) / len(filled) if not aborted else np.nan
+        bench_score = self.compute_bench_score(sf_acc, trunc_kappa)
+
+        self.log_episode_score('Accuracy', acc)
+        self.log_episode_score('Kappa', kappa)
+        self.log_episode_score('Truncated Kappa', trunc_kappa)
+        self.log_episode_score('Slot-Filling-Accuracy', sf_acc)
+        self.log_episode_score(ms.BENCH_SCORE, bench_score)
+
+        # common scores
+        success_ratio = int(acc == 1. and sf_acc == 1.) if not aborted else 0
+        lose_ratio = int(not success_ratio) if not aborted else 0
+        reqs = sum(logs[ms.METRIC_REQUEST_COUNT])
+        parsed_reqs = sum(logs[ms.METRIC_REQUEST_COUNT_PARSED])
+        violated_reqs = sum(logs[ms.METRIC_REQUEST_COUNT_VIOLATED])
+
+        self.log_episode_score(ms.METRIC_ABORTED, int(aborted))
+        self.log_episode_score(ms.METRIC_LOSE, lose_ratio)
+        self.log_episode_score(ms.METRIC_SUCCESS, success_ratio)
+        self.log_episode_score(ms.METRIC_REQUEST_COUNT, reqs)
+        self.log_episode_score(ms.METRIC_REQUEST_COUNT_PARSED, parsed_reqs)
+        self.log_episode_score(ms.METRIC_REQUEST_COUNT_VIOLATED, violated_reqs)
+        self.log_episode_score(ms.METRIC_REQUEST_SUCCESS, parsed_reqs / reqs)
+
+    def compute_scores(self, episode_interactions: Dict) -> None:
+        logs = episode_interactions
+        gold = []
+        pred = []
+        aborted = logs['Aborted']
+        for turn in range(logs['Played Probe Rounds']):
+            turn_gt, turn_pred = self._compute_turn_scores(logs, turn)
+            gold += turn_gt
+            pred += turn_pred
+            # n_probes = n_slots + 1, we take the third round of probing here
+            if turn == int((len(self.game_instance['slots']) + 1) / 2) - 1:
+                mid_acc = acc_score(turn_gt, turn_pred) if not aborted else np.nan
+                self.log_episode_score('Middle-Accuracy', mid_acc)
+
+        self._compute_episode_scores(gold, pred, logs, aborted)
+
+    @staticmethod
+    def compute_bench_score(sf_acc: float, kappa: float) -> float:
+        """Compute the preferred score in [0, 100] for the benchmark."""
+        if np.isnan(sf_acc) or np.isnan(kappa):
+            return np.nan
+        if sf_acc + kappa == 0:
+            return 0
+        # harmonic mean between accuracy and truncated kappa
+        # normalised to 0-100
+        return 100 * (2 * sf_acc * kappa / (sf_acc + kappa))
+
+    def _get_gold_pred(self, turns: List) -> Tuple[List, List]:
+        """Retrieve the gold standard and the predictions for all turns."""
+        gold, pred = zip(*[(item['gt'], item['value']) for item in turns])
+        return gold, pred
+
+
+def create_game_scorer(experiment: Dict, game_instance: Dict) -> GameScorer:
+    return PrivateSharedScorer(experiment, game_instance)
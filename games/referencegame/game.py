@@ -1,5 +1,6 @@
 from typing import Dict, List
 
+import backends
 from clemgame.clemgame import Player
 
 
@@ -60,6 +61,8 @@ class InstructionGiver(Player):
 
     def __init__(self, model_name):
         super().__init__(model_name)
+        # the game master only keeps the first line of the expression
+        self.stop_conditions = backends.StopConditions(max_lines=1)
 
     def __call__(self, instruction: Instruction, turn_idx):
         return super().__call__(instruction.convert_to_query_messages(), turn_idx)
@@ -1,15 +1,12 @@
 from typing import List, Tuple, Dict
-import numpy as np
 
 from clemgame.clemgame import GameMaster, GameBenchmark
 from clemgame import get_logger
-import clemgame.metrics as metrics
 from games.wordle.game import WordleGame
-from games.wordle.utils.compute_metrics import ComputeMetrics
+from games.wordle.scorer import GAME_NAME
 from games.wordle.utils.guessvalidator import GuessValidator
 
 logger = get_logger(__name__)
-GAME_NAME = "wordle"
 
 
 class WordleGameMaster(GameMaster):
@@ -18,8 +15,6 @@ class WordleGameMaster(GameMaster):
         self.config = experiment
         self.players_backends = players_backends
 
-        self.cm = ComputeMetrics()
-
     def setup(self, game_id, target_word, target_word_clue, target_word_difficulty):
         self.game_id = game_id
 
@@ -474,231 +469,6 @@ class WordleGameMaster(GameMaster):
             f"game_result = {self.game_final_status}", data_for_computation
         )
 
-    def _compute_req_count(
-        self,
-        guesser_req_count,
-        critic_req_count,
-        guesser_parsed_req_count,
-        critic_parsed_req_count,
-        turns_req_count,
-        turns_parse_count,
-    ):
-        # Log API request count and parsed request count
-        req_count = guesser_req_count + critic_req_count
-        parsed_req_count = guesser_parsed_req_count + critic_parsed_req_count
-
-        violated_req_count = req_count - parsed_req_count
-        req_success_ratio = round((parsed_req_count / req_count), 2)
-
-        self.log_episode_score(metrics.METRIC_REQUEST_COUNT, req_count)
-        self.log_episode_score(metrics.METRIC_REQUEST_COUNT_PARSED, parsed_req_count)
-        self.log_episode_score(
-            metrics.METRIC_REQUEST_COUNT_VIOLATED, violated_req_count
-        )
-        self.log_episode_score(metrics.METRIC_REQUEST_SUCCESS, req_success_ratio)
-
-        turns_req_values = []
-        if turns_req_count:
-            # Since the count is incremented for each turn, subtract the current count from the previous count to get actual count for this turn
-            turns_req_values = [turns_req_count[0]]
-            turns_req_count = [
-                turns_req_count[i + 1] - turns_req_count[i]
-                for i in range(len(turns_req_count) - 1)
-            ]
-            turns_req_values.extend(turns_req_count)
-            for idx, score in enumerate(turns_req_values):
-                self.log_turn_score(idx + 1, "Request Count", score)
-
-        turns_parse_values = []
-        if turns_parse_count:
-            # Since the count is incremented for each turn, subtract the current count from the previous count to get actual count for this turn
-            turns_parse_values = [turns_parse_count[0]]
-            turns_parse_count = [
-                turns_parse_count[i + 1] - turns_parse_count[i]
-                for i in range(len(turns_parse_count) - 1)
-            ]
-            turns_parse_values.extend(turns_parse_count)
-            for idx, score in enumerate(turns_parse_values):
-                self.log_turn_score(idx + 1, "Parsed Request Count", score)
-
-        turns_violate_count = [
-            turns_req_values[i] - turns_parse_values[i]
-            for i in range(len(turns_req_values))
-        ]
-        if turns_violate_count:
-            for idx, score in enumerate(turns_violate_count):
-                self.log_turn_score(idx + 1, "Violated Request Count", score)
-
-    def _compute_game_status(self, status):
-        aborted = 0
-        loss = 0
-        success = 0
-
-        if status == "ABORTED":
-            aborted = 1
-        elif status == "LOSS":
-            loss = 1
-        else:
-            success = 1
-
-        self.log_episode_score(metrics.METRIC_ABORTED, aborted)
-        self.log_episode_score(metrics.METRIC_LOSE, loss)
-        self.log_episode_score(metrics.METRIC_SUCCESS, success)
-        return aborted, loss
-
-    def _compute_game_specific_metrics(
-        self,
-        aborted,
-        loss,
-        turn_results,
-        use_critic,
-        change_guess_words,
-        target_word_difficulty,
-    ):
-        if aborted:
-            episode_score = np.nan
-            # Turn-scores can be logged even for aborted scenario
-            # turn_score = [np.nan]
-            # turn_strategy_score = [np.nan]
-            speed = np.nan
-            repeats_guess = np.nan
-            num_guess_repeats = np.nan
-        elif loss:
-            episode_score = 0
-            speed = 0
-            # Compute Guess repetition
-            repeats_guess, num_guess_repeats = self.cm.repeats_guess(turn_results)
-        else:
-            # Compute Episode Scores
-            episode_score = self.cm.episodes(turn_results)
-            # Compute Rank
-            speed = self.cm.speed(turn_results)
-            # Compute Guess repetition
-            repeats_guess, num_guess_repeats = self.cm.repeats_guess(turn_results)
-
-        if use_critic:
-            total_yes = np.nan
-            total_no = np.nan
-            use_same_guess_yes = np.nan
-            use_diff_guess_yes = np.nan
-            use_same_guess_no = np.nan
-            use_diff_guess_no = np.nan
-            overall_change = [np.nan]
-            if change_guess_words:
-                results = self.cm.change_of_opinion(change_guess_words)
-                total_yes = results["total_yes"]
-                total_no = results["total_no"]
-                use_same_guess_yes = results["use_same_guess_yes"]
-                use_diff_guess_yes = results["use_diff_guess_yes"]
-                use_same_guess_no = results["use_same_guess_no"]
-                use_diff_guess_no = results["use_diff_guess_no"]
-                overall_change = results["overall_change"]
-
-        # Compute Turn-wise Scores
-        turn_score = [np.nan]
-        turn_strategy_score = [np.nan]
-        if turn_results:
-            turn_score = self.cm.turns(turn_results)
-            # Compute strategy score
-            turn_strategy_score = self.cm.turns_strategy(turn_results)
-            if len(turn_strategy_score) == 1:
-                if aborted:
-                    turn_strategy_score = [0]
-
-        # self.log_episode_score("success", episode_score)
-        self.log_episode_score(metrics.BENCH_SCORE, speed)
-        self.log_episode_score("repeats guess", repeats_guess)
-        self.log_episode_score("total guess repetitions", num_guess_repeats)
-        self.log_key("Target Word Difficulty", target_word_difficulty)
-
-        for idx, score in enumerate(turn_score):
-            self.log_turn_score(idx + 1, "closeness score", score)
-        for idx, score in enumerate(turn_strategy_score):
-            self.log_turn_score(idx + 1, "strategy score", score)
-
-        if use_critic:
-            for idx, score in enumerate(overall_change):
-                self.log_turn_score(idx + 1, "change_of_opinion", overall_change[idx])
-
-            if total_yes == np.nan:
-                self.log_episode_score("Repetition-Guesser-On-Critic-Agreement", np.nan)
-                self.log_episode_score(
-                    "Non-Repetition-Guesser-On-Critic-Agreement", np.nan
-                )
-                self.log_episode_score(
-                    "Repetition-Guesser-On-Critic-Disagreement", np.nan
-                )
-                self.log_episode_score(
-                    "Non-Repetition-Guesser-On-Critic-Disagreement", np.nan
-                )
-            else:
-                if total_yes != 0:
-                    self.log_episode_score(
-                        "Repetition-Guesser-On-Critic-Agreement",
-                        round(use_same_guess_yes / total_yes, 2),
-                    )
-                    self.log_episode_score(
-                        "Non-Repetition-Guesser-On-Critic-Agreement",
-                        round(use_diff_guess_yes / total_yes, 2),
-                    )
-                else:
-                    self.log_episode_score("Repetition-Guesser-On-Critic-Agreement", 0)
-                    self.log_episode_score(
-                        "Non-Repetition-Guesser-On-Critic-Agreement", 0
-                    )
-
-                if total_no != 0:
-                    self.log_episode_score(
-                        "Repetition-Guesser-On-Critic-Disagreement",
-                        round(use_same_guess_no / total_no, 2),
-                    )
-                    self.log_episode_score(
-                        "Non-Repetition-Guesser-On-Critic-Disagreement",
-                        round(use_diff_guess_no / total_no, 2),
-                    )
-                else:
-                    self.log_episode_score(
-                        "Repetition-Guesser-On-Critic-Disagreement", 0
-                    )
-                    self.log_episode_score(
-                        "Non-Repetition-Guesser-On-Critic-Disagreement", 0
-                    )
-
-    def compute_scores(self, episode_interactions: Dict) -> None:
-        for key, val in episode_interactions.items():
-            if key == "turns":
-                # Look for last turn data and in that 'action' key
-                if (
-                    val
-                    and val[-1]
-                    and "action" in val[-1][-1]
-                    and "data_for_computation" in val[-1][-1]["action"]
-                ):
-                    data_to_compute_scores = val[-1][-1]["action"][
-                        "data_for_computation"
-                    ]
-                    if data_to_compute_scores:
-                        aborted, loss = self._compute_game_status(
-                            data_to_compute_scores["game_final_status"]
-                        )
-                        self._compute_req_count(
-                            data_to_compute_scores["guesser_req_count"],
-                            data_to_compute_scores["critic_req_count"],
-                            data_to_compute_scores["guesser_parsed_req_count"],
-                            data_to_compute_scores["critic_parsed_req_count"],
-                            data_to_compute_scores["turns_req_count"],
-                            data_to_compute_scores["turns_parse_count"],
-                        )
-                        self._compute_game_specific_metrics(
-                            aborted,
-                            loss,
-                            data_to_compute_scores["turns_guess_feedback"],
-                            data_to_compute_scores["use_critic"],
-                            data_to_compute_scores["critic_guesses_change"],
-                            data_to_compute_scores["target_word_difficulty"],
-                        )
-                        return
-
 
 class WordleGameBenchmark(GameBenchmark):
     def __init__(self):
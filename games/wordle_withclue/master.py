@@ -2,9 +2,7 @@ from typing import Dict, List
 
 from clemgame.clemgame import GameBenchmark, GameMaster
 from games.wordle.master import WordleGameMaster
-
-# this will resolve into subdirectories to find the instances
-GAME_NAME = "wordle_withclue"
+from games.wordle_withclue.scorer import GAME_NAME
 
 
 class WordleWithClueGameBenchmark(GameBenchmark):
@@ -0,0 +1,11 @@
+from typing import Dict
+
+from clemgame.scoring import GameScorer
+from games.wordle.scorer import WordleScorer
+
+# this will resolve into subdirectories to find the instances
+GAME_NAME = "wordle_withclue"
+
+
+def create_game_scorer(experiment: Dict, game_instance: Dict) -> GameScorer:
+    return WordleScorer(GAME_NAME, experiment, game_instance)
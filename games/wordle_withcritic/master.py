@@ -2,8 +2,7 @@ from typing import Dict, List
 
 from clemgame.clemgame import GameBenchmark, GameMaster
 from games.wordle.master import WordleGameMaster
-
-GAME_NAME = "wordle_withcritic"
+from games.wordle_withcritic.scorer import GAME_NAME
 
 
 class WordleWithClueAndCriticGameBenchmark(GameBenchmark):
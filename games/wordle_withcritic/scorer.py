@@ -0,0 +1,10 @@
+from typing import Dict
+
+from clemgame.scoring import GameScorer
+from games.wordle.scorer import WordleScorer
+
+GAME_NAME = "wordle_withcritic"
+
+
+def create_game_scorer(experiment: Dict, game_instance: Dict) -> GameScorer:
+    return WordleScorer(GAME_NAME, experiment, game_instance)
@@ -1,6 +1,7 @@
 import argparse
 
 from clemgame import benchmark
+from clemgame.scoring import set_recorder_log_level
 
 """
     Use good old argparse to run the commands.
@@ -22,27 +23,54 @@ from clemgame import benchmark
     
     To score a specific game:
     $> python3 scripts/cli.py score -g privateshared
+
+    To score all games with 8 processes:
+    $> python3 scripts/cli.py score -j 8
+
+    To rebuild the results index (results/index.jsonl) after moving or copying result directories:
+    $> python3 scripts/cli.py reindex
+
+    To keep the per-event recorder messages out of clembench.log during a run:
+    $> python3 scripts/cli.py run -g taboo -m mock --recorder_log_level DEBUG
     
     To score all games:
     $> python3 scripts/cli.py transcribe
     
     To score a specific game:
     $> python3 scripts/cli.py transcribe -g privateshared
+
+    To transcribe all games with 8 processes (episodes with up-to-date transcripts are skipped):
+    $> python3 scripts/cli.py transcribe -j 8
+
+    To browse the transcripts rendered on demand at http://localhost:8000 (instead of transcribing all episodes):
+    $> python3 scripts/cli.py serve-transcripts
+
+    To load local models once and serve them at http://localhost:8001 (to runs with CLEMBENCH_MODEL_SERVER set):
+    $> python3 scripts/cli.py model-server -m koala-13B-HF falcon-40b-instruct
 """
 
 
 def main(args):
+    if getattr(args, "recorder_log_level", None):
+        set_recorder_log_level(args.recorder_log_level)
     if args.command_name == "ls":
         benchmark.list_games()
     if args.command_name == "run":
         benchmark.run(args.game,
                       temperature=args.temperature,
                       models=args.models,
-                      experiment_name=args.experiment_name)
+                      experiment_name=args.experiment_name,
+                      prewarm=args.prewarm)
     if args.command_name == "score":
-        benchmark.score(args.game, experiment_name=args.experiment_name)
+        benchmark.score(args.game, experiment_name=args.experiment_name, jobs=args.jobs, force=args.force)
     if args.command_name == "transcribe":
-        benchmark.transcripts(args.game, experiment_name=args.experiment_name)
+        benchmark.transcripts(args.game, experiment_name=args.experiment_name, jobs=args.jobs, force=args.force)
+    if args.command_name == "reindex":
+        benchmark.reindex(args.results_path)
+    if args.command_name == "serve-transcripts":
+        benchmark.serve_transcripts(args.host, args.port, args.results_path, args.cache_size)
+    if args.command_name == "model-server":
+        benchmark.serve_models(args.models, args.host, args.port, args.batch_size)
 
 
 if __name__ == "__main__":
@@ -71,18 +99,58 @@ if __name__ == "__main__":
                             help="Optional argument to only run a specific experiment")
     run_parser.add_argument("-g", "--game", type=str,
                             required=True, help="A specific game name (see ls).")
+    run_parser.add_argument("--recorder_log_level", type=str, choices=["DEBUG", "INFO", "WARNING"],
+                            help="Level of the per-event and per-score recorder messages. Default: INFO.")
+    run_parser.add_argument("--prewarm", action="store_true",
+                            help="Read the weights of local models into the page cache in the background, "
+                                 "while the game is set up.")
 
     score_parser = sub_parsers.add_parser("score")
     score_parser.add_argument("-e", "--experiment_name", type=str,
                               help="Optional argument to only run a specific experiment")
     score_parser.add_argument("-g", "--game", type=str,
                               help="A specific game name (see ls).", default="all")
+    score_parser.add_argument("-j", "--jobs", type=int, default=1,
+                              help="Number of processes to score the episodes with. Default: 1.")
+    score_parser.add_argument("-f", "--force", action="store_true",
+                              help="Re-score all episodes, also those whose scores are up-to-date.")
+    score_parser.add_argument("--recorder_log_level", type=str, choices=["DEBUG", "INFO", "WARNING"],
+                              help="Level of the per-score recorder messages. Default: INFO.")
 
     transcribe_parser = sub_parsers.add_parser("transcribe")
     transcribe_parser.add_argument("-e", "--experiment_name", type=str,
                                    help="Optional argument to only run a specific experiment")
     transcribe_parser.add_argument("-g", "--game", type=str,
                                    help="A specific game name (see ls).", default="all")
+    transcribe_parser.add_argument("-j", "--jobs", type=int, default=1,
+                                   help="Number of processes to build the transcripts with. Default: 1.")
+    transcribe_parser.add_argument("-f", "--force", action="store_true",
+                                   help="Re-build all transcripts, also those newer than the interactions.")
+
+    reindex_parser = sub_parsers.add_parser("reindex")
+    reindex_parser.add_argument("-p", "--results_path", type=str,
+                                help="Path to the results folder. Default: results in the project root.")
+
+    serve_parser = sub_parsers.add_parser("serve-transcripts")
+    serve_parser.add_argument("--host", type=str, default="localhost",
+                              help="The host to listen on. Default: localhost.")
+    serve_parser.add_argument("--port", type=int, default=8000,
+                              help="The port to listen on. Default: 8000.")
+    serve_parser.add_argument("-p", "--results_path", type=str,
+                              help="Path to the results folder. Default: results in the project root.")
+    serve_parser.add_argument("--cache_size", type=int, default=256,
+                              help="Number of rendered transcripts to keep in memory. Default: 256.")
+
+    model_server_parser = sub_parsers.add_parser("model-server")
+    model_server_parser.add_argument("-m", "--models", type=str, nargs="+", required=True,
+                                     help="The models to load and serve (names supported by the local backends).")
+    model_server_parser.add_argument("--host", type=str, default="localhost",
+                                     help="The host to listen on. Default: localhost.")
+    model_server_parser.add_argument("--port", type=int, default=8001,
+                                     help="The port to listen on. Default: 8001.")
+    model_server_parser.add_argument("-b", "--batch_size", type=int, default=0,
+                                     help="Decode concurrent requests to a local HuggingFace model in continuous "
+                                          "batches of up to this size. Default: 0 (one request at a time).")
 
     args = parser.parse_args()
     main(args)
@@ -1,54 +1,222 @@
+import os
+import subprocess
+import sys
+import tempfile
 import unittest
+from unittest import mock
 
-from clemgame import benchmark, string_utils
-from backends import openai_api, alephalpha_api
+import clemgame
+from clemgame import benchmark, file_utils, results_index
+from clemgame.clemgame import find_benchmark, load_benchmarks
+from clemgame.scoring import GameScoring
 
+REFERENCEGAME_PAIR = "mock-t0.0--mock-t0.0"
+REFERENCEGAME_EPISODE = "0_hard_grids_edit_distance_2/episode_0"
+
+
+def missing_resource(game_name):
+    """
+    :return: why the game cannot be played offline (its resources are downloaded on first use); None, if it can
+    """
+    try:
+        find_benchmark(game_name)
+    except NotImplementedError:  # e.g. taboo without the nltk data
+        return f"Cannot load the game master of {game_name}"
+    if game_name.startswith("wordle"):
+        import tiktoken
+        try:
+            tiktoken.get_encoding("cl100k_base")  # for the prompt truncation
+        except Exception:
+            return "Cannot load the tiktoken encoding"
+    return None
+
+
+class TemporaryResultsTestCase(unittest.TestCase):
+    """ Stores the results in a temporary directory instead of the results/ of the project root """
+
+    def setUp(self):
+        self.results_dir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(file_utils, "results_root", return_value=self.results_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.results_dir.cleanup)
+
+    def episodes(self, game_name):
+        return results_index.load_episodes(game_name=game_name)
+
+
+class BenchmarkTestCase(TemporaryResultsTestCase):
+
+    def run_game(self, game_name, models, experiment_name=None, temperature=0.0):
+        reason = missing_resource(game_name)
+        if reason:
+            self.skipTest(reason)
+        benchmark.run(game_name=game_name, temperature=temperature, models=models, experiment_name=experiment_name)
+        episodes = self.episodes(game_name)
+        self.assertTrue(episodes)
+        if experiment_name:
+            self.assertEqual({experiment_name}, {"_".join(entry["experiment"].split("_")[1:]) for entry in episodes})
+        return episodes
 
-class BenchmarkTestCase(unittest.TestCase):
     def test_list_games(self):
         benchmark.list_games()
 
     def test_run_taboo(self):
-        benchmark.run(game_name="taboo", temperature=0.0,
-                      experiment_name="low_en",
-                      dialog_pair=string_utils.to_pair_descriptor([openai_api.MODEL_GPT_35, openai_api.MODEL_GPT_35]))
+        self.run_game("taboo", ["mock", "mock"], experiment_name="low_en")
 
     def test_run_taboo_human(self):
-        benchmark.run(game_name="taboo", temperature=0.0,
-                      experiment_name="low_en",
-                      dialog_pair=string_utils.to_pair_descriptor(["human", "human"]))
+        with mock.patch("builtins.input", return_value="CLUE: a fruit"):
+            self.run_game("taboo", ["human", "human"], experiment_name="low_en")
 
     def test_transcribe_privateshared(self):
+        self.run_game("privateshared", ["mock"], experiment_name="travel-booking")
         benchmark.transcripts(game_name="privateshared")
+        for entry in self.episodes("privateshared"):
+            self.assertTrue(os.path.isfile(os.path.join(results_index.episode_path(entry), "transcript.html")))
 
     def test_score_taboo(self):
+        self.run_game("taboo", ["mock", "mock"], experiment_name="low_en")
         benchmark.score(game_name="taboo")
+        for entry in self.episodes("taboo"):
+            self.assertTrue(os.path.isfile(os.path.join(results_index.episode_path(entry), "scores.json")))
 
     def test_hello_game(self):
-        # Only run specific experiment
-        benchmark.run(game_name="hellogame", temperature=1.0,
-                      experiment_name="greet_en", dialog_pair=alephalpha_api.LUMINOUS_SUPREME_CONTROL)
+        # Only run specific experiment (the hellogame players have no programmatic response)
+        with mock.patch("builtins.input", return_value="Hello!"):
+            self.run_game("hellogame", ["human"], experiment_name="greet_en", temperature=1.0)
 
     def test_run_privateshared(self):
-        benchmark.run(game_name="privateshared", temperature=0.0, dialog_pair="default")
+        self.run_game("privateshared", ["mock"], experiment_name="travel-booking")
 
     def test_run_imagegame(self):
-        benchmark.run(game_name="imagegame", temperature=0.0,
-                      experiment_name="compact_grids",
-                      dialog_pair=string_utils.to_pair_descriptor([openai_api.MODEL_GPT_3, openai_api.MODEL_GPT_3]))
+        self.run_game("imagegame", ["mock", "mock"], experiment_name="compact_grids")
 
     def test_run_referencegame(self):
-        benchmark.run(game_name="referencegame", temperature=0.0,
-                      experiment_name="hard_grids_edit_distance_2",
-                      dialog_pair=string_utils.to_pair_descriptor([openai_api.MODEL_GPT_3, openai_api.MODEL_GPT_3]))
+        self.run_game("referencegame", ["mock", "mock"], experiment_name="hard_grids_edit_distance_2")
 
     def test_run_wordle(self):
-        benchmark.run(game_name="wordle", temperature=0.0,
-                      experiment_name="low_frequency_words_no_clue_no_critic",
-                      dialog_pair=string_utils.to_pair_descriptor([openai_api.MODEL_GPT_35, openai_api.MODEL_GPT_35]))
+        self.run_game("wordle", ["mock"], experiment_name="low_frequency_words_no_clue_no_critic")
 
     def test_run_all(self):
-        benchmark.run(game_name="all", dialog_pair="dry_run")
+        for game_benchmark in load_benchmarks():
+            with self.subTest(game=game_benchmark.name):
+                self.run_game(game_benchmark.name, ["mock"],
+                              experiment_name=game_benchmark.instances["experiments"][0]["name"])
+
+
+class ReferencegameEpisodeTestCase(TemporaryResultsTestCase):
+    """ Stores the instance and the interactions of a referencegame episode, without playing it """
+
+    def setUp(self):
+        super().setUp()
+        self.scoring = GameScoring("referencegame")
+        self.experiment_config = {"name": "hard_grids_edit_distance_2"}
+        self.scoring.store_results_file({"game_id": 0, "target_grid_name": "first grid"}, "instance.json",
+                                        REFERENCEGAME_PAIR, sub_dir=REFERENCEGAME_EPISODE)
+        self.store_interactions("Answer: first grid")
+
+    def store_interactions(self, answer):
+        turn = [{"from": "GM", "to": "Player 1", "action": {"type": "send message", "content": "prompt"}},
+                {"from": "Player 1", "to": "GM",
+                 "action": {"type": "get message", "content": "Expression: the grid with an X"}},
+                {"from": "GM", "to": "GM", "action": {"type": "parse", "content": "Expression: the grid with an X"}},
+                {"from": "GM", "to": "Player 2", "action": {"type": "send message", "content": "prompt"}},
+                {"from": "Player 2", "to": "GM", "action": {"type": "get message", "content": answer}}]
+        self.scoring.store_results_file({"players": {}, "turns": [turn]}, "interactions.json",
+                                        REFERENCEGAME_PAIR, sub_dir=REFERENCEGAME_EPISODE)
+
+    def episode_file(self, file_name):
+        return os.path.join(self.scoring.results_path_for(REFERENCEGAME_PAIR), REFERENCEGAME_EPISODE, file_name)
+
+
+class TranscriptTestCase(ReferencegameEpisodeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.game_benchmark = find_benchmark("referencegame")
+
+    def build_episode_transcript(self, force=False):
+        return self.game_benchmark.build_episode_transcript(REFERENCEGAME_PAIR, self.experiment_config,
+                                                            REFERENCEGAME_EPISODE, force=force)
+
+    def set_mtime(self, file_name, mtime):
+        os.utime(self.episode_file(file_name), (mtime, mtime))
+
+    def test_transcripts_are_built_once(self):
+        self.assertTrue(self.build_episode_transcript())
+        for file_name in ["transcript.html", "transcript.tex"]:
+            self.assertTrue(os.path.isfile(self.episode_file(file_name)))
+        with mock.patch.object(clemgame.clemgame.transcript_utils, "build_transcript") as build_transcript:
+            self.assertFalse(self.build_episode_transcript())
+            build_transcript.assert_not_called()
+
+    def test_transcripts_are_rebuilt_when_the_interactions_are_newer(self):
+        self.assertTrue(self.build_episode_transcript())
+        self.set_mtime("interactions.json", 2000)
+        self.set_mtime("transcript.html", 1000)
+        self.set_mtime("transcript.tex", 3000)
+        self.assertTrue(self.build_episode_transcript())
+        self.set_mtime("transcript.html", 2000)  # as old as the interactions
+        self.set_mtime("transcript.tex", 2000)
+        self.assertFalse(self.build_episode_transcript())
+
+    def test_missing_transcript_is_rebuilt(self):
+        self.assertTrue(self.build_episode_transcript())
+        os.remove(self.episode_file("transcript.tex"))
+        self.assertTrue(self.build_episode_transcript())
+        self.assertTrue(os.path.isfile(self.episode_file("transcript.tex")))
+
+    def test_force_rebuilds_up_to_date_transcripts(self):
+        self.assertTrue(self.build_episode_transcript())
+        self.assertTrue(self.build_episode_transcript(force=True))
+
+
+class ScoringTestCase(ReferencegameEpisodeTestCase):
+
+    def compute_episode_scores(self, force=False):
+        return self.scoring.compute_episode_scores(REFERENCEGAME_PAIR, self.experiment_config, REFERENCEGAME_EPISODE,
+                                                   force=force)
+
+    def stored_scores(self):
+        return self.scoring.load_results_json(f"{REFERENCEGAME_EPISODE}/scores", REFERENCEGAME_PAIR)
+
+    def test_unchanged_episode_is_skipped(self):
+        self.assertTrue(self.compute_episode_scores())
+        scores = self.stored_scores()
+        self.assertEqual(1, scores["episode scores"]["Success"])
+        with mock.patch.object(self.scoring, "create_game_scorer") as create_game_scorer:
+            self.assertFalse(self.compute_episode_scores())
+            create_game_scorer.assert_not_called()
+        self.assertEqual(scores, self.stored_scores())
+
+    def test_changed_interactions_are_scored_again(self):
+        self.assertTrue(self.compute_episode_scores())
+        fingerprint = self.stored_scores()["fingerprint"]
+        self.store_interactions("Answer: second grid")
+        self.assertTrue(self.compute_episode_scores())
+        scores = self.stored_scores()
+        self.assertEqual(0, scores["episode scores"]["Success"])
+        self.assertNotEqual(fingerprint["inputs"], scores["fingerprint"]["inputs"])
+
+    def test_changed_scores_version_is_scored_again(self):
+        self.assertTrue(self.compute_episode_scores())
+        with mock.patch.object(GameScoring, "get_scores_version", return_value=2):
+            self.assertTrue(self.compute_episode_scores())
+            self.assertEqual(2, self.stored_scores()["fingerprint"]["scores version"])
+            self.assertFalse(self.compute_episode_scores())
+
+    def test_force_scores_unchanged_episode(self):
+        self.assertTrue(self.compute_episode_scores())
+        self.assertTrue(self.compute_episode_scores(force=True))
+
+    def test_score_does_not_import_the_backends(self):
+        script = ("import sys; from clemgame import benchmark, file_utils; "
+                  f"file_utils.results_root = lambda: {self.results_dir.name!r}; benchmark.score('all'); "
+                  "print(sorted(m for m in sys.modules if m == 'backends' or m.endswith('.master')))")
+        env = dict(os.environ, PYTHONPATH=clemgame.project_root)
+        output = subprocess.run([sys.executable, "-c", script], env=env, cwd=clemgame.project_root,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual("[]", output.strip().splitlines()[-1])
 
 
 if __name__ == '__main__':
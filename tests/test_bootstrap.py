@@ -0,0 +1,120 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import clemgame.metrics as clemmetrics
+from evaluation import bootstrap, evalutils
+
+
+def episode_scores(seed: int = 0, games=("imagegame", "taboo"), models=("model-a", "model-b", "model-c"),
+                   n_episodes: int = 12, quality_from_played: bool = False) -> pd.DataFrame:
+    """ the METRIC_PLAYED and BENCH_SCORE rows of the episodes, as loaded by evalutils """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for game in games:
+        for model in models:
+            for episode in range(n_episodes):
+                played = float(rng.random() < 0.7)
+                if quality_from_played:
+                    quality = played * 100
+                else:
+                    quality = rng.integers(0, 101) if played else np.nan
+                for metric, value in [(clemmetrics.METRIC_PLAYED, played), (clemmetrics.BENCH_SCORE, quality)]:
+                    rows.append((game, model, "0_experiment", f"episode_{episode}", metric, value))
+    df = pd.DataFrame(rows, columns=["game", "model", "experiment", "episode", "metric", "value"])
+    return df.astype({col: "category" for col in evalutils.CATEGORICAL_COLUMNS if col in df.columns})
+
+
+class BootstrapTestCase(unittest.TestCase):
+
+    def test_fixed_seed_gives_the_same_intervals(self):
+        df = episode_scores()
+        df_cis, df_diffs = bootstrap.bootstrap_cis(df, n_resamples=200, seed=7)
+        df_cis_again, df_diffs_again = bootstrap.bootstrap_cis(df, n_resamples=200, seed=7)
+        pd.testing.assert_frame_equal(df_cis, df_cis_again)
+        pd.testing.assert_frame_equal(df_diffs, df_diffs_again)
+        df_cis_other, _ = bootstrap.bootstrap_cis(df, n_resamples=200, seed=8)
+        self.assertFalse(df_cis['ci_low'].equals(df_cis_other['ci_low']))
+
+    def test_played_and_quality_are_resampled_with_the_same_episodes(self):
+        samples = []
+
+        def recording_bootstrap_means(values, n_resamples, rng):
+            samples.append(bootstrap_means(values, n_resamples, rng))
+            return samples[-1]
+
+        bootstrap_means = bootstrap.bootstrap_means
+        # the quality is 100 for the played and 0 for the other episodes: the same means for the same episodes
+        with mock.patch.object(bootstrap, 'bootstrap_means', recording_bootstrap_means):
+            bootstrap.bootstrap_cis(episode_scores(quality_from_played=True), n_resamples=200, seed=7)
+        self.assertEqual(4, len(samples))  # played and quality of two games
+        for played, quality in zip(samples[0::2], samples[1::2]):
+            np.testing.assert_allclose(played * 100, quality)
+
+    def test_chunked_means_equal_the_unchunked_means(self):
+        values = episode_scores_matrix()
+        with mock.patch.object(bootstrap, 'CHUNK_VALUES', values.size * 1000):
+            unchunked = bootstrap.bootstrap_means(values, 100, np.random.default_rng(3))
+        with mock.patch.object(bootstrap, 'CHUNK_VALUES', values.size * 7):  # 7 resamples per chunk
+            chunked = bootstrap.bootstrap_means(values, 100, np.random.default_rng(3))
+        self.assertEqual((100, values.shape[1]), chunked.shape)
+        np.testing.assert_array_equal(unchunked, chunked)
+
+    def test_no_resamples(self):
+        self.assertEqual((0, 3), bootstrap.bootstrap_means(episode_scores_matrix(), 0,
+                                                           np.random.default_rng(3)).shape)
+
+
+def episode_scores_matrix() -> np.ndarray:
+    _, matrices = bootstrap.episode_matrices(episode_scores())
+    return matrices['imagegame'][1]  # the quality of the episodes, with NaN for the not played ones
+
+
+class BootstrapCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        self.cache_file = os.path.join(self.cache_dir.name, bootstrap.CACHE_FILE)
+
+    def load_or_bootstrap_cis(self, df, **kwargs):
+        with mock.patch.object(bootstrap, 'bootstrap_cis', wraps=bootstrap.bootstrap_cis) as bootstrap_cis:
+            df_cis, df_diffs = bootstrap.load_or_bootstrap_cis(df, self.cache_file, n_resamples=50, **kwargs)
+        return df_cis, df_diffs, bootstrap_cis.call_count
+
+    def test_cached_results_are_returned_for_the_same_scores(self):
+        df = episode_scores()
+        df_cis, df_diffs, call_count = self.load_or_bootstrap_cis(df)
+        self.assertEqual(1, call_count)
+        df_cis_cached, df_diffs_cached, call_count = self.load_or_bootstrap_cis(df)
+        self.assertEqual(0, call_count)
+        pd.testing.assert_frame_equal(df_cis, df_cis_cached)
+        pd.testing.assert_frame_equal(df_diffs, df_diffs_cached)
+
+    def test_cache_is_invalidated_when_the_fingerprint_changes(self):
+        df = episode_scores()
+        self.load_or_bootstrap_cis(df)
+        df_changed = df.copy()
+        df_changed.loc[df_changed['metric'] == clemmetrics.BENCH_SCORE, 'value'] = 100.0
+        self.assertNotEqual(bootstrap.scores_fingerprint(df), bootstrap.scores_fingerprint(df_changed))
+        _, _, call_count = self.load_or_bootstrap_cis(df_changed)
+        self.assertEqual(1, call_count)
+        _, _, call_count = self.load_or_bootstrap_cis(df_changed, seed=1)  # the parameters are part of it
+        self.assertEqual(1, call_count)
+        _, _, call_count = self.load_or_bootstrap_cis(df_changed, seed=1)
+        self.assertEqual(0, call_count)
+
+    def test_other_metrics_do_not_change_the_fingerprint(self):
+        df = episode_scores()
+        other = pd.DataFrame([("imagegame", "model-a", "0_experiment", "episode_0", "Precision", 0.5)],
+                             columns=df.columns)
+        self.assertEqual(bootstrap.scores_fingerprint(df),
+                         bootstrap.scores_fingerprint(pd.concat([df.astype(str).astype({'value': float}), other])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import filecmp
+import importlib.util
+import os
+import random
+import tempfile
+import unittest
+
+import pandas as pd
+
+from evaluation import evalutils
+
+
+def score_table(game_name: str) -> pd.DataFrame:
+    df = pd.DataFrame({"game": [game_name] * 2, "model": ["mock-t0.0--mock-t0.0"] * 2,
+                       "experiment": ["0_greet_en"] * 2, "episode": ["episode_0"] * 2,
+                       "metric": ["Played", "Main Score"], "value": [1.0, 50.0],
+                       "path": [os.path.join("mock-t0.0--mock-t0.0", game_name, "0_greet_en", "episode_0",
+                                             "scores.json")] * 2})
+    return df.astype({col: "category" for col in evalutils.CATEGORICAL_COLUMNS})
+
+
+@unittest.skipUnless(importlib.util.find_spec("pyarrow"), "the scores cache needs pyarrow")
+class ScoresCacheTestCase(unittest.TestCase):
+
+    def test_round_trip(self):
+        tables = {"turns": score_table("hellogame"), "episodes": score_table("hellogame")}
+        files_df = pd.DataFrame([(tables["episodes"]["path"][0], 1.5)], columns=["path", "mtime"])
+        with tempfile.TemporaryDirectory() as path:
+            evalutils.write_scores_cache(path, tables, files_df)
+            cache = evalutils.read_scores_cache(path)
+        self.assertEqual(["turns", "episodes", "files"], list(cache))
+        for table, df in dict(tables, files=files_df).items():
+            pd.testing.assert_frame_equal(df, cache[table])
+
+    def test_round_trip_of_a_filtered_game(self):
+        tables = {"turns": score_table("hellogame"), "episodes": score_table("hellogame")}
+        files_df = pd.DataFrame([(tables["episodes"]["path"][0], 1.5)], columns=["path", "mtime"])
+        with tempfile.TemporaryDirectory() as path:
+            evalutils.write_scores_cache(path, tables, files_df)
+            cache = evalutils.read_scores_cache(path)
+            taboo_tables = {"turns": score_table("taboo"), "episodes": score_table("taboo")}
+            evalutils.write_scores_cache(path, taboo_tables, files_df, cache, game_name="taboo")
+            cache = evalutils.read_scores_cache(path)
+        self.assertEqual(["hellogame", "taboo"], sorted(cache["episodes"]["game"].astype(str).unique()))
+
+    def test_values_that_do_not_fit_a_column_are_not_cached(self):
+        tables = {"turns": score_table("hellogame"), "episodes": score_table("hellogame")}
+        tables["turns"]["value"] = pd.Series(["50", 1.0], dtype=object)  # ArrowTypeError
+        files_df = pd.DataFrame([(tables["episodes"]["path"][0], 1.5)], columns=["path", "mtime"])
+        with tempfile.TemporaryDirectory() as path:
+            evalutils.write_scores_cache(path, tables, files_df)  # reports the error, but does not raise it
+            self.assertFalse(os.path.isfile(evalutils.scores_cache_file(path, "turns")))
+
+
+def reference_save_raw_episode_scores(keys: list, df_scores: pd.DataFrame) -> None:
+    """ the original export, which filtered the scores for each level of each episode """
+    eval_dir = evalutils.EVAL_DIR
+    for game, model, experiment, episode in keys:
+        df_aux = evalutils.filter_df_by_key(df_scores, {'game': game, 'model': model, 'experiment': experiment,
+                                                        'episode': episode})
+        df_aux = df_aux[['metric', 'value']]
+        df_aux.to_csv(f'{eval_dir}/{game}/{model}/{experiment}/{episode}/{eval_dir}/episode-level/tables/scores_raw.csv')
+
+        df_aux = evalutils.filter_df_by_key(df_scores, {'game': game, 'model': model, 'experiment': experiment})
+        df_aux = df_aux.pivot(index='episode', columns=['metric'], values='value')
+        df_aux.to_csv(f'{eval_dir}/{game}/{model}/{experiment}/{eval_dir}/episode-level/tables/scores_raw.csv')
+
+        df_aux = evalutils.filter_df_by_key(df_scores, {'game': game, 'model': model})
+        df_aux = df_aux.pivot(index=['episode'], columns=['experiment', 'metric'], values='value')
+        df_aux.to_csv(f'{eval_dir}/{game}/{model}/{eval_dir}/episode-level/tables/scores_raw.csv')
+
+        df_aux = evalutils.filter_df_by_key(df_scores, {'game': game})
+        df_aux = df_aux.pivot(index=['model', 'episode'], columns=['experiment', 'metric'], values='value')
+        df_aux.to_csv(f'{eval_dir}/{game}/{eval_dir}/episode-level/tables/scores_raw.csv')
+
+
+def reference_save_raw_turn_scores(keys: list, df_scores: pd.DataFrame) -> None:
+    """ the original export of the turn scores (which wrote the model-level table to stdout instead of the file) """
+    eval_dir = evalutils.EVAL_DIR
+    for game, model, experiment, episode in keys:
+        df_aux = evalutils.filter_df_by_key(df_scores, {'game': game, 'model': model, 'experiment': experiment,
+                                                        'episode': episode})
+        df_aux = df_aux.pivot(index='turn', columns=['metric'], values='value')
+        df_aux.to_csv(f'{eval_dir}/{game}/{model}/{experiment}/{episode}/{eval_dir}/turn-level/tables/scores_raw.csv')
+
+        df_aux = evalutils.filter_df_by_key(df_scores, {'game': game, 'model': model, 'experiment': experiment})
+        df_aux = df_aux.pivot(index=['episode', 'turn'], columns=['metric'], values='value')
+        df_aux.to_csv(f'{eval_dir}/{game}/{model}/{experiment}/{eval_dir}/turn-level/tables/scores_raw.csv')
+
+        df_aux = evalutils.filter_df_by_key(df_scores, {'game': game, 'model': model})
+        df_aux = df_aux.pivot(index=['episode', 'turn'], columns=['experiment', 'metric'], values='value')
+        df_aux.to_csv(f'{eval_dir}/{game}/{model}/{eval_dir}/turn-level/tables/scores_raw.csv')
+
+        df_aux = evalutils.filter_df_by_key(df_scores, {'game': game})
+        df_aux = df_aux.pivot(index=['model', 'episode', 'turn'], columns=['experiment', 'metric'], values='value')
+        df_aux.to_csv(f'{eval_dir}/{game}/{eval_dir}/turn-level/tables/scores_raw.csv')
+
+
+def random_scores(seed: int = 0) -> dict:
+    """ the turn and episode scores by (game, model, experiment, episode), as loaded by evalutils """
+    rng = random.Random(seed)
+    scores = {}
+    for game in ['taboo', 'imagegame']:
+        for model in ['mock-t0.0--mock-t0.0', 'model-a-t0.0--model-a-t0.0']:
+            for experiment in ['1_low_en', '0_high_en']:
+                for episode in ['episode_0', 'episode_1', 'episode_10']:
+                    metrics = ['Played', 'Main Score'] + (['Precision'] if game == 'imagegame' else [])
+                    turns = {str(turn): {'Request Count': rng.randint(1, 3), 'Accuracy': rng.random()}
+                             for turn in range(rng.randint(1, 3))}
+                    scores[(game, model, experiment, episode)] = {
+                        'turns': turns, 'episodes': {metric: rng.random() * 100 for metric in metrics}}
+    # an episode without scores
+    scores[('taboo', 'mock-t0.0--mock-t0.0', '2_medium_en', 'episode_0')] = {'turns': {}, 'episodes': {}}
+    return scores
+
+
+class SaveRawScoresTestCase(unittest.TestCase):
+
+    def setUp(self):
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        eval_dirs = tempfile.TemporaryDirectory()
+        self.addCleanup(eval_dirs.cleanup)
+        self.baseline_dir = os.path.join(eval_dirs.name, 'baseline')
+        self.grouped_dir = os.path.join(eval_dirs.name, 'grouped')
+        self.scores = random_scores()
+
+    def save(self, path, save_raw_scores):
+        os.makedirs(path)
+        os.chdir(path)  # the tables are written below the relative EVAL_DIR
+        evalutils.create_eval_tree(list(self.scores))
+        save_raw_scores(list(self.scores), self.df_scores)
+
+    def assert_same_files(self):
+        files = {}
+        for path in [self.baseline_dir, self.grouped_dir]:
+            files[path] = sorted(os.path.relpath(os.path.join(dir_path, file_name), path)
+                                 for dir_path, _, file_names in os.walk(path) for file_name in file_names)
+        self.assertEqual(files[self.baseline_dir], files[self.grouped_dir])
+        self.assertTrue(files[self.grouped_dir])
+        _, mismatch, errors = filecmp.cmpfiles(self.baseline_dir, self.grouped_dir, files[self.grouped_dir],
+                                               shallow=False)
+        self.assertEqual(([], []), (mismatch, errors))
+
+    def test_episode_scores_equal_the_baseline(self):
+        self.df_scores = evalutils.build_df_episode_scores(self.scores)
+        self.save(self.baseline_dir, reference_save_raw_episode_scores)
+        self.save(self.grouped_dir, evalutils.save_raw_episode_scores)
+        self.assert_same_files()
+
+    def test_turn_scores_equal_the_baseline(self):
+        self.df_scores = evalutils.build_df_turn_scores(self.scores)
+        self.save(self.baseline_dir, reference_save_raw_turn_scores)
+        self.save(self.grouped_dir, evalutils.save_raw_turn_scores)
+        self.assert_same_files()
+
+    def test_games_saved_in_parallel_equal_the_baseline(self):
+        self.df_scores = evalutils.build_df_episode_scores(self.scores)
+        self.save(self.baseline_dir, reference_save_raw_episode_scores)
+        self.save(self.grouped_dir, lambda keys, df_scores: evalutils.save_raw_episode_scores(keys, df_scores, 2))
+        self.assert_same_files()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,471 @@
+import http.server
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+try:
+    import torch
+    import transformers
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    from backends import hf_cpu, hf_engine, hf_loading, huggingface_local_api, llama2_hf_local_api, model_server, \
+        model_server_api
+except ImportError:  # the local backends need the packages in requirements_hf.txt
+    huggingface_local_api = None
+
+WORDS = ["user", "assistant", ":", "hello", "world", "describe", "the", "grid", "guess", "word", "a", "b", "c",
+         "d", "e", "f", "g", "h", "i", "j", "k", "l", "m", "n", "o", "p", "q", "r", "s", "t"]
+
+CHAT_TEMPLATE = ("{% for message in messages %}{{ message['role'] + ' : ' + message['content'] + ' </s> ' }}"
+                 "{% endfor %}{{ 'assistant :' }}")
+
+
+def create_tiny_backend(use_kv_cache: bool):
+    """ A HuggingfaceLocal backend with a randomly initialized tiny model and a word-level tokenizer """
+    vocab = {token: idx for idx, token in enumerate(["[UNK]", "[PAD]", "<s>", "</s>"] + WORDS)}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    tokenizer = transformers.PreTrainedTokenizerFast(tokenizer_object=tokenizer, unk_token="[UNK]",
+                                                     pad_token="[PAD]", bos_token="<s>", eos_token="</s>")
+    tokenizer.chat_template = CHAT_TEMPLATE
+    torch.manual_seed(42)
+    config = transformers.LlamaConfig(vocab_size=len(vocab), hidden_size=32, intermediate_size=64,
+                                      num_hidden_layers=2, num_attention_heads=4, max_position_embeddings=512,
+                                      pad_token_id=vocab["[PAD]"], bos_token_id=vocab["<s>"],
+                                      eos_token_id=vocab["</s>"])
+    backend = huggingface_local_api.HuggingfaceLocal()
+    model = transformers.LlamaForCausalLM(config).eval()
+    backend.models.add(huggingface_local_api.hf_model_pool.PooledModel("tiny-llama", model, tokenizer, "cpu"))
+    backend.temperature = 0.0
+    backend.use_kv_cache = use_kv_cache
+    return backend
+
+
+def play(backend, player_messages, n_turns=4):
+    """ Let the players take turns, each continuing its own conversation """
+    responses = []
+    histories = [[] for _ in player_messages]
+    for turn_idx in range(n_turns):
+        for history, messages in zip(histories, player_messages):
+            history.append({"role": "user", "content": messages[turn_idx % len(messages)]})
+            _, _, response_text = backend.generate_response(history, "tiny-llama", max_new_tokens=6)
+            history.append({"role": "assistant", "content": response_text})
+            responses.append(response_text)
+    return responses
+
+
+@unittest.skipIf(huggingface_local_api is None, "torch and transformers are not installed")
+class HuggingfaceLocalKVCacheTestCase(unittest.TestCase):
+
+    def test_greedy_outputs_with_and_without_cache(self):
+        player_messages = [["describe the grid", "a b c", "guess the word"]]
+        expected = play(create_tiny_backend(use_kv_cache=False), player_messages)
+        backend = create_tiny_backend(use_kv_cache=True)
+        self.assertEqual(expected, play(backend, player_messages))
+        self.assertGreater(backend.models["tiny-llama"].kv_cache.hits, 0)
+        self.assertGreater(backend.models["tiny-llama"].kv_cache.reused_tokens, 0)
+
+    def test_two_players_share_the_backend(self):
+        player_messages = [["describe the grid", "a b c"], ["guess the word", "d e f"]]
+        expected = play(create_tiny_backend(use_kv_cache=False), player_messages)
+        backend = create_tiny_backend(use_kv_cache=True)
+        self.assertEqual(expected, play(backend, player_messages))
+        self.assertEqual(2, len(backend.models["tiny-llama"].kv_cache))
+
+    def test_end_episode_clears_cache(self):
+        backend = create_tiny_backend(use_kv_cache=True)
+        play(backend, [["hello world"]], n_turns=2)
+        self.assertEqual(1, len(backend.models["tiny-llama"].kv_cache))
+        backend.end_episode()
+        self.assertEqual(0, len(backend.models["tiny-llama"].kv_cache))
+        self.assertEqual(1, len(backend.models["tiny-llama"].prefix_cache))
+
+    def test_cache_is_bounded(self):
+        backend = create_tiny_backend(use_kv_cache=True)
+        backend.models["tiny-llama"].kv_cache.max_entries = 2
+        play(backend, [["hello"], ["world"], ["grid"]], n_turns=1)
+        self.assertEqual(2, len(backend.models["tiny-llama"].kv_cache))
+
+    def test_prefix_cache_across_episodes(self):
+        episodes = [[["describe the grid a b c", "guess"]], [["describe the grid d e f", "guess"]],
+                    [["describe the grid a b g", "guess"]]]
+        reference = create_tiny_backend(use_kv_cache=False)
+        expected = [play(reference, player_messages, n_turns=2) for player_messages in episodes]
+        backend = create_tiny_backend(use_kv_cache=True)
+        responses = []
+        for player_messages in episodes:
+            responses.append(play(backend, player_messages, n_turns=2))
+            backend.end_episode()
+        self.assertEqual(expected, responses)
+        # the second and third episode reuse "<s> user : describe the grid" and "... a b"
+        self.assertEqual(3, backend.models["tiny-llama"].prefix_cache.lookups)
+        self.assertEqual(2, backend.models["tiny-llama"].prefix_cache.hits)
+        self.assertEqual(5 + 7, backend.models["tiny-llama"].prefix_cache.reused_tokens)
+        self.assertAlmostEqual(2 / 3, backend.models["tiny-llama"].prefix_cache.hit_rate)
+
+    def test_prefix_cache_is_bounded(self):
+        backend = create_tiny_backend(use_kv_cache=True)
+        backend.models["tiny-llama"].prefix_cache.max_entries = 2
+        for word in ["hello", "world", "grid"]:
+            play(backend, [[word]], n_turns=1)
+        self.assertEqual(2, len(backend.models["tiny-llama"].prefix_cache))
+        # the least recently used prompt was evicted (and removed from the trie)
+        pooled = backend.models["tiny-llama"]
+        self.assertEqual((0, None), pooled.prefix_cache.lookup(pooled.tokenizer("<s> world hello")["input_ids"]))
+
+
+@unittest.skipIf(huggingface_local_api is None, "torch and transformers are not installed")
+class HuggingfaceLocalDecodingTestCase(unittest.TestCase):
+
+    def test_response_text_is_decoded_from_generated_tokens(self):
+        backend = create_tiny_backend(use_kv_cache=False)
+        prompt, response, response_text = backend.generate_response([{"role": "user", "content": "hello"}],
+                                                                    "tiny-llama", max_new_tokens=6)
+        self.assertEqual("user : hello </s> assistant :", prompt["inputs"])
+        self.assertTrue(response["response"].startswith(prompt["inputs"]))
+        self.assertNotIn("</s>", response_text)
+
+    def test_eos_strings_by_template(self):
+        model = huggingface_local_api.MODEL_OPENCHAT_3_5
+        eos_strings = huggingface_local_api.get_eos_strings(model)
+        self.assertEqual(["<|end_of_turn|>"], eos_strings)
+        self.assertEqual("GUESS: pear", huggingface_local_api.cull_eos_tokens("GUESS: pear<|end_of_turn|>",
+                                                                               eos_strings))
+        self.assertEqual("GUESS: pear<|im_end|>", huggingface_local_api.cull_eos_tokens("GUESS: pear<|im_end|>",
+                                                                                        eos_strings))
+
+
+@unittest.skipIf(huggingface_local_api is None, "torch and transformers are not installed")
+class HuggingfaceLocalBatchTestCase(unittest.TestCase):
+
+    def test_batch_matches_single_calls(self):
+        list_of_messages = [
+            [{"role": "user", "content": "hello"}],
+            [{"role": "system", "content": ""}, {"role": "user", "content": "describe the grid a b c d e f"}],
+            [{"role": "user", "content": "guess the word"}, {"role": "assistant", "content": "a b"},
+             {"role": "user", "content": "g h i"}]]
+        backend = create_tiny_backend(use_kv_cache=False)
+        expected = [backend.generate_response(messages, "tiny-llama", max_new_tokens=6)
+                    for messages in list_of_messages]
+        self.assertEqual(expected, backend.generate_batch(list_of_messages, "tiny-llama", max_new_tokens=6))
+
+    def test_batch_stops_each_sequence_at_eos(self):
+        backend = create_tiny_backend(use_kv_cache=False)
+        eos_token_id = backend.models["tiny-llama"].tokenizer.eos_token_id
+        output_ids = torch.tensor([[1, 5, 6, eos_token_id, 1, 1], [5, 5, 7, 8, 9, eos_token_id]])
+        self.assertEqual([[6, eos_token_id], [7, 8, 9, eos_token_id]],
+                         huggingface_local_api.hf_batch.continuations(output_ids, 2, eos_token_id))
+
+
+@unittest.skipIf(huggingface_local_api is None, "torch and transformers are not installed")
+class Llama2LocalHFBatchTestCase(unittest.TestCase):
+
+    def create_backend(self):
+        """ a Llama2LocalHF backend with the tiny model (without the credentials and the download) """
+        tiny = create_tiny_backend(use_kv_cache=False).models["tiny-llama"]
+        backend = llama2_hf_local_api.Llama2LocalHF.__new__(llama2_hf_local_api.Llama2LocalHF)
+        backend.chat_models = ["tiny-llama-chat"]
+        backend.temperature = 0.0
+        backend.model, backend.tokenizer, backend.device = tiny.model, tiny.tokenizer, "cpu"
+        backend.model_name, backend.model_loaded, backend.load_metrics = "tiny-llama-chat", True, {}
+        return backend
+
+    def test_batch_matches_single_calls(self):
+        list_of_messages = [
+            [{"role": "user", "content": "hello"}],
+            [{"role": "user", "content": "describe the grid"}, {"role": "user", "content": "a b c d e f"}],
+            [{"role": "user", "content": "guess the word"}, {"role": "assistant", "content": "a b"},
+             {"role": "user", "content": "g h i"}]]
+        backend = self.create_backend()
+        for model in ["tiny-llama-chat", "tiny-llama"]:  # chat and text completion
+            expected = [backend.generate_response(messages, model, max_new_tokens=6) for messages in list_of_messages]
+            self.assertEqual(expected, backend.generate_batch(list_of_messages, model, max_new_tokens=6))
+
+    def test_text_completion_prompt_starts_with_bos(self):
+        backend = self.create_backend()
+        _, prompt_tokens = backend._prepare_prompt([{"role": "user", "content": "hello"}], "tiny-llama", 6)
+        self.assertEqual([backend.tokenizer.bos_token_id, backend.tokenizer.convert_tokens_to_ids("hello")],
+                         prompt_tokens)
+
+
+@unittest.skipIf(huggingface_local_api is None, "torch and transformers are not installed")
+class HuggingfaceLocalEngineTestCase(unittest.TestCase):
+
+    def test_concurrent_episodes_match_sequential_calls(self):
+        player_messages = [[["describe the grid", "a b c"]], [["guess the word", "d e f"]], [["hello"]],
+                           [["world", "g h"]], [["the word is a"]]]
+        reference = create_tiny_backend(use_kv_cache=False)
+        expected = [play(reference, messages, n_turns=3) for messages in player_messages]
+        backend = create_tiny_backend(use_kv_cache=False)
+        backend.engine_batch_size = 3
+        responses = [None] * len(player_messages)
+
+        def run_episode(idx):
+            responses[idx] = play(backend, player_messages[idx], n_turns=3)
+
+        threads = [threading.Thread(target=run_episode, args=(idx,)) for idx in range(len(player_messages))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        backend.models["tiny-llama"].engine.stop()
+        self.assertEqual(expected, responses)
+        stats = backend.models["tiny-llama"].engine.stats()
+        self.assertEqual(0, stats["queue_depth"])
+        self.assertEqual(0, stats["running"])
+        self.assertGreater(stats["occupancy"], 0)
+        self.assertLessEqual(stats["occupancy"], 1)
+        self.assertGreater(stats["tokens_per_second"], 0)
+
+    def test_requests_finish_independently(self):
+        backend = create_tiny_backend(use_kv_cache=False)
+        engine = hf_engine.GenerationEngine(backend.models["tiny-llama"].model, eos_token_id=None, max_batch_size=2)
+        futures = [engine.submit([2, 4, 6, 7], max_new_tokens) for max_new_tokens in [8, 1, 3, 5]]
+        outputs = [future.result(timeout=30) for future in futures]
+        engine.stop()
+        self.assertEqual([8, 1, 3, 5], [len(output_ids) for output_ids in outputs])
+        # the shorter continuations are prefixes of the longest one (greedy decoding of the same prompt)
+        for output_ids in outputs:
+            self.assertEqual(outputs[0][:len(output_ids)], output_ids)
+        self.assertRaises(RuntimeError, engine.submit, [2, 4], 1)
+
+
+@unittest.skipIf(huggingface_local_api is None, "torch and transformers are not installed")
+class HuggingfaceLocalStopConditionsTestCase(unittest.TestCase):
+    messages = [{"role": "user", "content": "describe the grid"}]
+
+    def test_stop_conditions(self):
+        conditions = huggingface_local_api.backends.StopConditions(stop_strings=["GUESS:"], max_lines=2)
+        self.assertIsNone(conditions.find_end("\nCLUE: a fruit"))
+        self.assertEqual(len("\nCLUE: a fruit\nred"), conditions.find_end("\nCLUE: a fruit\nred\n"))
+        self.assertEqual("CLUE: a fruit ", conditions.truncate("CLUE: a fruit GUESS: pear"))
+
+    def test_generation_stops_at_stop_string(self):
+        backend = create_tiny_backend(use_kv_cache=False)
+        _, full_response, full_text = backend.generate_response(self.messages, "tiny-llama", max_new_tokens=6)
+        words = full_text.split()
+        stop_conditions = huggingface_local_api.backends.StopConditions(stop_strings=[words[2]])
+        for use_kv_cache, engine_batch_size in [(False, 0), (True, 0), (False, 2)]:
+            backend = create_tiny_backend(use_kv_cache=use_kv_cache)
+            backend.engine_batch_size = engine_batch_size
+            prompt, response, response_text = backend.generate_response(self.messages, "tiny-llama",
+                                                                        max_new_tokens=6,
+                                                                        stop_conditions=stop_conditions)
+            if backend.models["tiny-llama"].engine is not None:
+                backend.models["tiny-llama"].engine.stop()
+            self.assertEqual(" ".join(words[:full_text.split().index(words[2])]), response_text)
+            self.assertLess(len(response["response"]), len(full_response["response"]))
+            self.assertEqual({"stop_strings": [words[2]], "max_lines": None}, prompt["stop_conditions"])
+
+
+@unittest.skipIf(huggingface_local_api is None, "torch and transformers are not installed")
+class HuggingfaceLocalModelPoolTestCase(unittest.TestCase):
+
+    def create_pool(self, n_models):
+        """ :return: a pool with the budget for n_models copies of the tiny model, its size and the loaded names """
+        tiny = create_tiny_backend(use_kv_cache=True).models["tiny-llama"]
+        loaded = []
+
+        def load_model(model_name):
+            loaded.append(model_name)
+            return huggingface_local_api.hf_model_pool.PooledModel(model_name, tiny.model, tiny.tokenizer, "cpu")
+
+        pool = huggingface_local_api.hf_model_pool.ModelPool(load_model, n_models * tiny.memory_bytes)
+        return pool, tiny.memory_bytes, loaded
+
+    def test_models_share_the_budget(self):
+        pool, model_bytes, loaded = self.create_pool(n_models=2)
+        for model_name in ["a", "b", "a"]:
+            with pool.lease(model_name) as pooled:
+                self.assertIs(pool[model_name], pooled)
+        self.assertEqual(["b", "a"], pool.model_names())
+        self.assertEqual(["a", "b"], loaded)
+        self.assertEqual(2 * model_bytes, pool.memory_bytes)
+
+    def test_least_recently_used_model_is_evicted(self):
+        pool, _, loaded = self.create_pool(n_models=1)
+        with pool.lease("a") as first:
+            pass
+        with pool.lease("b"):
+            pass
+        self.assertEqual(["b"], pool.model_names())
+        self.assertIsNone(first.model)
+        with self.assertLogs(huggingface_local_api.hf_model_pool.logger, "WARNING"):
+            with pool.lease("a"):
+                pass
+        self.assertEqual(["a"], pool.model_names())
+        self.assertEqual(["a", "b", "a"], loaded)
+
+    def test_leased_model_is_not_unloaded(self):
+        pool, _, loaded = self.create_pool(n_models=1)
+        first = pool.get("a")  # e.g. generating in another thread
+        with pool.lease("b"):
+            self.assertEqual(["a", "b"], pool.model_names())  # over budget until "a" is returned
+        self.assertIsNotNone(first.model)
+        pool.put_back(first)
+        self.assertEqual(["b"], pool.model_names())
+        self.assertIsNone(first.model)
+        # evicted explicitly while leased: unloaded when returned
+        second = pool.get("b")
+        pool.evict("b")
+        self.assertIsNotNone(second.model)
+        pool.put_back(second)
+        self.assertIsNone(second.model)
+
+    def test_reloading_is_reported_once(self):
+        pool, _, loaded = self.create_pool(n_models=1)
+        with self.assertLogs(huggingface_local_api.hf_model_pool.logger, "WARNING") as logs:
+            for model_name in ["a", "b", "a", "b", "a"]:  # a cross-play pair that does not fit
+                with pool.lease(model_name):
+                    pass
+        self.assertEqual(["a", "b", "a", "b", "a"], loaded)
+        self.assertEqual(2, len(logs.records))  # once per model
+
+    def test_registry(self):
+        self.assertEqual("openchat/openchat_3.5",
+                         huggingface_local_api.get_hf_model_id(huggingface_local_api.MODEL_OPENCHAT_3_5))
+        self.assertRaises(ValueError, huggingface_local_api.get_hf_model_id, "tiny-llama")
+        self.assertEqual(huggingface_local_api.openchat_template,
+                         huggingface_local_api.get_chat_template(huggingface_local_api.MODEL_OPENCHAT_3_5))
+        self.assertIsNone(huggingface_local_api.get_chat_template(huggingface_local_api.MODEL_ZEPHYR_7B_BETA))
+
+
+@unittest.skipIf(huggingface_local_api is None, "torch and transformers are not installed")
+class HuggingfaceLocalCPUOptionsTestCase(unittest.TestCase):
+    player_messages = [["describe the grid", "a b c"]]
+
+    def test_inference_mode_matches_no_grad(self):
+        expected = play(create_tiny_backend(use_kv_cache=True), self.player_messages, n_turns=2)
+        backend = create_tiny_backend(use_kv_cache=True)
+        backend.models["tiny-llama"].cpu_options = hf_cpu.CPUOptions(inference_mode=False, num_threads=1)
+        self.assertEqual(expected, play(backend, self.player_messages, n_turns=2))
+
+    def test_num_threads_are_restored(self):
+        num_threads = torch.get_num_threads()
+        with hf_cpu.inference_context(hf_cpu.CPUOptions(num_threads=num_threads + 1)):
+            self.assertEqual(num_threads + 1, torch.get_num_threads())
+        self.assertEqual(num_threads, torch.get_num_threads())
+
+    def test_int8_quantization(self):
+        backend = create_tiny_backend(use_kv_cache=True)
+        pooled = backend.models["tiny-llama"]
+        linear_params = sum(module.weight.numel() for module in pooled.model.modules()
+                            if isinstance(module, torch.nn.Linear))
+        float_footprint = pooled.memory_bytes
+        pooled.cpu_options = hf_cpu.CPUOptions(int8=True)
+        pooled.model = hf_cpu.optimize(pooled.model, pooled.cpu_options)
+        self.assertIsInstance(pooled.model.lm_head, torch.ao.nn.quantized.dynamic.Linear)
+        # the Linear weights take one byte per parameter instead of four (and are still counted)
+        int8_footprint = huggingface_local_api.hf_model_pool.memory_footprint(pooled.model)
+        self.assertGreaterEqual(int8_footprint, float_footprint - 3 * linear_params)
+        self.assertLess(int8_footprint, float_footprint)
+        self.assertEqual(torch.float32, hf_cpu.torch_dtype(pooled.cpu_options))
+        responses = play(backend, self.player_messages, n_turns=2)
+        self.assertEqual(2, len(responses))
+
+
+@unittest.skipIf(huggingface_local_api is None, "torch and transformers are not installed")
+class HuggingfaceLocalModelServerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = model_server.ModelServer(("localhost", 0), [])
+        self.server.remotes["tiny-llama"] = create_tiny_backend(use_kv_cache=True)
+        self.server.locks[self.server.remotes["tiny-llama"]] = threading.Lock()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = model_server_api.LocalModelServer()
+        self.client.temperature = 0.0
+        os.environ[model_server.MODEL_SERVER_URL] = f"http://localhost:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        del os.environ[model_server.MODEL_SERVER_URL]
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_forwarded_responses_match_local_ones(self):
+        player_messages = [["describe the grid", "a b c"], ["guess the word"]]
+        expected = play(create_tiny_backend(use_kv_cache=True), player_messages, n_turns=2)
+        self.assertTrue(self.client.supports("tiny-llama"))
+        self.assertFalse(self.client.supports("koala-13B-HF"))
+        self.assertEqual(expected, play(self.client, player_messages, n_turns=2))
+
+    def test_stop_conditions_are_forwarded(self):
+        messages = [{"role": "user", "content": "describe the grid"}]
+        stop_conditions = huggingface_local_api.backends.StopConditions(max_lines=1)
+        prompt, response, _ = self.client.generate_response(messages, "tiny-llama", max_new_tokens=6,
+                                                            stop_conditions=stop_conditions)
+        self.assertEqual(stop_conditions.to_dict(), prompt["stop_conditions"])
+        self.assertTrue(response["response"].startswith(prompt["inputs"]))
+        self.assertRaises(RuntimeError, self.client.generate_response, messages, "koala-13B-HF")
+
+    def test_error_pages_are_reported(self):
+        class ErrorPageHandler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.endswith("empty"):
+                    self.send_response(500)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                else:
+                    self.send_error(502, "Bad Gateway")  # an HTML page
+
+            def log_message(self, format, *args):
+                pass
+
+        error_server = http.server.ThreadingHTTPServer(("localhost", 0), ErrorPageHandler)
+        threading.Thread(target=error_server.serve_forever, daemon=True).start()
+        os.environ[model_server.MODEL_SERVER_URL] = f"http://localhost:{error_server.server_address[1]}"
+        try:
+            with self.assertRaisesRegex(RuntimeError, "(?s)Model server error 502: .*Bad Gateway"):
+                self.client._request("POST", "/v1/chat/completions", {})
+            with self.assertRaisesRegex(RuntimeError, "Model server error 500: Internal Server Error"):
+                self.client._request("POST", "/empty", {})
+        finally:
+            error_server.shutdown()
+            error_server.server_close()
+
+    def test_timeouts_are_retried(self):
+        messages = [{"role": "user", "content": "describe the grid"}]
+        completion = self.client._request("POST", "/v1/chat/completions",
+                                          {"model": "tiny-llama", "messages": messages, "max_tokens": 2})
+        with mock.patch.object(self.client, "_request", side_effect=[TimeoutError("timed out"), completion]):
+            self.client.generate_response(messages, "tiny-llama", max_new_tokens=2)
+            self.assertEqual(2, self.client._request.call_count)
+
+    def test_unreachable_server_is_not_asked_again(self):
+        with socket.socket() as closed_socket:  # a port without a server
+            closed_socket.bind(("localhost", 0))
+            os.environ[model_server.MODEL_SERVER_URL] = f"http://localhost:{closed_socket.getsockname()[1]}"
+        with mock.patch.object(self.client, "_request", wraps=self.client._request) as request:
+            self.assertFalse(self.client.supports("tiny-llama"))
+            self.assertFalse(self.client.supports("tiny-llama"))
+        request.assert_called_once_with("GET", "/v1/models", timeout=model_server_api.DISCOVERY_TIMEOUT)
+
+
+@unittest.skipIf(huggingface_local_api is None, "torch and transformers are not installed")
+class HuggingfaceLocalLoadingTestCase(unittest.TestCase):
+
+    def test_cache_dir_from_environment(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            os.environ[hf_loading.CACHE_DIR_VARIABLE] = cache_dir
+            try:
+                self.assertEqual({"cache_dir": cache_dir, "low_cpu_mem_usage": True}, hf_loading.model_kwargs())
+            finally:
+                del os.environ[hf_loading.CACHE_DIR_VARIABLE]
+
+    def test_prewarm_safetensors(self):
+        pooled = create_tiny_backend(use_kv_cache=False).models["tiny-llama"]
+        with tempfile.TemporaryDirectory() as model_path:
+            pooled.model.save_pretrained(model_path, safe_serialization=True)
+            self.assertEqual([os.path.join(model_path, "model.safetensors")], hf_loading.weight_files(model_path))
+            thread = hf_loading.prewarm(model_path)
+            thread.join(timeout=30)
+            self.assertFalse(thread.is_alive())
+        self.assertIsNone(hf_loading.prewarm("no-user/no-model"))
+        metrics = hf_loading.load_metrics(0.)
+        self.assertGreater(metrics["load_seconds"], 0)
+        self.assertGreater(metrics["peak_rss_bytes"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
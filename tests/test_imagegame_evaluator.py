@@ -0,0 +1,157 @@
+import random
+import unittest
+
+from games.imagegame import evaluator
+from games.imagegame.scorer import EMPTY_GRID
+
+
+def reference_evaluate(target, generated):
+    """ the original evaluation of a single pair of grids; None, where the scorer caught an exception """
+    if evaluator.get_size(target) != evaluator.get_size(generated):
+        return 0.0, 0.0, 0.0
+    target_rows = target.strip().split('\n')
+    generated_rows = generated.strip().split('\n')
+    recall_counter, total_recall_counter, precision_counter, total_precision_counter = 0, 0, 0, 0
+    try:
+        for r_index in range(0, len(target_rows)):
+            target_cells = target_rows[r_index].split(' ')
+            generated_cells = generated_rows[r_index].split(' ')
+            for c_index in range(0, len(target_cells)):
+                if target_cells[c_index] != '▢':
+                    total_recall_counter += 1
+                    if target_cells[c_index].lower() == generated_cells[c_index].lower():
+                        recall_counter += 1
+                if generated_cells[c_index] != '▢':
+                    total_precision_counter += 1
+                    if target_cells[c_index].lower() == generated_cells[c_index].lower():
+                        precision_counter += 1
+        recall = round(recall_counter / float(total_recall_counter), 4)
+        precision = round(precision_counter / float(total_precision_counter), 4)
+    except (IndexError, ZeroDivisionError):
+        return None
+    if precision == 0 or recall == 0:
+        f1 = 0
+    else:
+        f1 = (2 * precision * recall) / (precision + recall)
+    f1 = round(f1, 4)
+    return round(100 * precision, 0), round(100 * recall, 0), round(100 * f1, 0)
+
+
+def reference_flipped_pixels(previous, current):
+    """ the original count of changed cells of a single pair of grids; None, where the scorer caught an exception """
+    previous_rows = previous.strip().split('\n')
+    current_rows = current.strip().split('\n')
+    flipped_counter = 0
+    try:
+        for r_index in range(0, len(previous_rows)):
+            previous_cells = previous_rows[r_index].split(' ')
+            current_cells = current_rows[r_index].split(' ')
+            for c_index in range(0, len(previous_cells)):
+                if previous_cells[c_index].lower() != current_cells[c_index].lower():
+                    flipped_counter += 1
+    except IndexError:
+        return None
+    return flipped_counter
+
+
+def random_grid(rng, rows, columns, ragged=False):
+    lengths = [columns] * rows
+    if ragged:
+        lengths[rng.randrange(rows)] += rng.choice([-1, 1])
+    return '\n'.join(' '.join(rng.choice(['▢', '▢', 'X', 'x', 'O']) for _ in range(length)) for length in lengths)
+
+
+MALFORMED_GRIDS = [
+    ('X X\nX', 'X X\nX'),  # ragged rows, but the same sizes
+    ('X X\nX', 'x ▢\nX O'),  # longer rows of the generated grid
+    ('X X\nX X', 'X X\nX'),  # shorter rows of the generated grid
+    ('X X\nX X', 'X X'),  # fewer rows of the generated grid
+    ('▢ ▢\n▢ ▢', 'X X\nX X'),  # no filled cells of the target grid
+    ('X X\nX X', '▢ ▢\n▢ ▢'),  # no filled cells of the generated grid
+    ('X X\nX X', ''),
+]
+
+
+class EvaluateBatchTestCase(unittest.TestCase):
+
+    def assert_equivalent(self, targets, generated):
+        expected = [reference_evaluate(target, generation) for target, generation in zip(targets, generated)]
+        self.assertEqual(expected, evaluator.evaluate_batch(targets, generated))
+
+    def test_equivalent_for_mixed_grid_shapes(self):
+        rng = random.Random(7)
+        shapes = [(5, 5), (3, 3), (5, 4), (4, 5)]
+        targets, generated = [], []
+        for _ in range(200):
+            target_shape, generated_shape = rng.choice(shapes), rng.choice(shapes)
+            targets.append(random_grid(rng, *target_shape))
+            generated.append(random_grid(rng, *(target_shape if rng.random() < 0.7 else generated_shape)))
+        self.assert_equivalent(targets, generated)
+
+    def test_equivalent_for_malformed_grids(self):
+        rng = random.Random(11)
+        targets = [target for target, _ in MALFORMED_GRIDS]
+        generated = [generation for _, generation in MALFORMED_GRIDS]
+        for _ in range(100):
+            targets.append(random_grid(rng, 3, 3, ragged=rng.random() < 0.5))
+            generated.append(random_grid(rng, 3, 3, ragged=rng.random() < 0.5))
+        self.assert_equivalent(targets, generated)
+
+    def test_evaluate_raises_for_grids_that_cannot_be_evaluated(self):
+        self.assertEqual((100.0, 100.0, 100.0), evaluator.evaluate('X X\nX', 'x x\nx'))
+        with self.assertRaises(ValueError):
+            evaluator.evaluate('▢ ▢\n▢ ▢', 'X X\nX X')
+
+
+class FlippedPixelsBatchTestCase(unittest.TestCase):
+
+    def assert_equivalent(self, previous, current):
+        expected = [reference_flipped_pixels(previous_grid, current_grid)
+                    for previous_grid, current_grid in zip(previous, current)]
+        self.assertEqual(expected, evaluator.calculate_flipped_pixels_batch(previous, current))
+
+    def test_equivalent_with_the_empty_grid_first(self):
+        rng = random.Random(13)
+        turn_grids = [random_grid(rng, 5, 5) for _ in range(20)]
+        # as in the scorer: the first grid is compared to the empty grid
+        self.assert_equivalent([EMPTY_GRID] + turn_grids[:-1], turn_grids)
+
+    def test_equivalent_for_mixed_grid_shapes(self):
+        rng = random.Random(17)
+        shapes = [(5, 5), (3, 3), (5, 4), (4, 5)]
+        previous = [random_grid(rng, *rng.choice(shapes)) for _ in range(200)]
+        current = [random_grid(rng, *rng.choice(shapes)) for _ in range(200)]
+        self.assert_equivalent(previous, current)
+
+    def test_equivalent_for_malformed_grids(self):
+        rng = random.Random(19)
+        previous = [previous_grid for previous_grid, _ in MALFORMED_GRIDS]
+        current = [current_grid for _, current_grid in MALFORMED_GRIDS]
+        for _ in range(100):
+            previous.append(random_grid(rng, 3, 3, ragged=rng.random() < 0.5))
+            current.append(random_grid(rng, 3, 3, ragged=rng.random() < 0.5))
+        self.assert_equivalent(previous, current)
+
+
+class ParseGridTestCase(unittest.TestCase):
+
+    def test_cells_are_lower_cased(self):
+        self.assertEqual([['x', '▢'], ['o', 'x']], evaluator.parse_grid('X ▢\nO x').tolist())
+
+    def test_ragged_rows_are_rejected(self):
+        with self.assertRaises(ValueError):
+            evaluator.parse_grid('X X\nX')
+
+    def test_cached_array_is_shared_and_read_only(self):
+        cells = evaluator.parse_grid(EMPTY_GRID)
+        self.assertIs(cells, evaluator.parse_grid(EMPTY_GRID))
+        self.assertFalse(cells.flags.writeable)
+        with self.assertRaises(ValueError):
+            cells[0, 0] = 'x'
+        evaluator.evaluate_batch([EMPTY_GRID], ['X ▢ ▢ ▢ ▢\n' * 4 + 'X ▢ ▢ ▢ ▢'])
+        evaluator.calculate_flipped_pixels_batch([EMPTY_GRID], ['X ▢ ▢ ▢ ▢\n' * 4 + 'X ▢ ▢ ▢ ▢'])
+        self.assertEqual({'▢'}, set(evaluator.parse_grid(EMPTY_GRID).ravel().tolist()))
+
+
+if __name__ == '__main__':
+    unittest.main()
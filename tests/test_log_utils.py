@@ -0,0 +1,132 @@
+import functools
+import logging
+import logging.handlers
+import os
+import unittest
+from unittest import mock
+
+import clemgame
+from clemgame import log_utils
+from clemgame import benchmark
+from clemgame.clemgame import GameRecorder, set_recorder_log_level
+
+
+def log_pid(number):
+    logging.getLogger("backends.test").info("worker record %d", number)
+    return os.getpid()
+
+
+class RecordingHandler(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class ProcessPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.root = logging.getLogger()
+        log_utils.detach_queue_listener()
+        self.original_handlers = list(self.root.handlers)
+        for handler in self.original_handlers:
+            self.root.removeHandler(handler)
+        self.handler = RecordingHandler()
+        self.root.addHandler(self.handler)
+        log_utils.start_queue_listener()
+
+    def tearDown(self):
+        log_utils.detach_queue_listener()
+        self.root.removeHandler(self.handler)
+        for handler in self.original_handlers:
+            self.root.addHandler(handler)
+        log_utils.start_queue_listener()
+
+    def test_worker_records_reach_the_parent_handlers(self):
+        with log_utils.process_pool(2) as executor:
+            pids = set(executor.map(log_pid, range(8)))
+        self.assertNotIn(os.getpid(), pids)
+        self.assertEqual(sorted(f"worker record {number}" for number in range(8)),
+                         sorted(record.getMessage() for record in self.handler.records))
+        self.assertTrue({record.process for record in self.handler.records} <= pids)
+
+    def test_scoring_errors_of_workers_reach_the_parent_handlers(self):
+        with log_utils.process_pool(2) as executor:
+            units = [("no_such_game", "mock-t0.0--mock-t0.0", "0_greet_en", "greet_en", f"episode_{number}")
+                     for number in range(2)]
+            outcomes = list(executor.map(functools.partial(benchmark._run_episode, task="score"), units))
+        self.assertEqual([("no_such_game", "error")] * 2, outcomes)
+        messages = [record.getMessage() for record in self.handler.records if record.levelno == logging.ERROR]
+        self.assertEqual(2, len([message for message in messages if "Cannot score" in message]))
+
+    def test_queue_listener_is_restarted(self):
+        with log_utils.process_pool(1) as executor:
+            list(executor.map(log_pid, range(1)))
+        queue_handlers = [h for h in self.root.handlers if getattr(h, "listener", None) is not None]
+        self.assertEqual(1, len(queue_handlers))
+        self.assertEqual([queue_handlers[0]], self.root.handlers)
+
+
+class ConfigureLoggingTestCase(unittest.TestCase):
+
+    def tearDown(self):
+        log_utils.configure_logging(clemgame.project_root)
+
+    def queue_handlers(self):
+        return [h for h in logging.getLogger().handlers if isinstance(h, logging.handlers.QueueHandler)]
+
+    def test_file_handler_rotates_behind_the_queue(self):
+        log_utils.configure_logging(clemgame.project_root)
+        queue_handlers = self.queue_handlers()
+        self.assertEqual(queue_handlers, logging.getLogger().handlers)
+        self.assertEqual(1, len(queue_handlers))
+        listener = queue_handlers[0].listener
+        self.assertIsNotNone(listener)
+        file_handlers = [h for h in listener.handlers if isinstance(h, logging.handlers.RotatingFileHandler)]
+        self.assertEqual(1, len(file_handlers))
+        self.assertEqual(52428800, file_handlers[0].maxBytes)
+        self.assertEqual(5, file_handlers[0].backupCount)
+        self.assertEqual(os.path.join(clemgame.project_root, "clembench.log"), file_handlers[0].baseFilename)
+
+    def test_configure_again_keeps_a_single_queue(self):
+        log_utils.configure_logging(clemgame.project_root)
+        log_utils.configure_logging(clemgame.project_root)
+        self.assertEqual(1, len(self.queue_handlers()))
+
+
+class RecorderLogLevelTestCase(unittest.TestCase):
+
+    def tearDown(self):
+        set_recorder_log_level(logging.INFO)
+
+    def log_calls(self, level):
+        set_recorder_log_level(level)
+        recorder = GameRecorder("testgame")
+        recorder.logger = mock.Mock()
+        recorder.log_next_turn()
+        recorder.log_key("key", "value")
+        recorder.log_episode_score("Success", 1)
+        return recorder.logger.log.call_args_list
+
+    def test_messages_use_the_recorder_level(self):
+        self.assertEqual({logging.INFO}, {call.args[0] for call in self.log_calls(logging.INFO)})
+        self.assertEqual({logging.DEBUG}, {call.args[0] for call in self.log_calls("debug")})
+
+    def test_messages_are_formatted_lazily(self):
+        calls = self.log_calls(logging.INFO)
+        self.assertEqual(2, len(calls))
+        self.assertEqual(mock.call(logging.INFO, "%s: Logged a game-specific interaction key: %s.", "testgame", "key"),
+                         calls[0])
+        self.assertEqual(mock.call(logging.INFO, "%s: Logged episode score %s=%s.", "testgame", "Success", 1),
+                         calls[1])
+
+    def test_unknown_level_is_rejected(self):
+        with self.assertRaises(ValueError):
+            set_recorder_log_level("chatty")
+
+
+if __name__ == '__main__':
+    unittest.main()
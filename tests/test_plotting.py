@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from evaluation import evalutils, plotting
+
+rendered_plots = []
+
+
+def plot_scores(df: pd.DataFrame, game: str) -> str:
+    """ a plot function that records its calls and writes an empty file instead of a figure """
+    rendered_plots.append(game)
+    path = os.path.join(evalutils.EVAL_DIR, f'{game}.pdf')
+    with open(path, 'w'):
+        pass
+    return path
+
+
+def scores(game: str, value: float = 50.0) -> pd.DataFrame:
+    return pd.DataFrame({'game': [game] * 2, 'metric': ['Played', 'Main Score'], 'value': [1.0, value]})
+
+
+class RenderPlotsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        eval_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(eval_dir.cleanup)
+        patcher = mock.patch.object(evalutils, 'EVAL_DIR', eval_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(plotting, 'ERRORBAR', plotting.ERRORBAR)  # restored after render_plots sets it
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def render_plots(self, tasks, **kwargs):
+        rendered_plots.clear()
+        plotting.render_plots(tasks, **kwargs)
+        return sorted(rendered_plots)
+
+    def tasks(self, taboo_value: float = 50.0):
+        return [(plot_scores, (scores('taboo', taboo_value), 'taboo')),
+                (plot_scores, (scores('wordle'), 'wordle'))]
+
+    def test_unchanged_plots_are_not_rendered_again(self):
+        self.assertEqual(['taboo', 'wordle'], self.render_plots(self.tasks()))
+        self.assertEqual([], self.render_plots(self.tasks()))
+        fingerprints = evalutils.load_json(os.path.join(evalutils.EVAL_DIR, plotting.PLOTS_FINGERPRINTS))
+        self.assertEqual(2, len(fingerprints))
+
+    def test_plot_with_changed_data_is_rendered_again(self):
+        self.render_plots(self.tasks())
+        self.assertEqual(['taboo'], self.render_plots(self.tasks(taboo_value=60.0)))
+        self.assertEqual([], self.render_plots(self.tasks(taboo_value=60.0)))
+
+    def test_changed_plots_version_renders_all_plots(self):
+        self.render_plots(self.tasks())
+        with mock.patch.object(plotting, 'PLOTS_VERSION', plotting.PLOTS_VERSION + 1):
+            self.assertEqual(['taboo', 'wordle'], self.render_plots(self.tasks()))
+
+    def test_changed_errorbar_renders_all_plots(self):
+        self.render_plots(self.tasks())
+        self.assertEqual(['taboo', 'wordle'], self.render_plots(self.tasks(), errorbar='ci'))
+        self.assertEqual([], self.render_plots(self.tasks(), errorbar='ci'))
+        self.assertEqual(plotting.ERRORBARS['ci'], plotting.ERRORBAR)
+
+    def test_deleted_plot_is_rendered_again(self):
+        self.render_plots(self.tasks())
+        os.remove(os.path.join(evalutils.EVAL_DIR, 'wordle.pdf'))
+        self.assertEqual(['wordle'], self.render_plots(self.tasks()))
+
+    def test_force_renders_all_plots(self):
+        self.render_plots(self.tasks())
+        self.assertEqual(['taboo', 'wordle'], self.render_plots(self.tasks(), force=True))
+
+    def test_failed_plot_is_not_recorded(self):
+        failing_task = (plot_scores, (scores('taboo'), 'missing/taboo'))
+        self.assertEqual(['missing/taboo'], self.render_plots([failing_task]))
+        fingerprints_path = os.path.join(evalutils.EVAL_DIR, plotting.PLOTS_FINGERPRINTS)
+        with open(fingerprints_path) as file:
+            self.assertEqual({}, json.load(file))
+        self.assertEqual(['missing/taboo'], self.render_plots([failing_task]))
+
+
+if __name__ == '__main__':
+    unittest.main()
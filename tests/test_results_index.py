@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from clemgame import results_index, transcript_server
+
+
+def store_episode(results_dir, episode_dir):
+    """ the interactions of an episode, as stored by the game master """
+    episode_path = os.path.join(results_dir, "mock-t0.0--mock-t0.0", "hellogame", "0_greet_en", episode_dir)
+    os.makedirs(episode_path)
+    with open(os.path.join(episode_path, results_index.EPISODE_MARKER_FILE), "w") as f:
+        json.dump({}, f)
+
+
+class ResultsIndexTestCase(unittest.TestCase):
+
+    def test_add_episode_to_archive_without_index(self):
+        with tempfile.TemporaryDirectory() as results_dir:
+            for episode_counter in range(3):  # stored before the index existed
+                store_episode(results_dir, f"episode_{episode_counter}")
+            store_episode(results_dir, "episode_3")
+            results_index.add_episode("mock-t0.0--mock-t0.0", "hellogame", "0_greet_en", "episode_3", results_dir)
+            episodes = results_index.load_episodes(results_dir)
+            self.assertEqual(["episode_0", "episode_1", "episode_2", "episode_3"],
+                             sorted(entry["episode"] for entry in episodes))
+            with open(results_index.index_path(results_dir)) as f:
+                self.assertEqual(4, len(f.readlines()))
+
+    def test_add_episode_to_indexed_archive(self):
+        with tempfile.TemporaryDirectory() as results_dir:
+            store_episode(results_dir, "episode_0")
+            results_index.rebuild(results_dir)
+            store_episode(results_dir, "episode_1")
+            results_index.add_episode("mock-t0.0--mock-t0.0", "hellogame", "0_greet_en", "episode_1", results_dir)
+            episodes = results_index.load_episodes(results_dir, game_name="hellogame")
+            self.assertEqual(["episode_0", "episode_1"], sorted(entry["episode"] for entry in episodes))
+
+
+class TranscriptServerTestCase(unittest.TestCase):
+
+    def test_index_is_loaded_again_only_when_changed(self):
+        with tempfile.TemporaryDirectory() as results_dir:
+            store_episode(results_dir, "episode_0")
+            results_index.rebuild(results_dir)
+            server = transcript_server.TranscriptServer(("localhost", 0), results_dir)
+            try:
+                experiment = ("mock-t0.0--mock-t0.0", "hellogame", "0_greet_en")
+                with mock.patch.object(results_index, "load_episodes", wraps=results_index.load_episodes) as load:
+                    self.assertIsNotNone(server.find_episode(experiment + ("episode_0",)))
+                    self.assertIsNone(server.find_episode(experiment + ("episode_1",)))
+                    self.assertEqual(1, load.call_count)
+                    store_episode(results_dir, "episode_1")
+                    results_index.add_episode(*experiment, "episode_1", results_dir)
+                    self.assertIsNotNone(server.find_episode(experiment + ("episode_1",)))
+                    self.assertEqual(2, load.call_count)
+            finally:
+                server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
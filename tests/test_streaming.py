@@ -0,0 +1,143 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from clemgame import results_index
+from evaluation import streaming
+
+PAIRS = ["model-a-t0.0--model-a-t0.0", "model-b-t0.0--model-b-t0.0", "model-c-t0.0--model-c-t0.0"]
+
+
+def episode_scores(seed: int = 0, n_rows: int = 300) -> pd.DataFrame:
+    """ the episode scores of some groups, some with a single score """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"game": rng.choice(["imagegame", "taboo"], n_rows),
+                       "model": rng.choice(PAIRS, n_rows),
+                       "experiment": rng.choice(["0_easy", "1_hard"], n_rows),
+                       "metric": rng.choice(["Played", "Main Score"], n_rows),
+                       "value": rng.normal(50, 20, n_rows)})
+    single = pd.DataFrame([("wordle", PAIRS[0], "0_easy", "Main Score", 42.0)], columns=df.columns)
+    return pd.concat([df, single], ignore_index=True)
+
+
+def streamed_stats(df: pd.DataFrame, chunk_size: int) -> pd.DataFrame:
+    stats = streaming.empty_stats()
+    for start in range(0, len(df), chunk_size):
+        stats = streaming.merge_stats(stats, streaming.chunk_stats(df[start:start + chunk_size]))
+    return stats
+
+
+class RunningStatisticsTestCase(unittest.TestCase):
+
+    def assert_summary_equal(self, expected: pd.DataFrame, stats: pd.DataFrame):
+        summary = streaming.stats_summary(stats).sort_index()
+        expected = expected.sort_index()
+        np.testing.assert_allclose(expected["mean"], summary["mean"])
+        np.testing.assert_allclose(expected["std"], summary["std"])  # NaN for the groups with a single score
+
+    def test_streamed_mean_and_std_equal_the_pandas_ones(self):
+        df = episode_scores()
+        expected = df.groupby(streaming.STATS_KEYS)["value"].agg(["mean", "std"])
+        for chunk_size in [1, 7, len(df)]:
+            with self.subTest(chunk_size=chunk_size):
+                self.assert_summary_equal(expected, streamed_stats(df, chunk_size))
+
+    def test_combined_mean_and_std_equal_the_pandas_ones(self):
+        df = episode_scores()
+        by = ["game", "model", "metric"]
+        expected = df.groupby(by)["value"].agg(["mean", "std"])
+        self.assert_summary_equal(expected, streaming.combine_stats(streamed_stats(df, 13), by))
+
+    def test_merge_order_does_not_matter(self):
+        df = episode_scores()
+        chunks = [streaming.chunk_stats(df[start:start + 50]) for start in range(0, len(df), 50)]
+        forward, backward = streaming.empty_stats(), streaming.empty_stats()
+        for chunk in chunks:
+            forward = streaming.merge_stats(forward, chunk)
+        for chunk in reversed(chunks):
+            backward = streaming.merge_stats(chunk, backward)
+        pd.testing.assert_frame_equal(forward.sort_index(), backward.sort_index(), check_exact=False)
+
+
+class UpdateStateTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.results_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.results_dir.cleanup)
+        self.path = self.results_dir.name
+        for pair_idx, pair in enumerate(PAIRS):
+            for episode in range(3):
+                self.store_episode(pair, f"episode_{episode}", 10.0 * pair_idx + episode, mtime=1)
+
+    def store_episode(self, pair: str, episode: str, score: float, mtime: int):
+        episode_dir = os.path.join(self.path, pair, "taboo", "0_high_en", episode)
+        os.makedirs(episode_dir, exist_ok=True)
+        with open(os.path.join(episode_dir, "interactions.json"), "w") as file:
+            json.dump({}, file)
+        file_path = os.path.join(episode_dir, "scores.json")
+        if not os.path.isfile(file_path):
+            results_index.add_episode(pair, "taboo", "0_high_en", episode, results_dir=self.path)
+        with open(file_path, "w") as file:
+            json.dump({"turn scores": {}, "episode scores": {"Main Score": score, "Played": 1}}, file)
+        os.utime(file_path, ns=(mtime, mtime))  # a distinct modification time, however fast the test runs
+
+    def update_state(self, **kwargs):
+        with mock.patch.object(streaming, "aggregate_episode_scores",
+                               wraps=streaming.aggregate_episode_scores) as aggregate_episode_scores:
+            stats = streaming.update_state(self.path, threads=1, **kwargs)
+        aggregated = [file[1] for call in aggregate_episode_scores.call_args_list for file in call.kwargs["files"]]
+        return stats.sort_index(), sorted(aggregated)
+
+    def test_unchanged_pairs_are_taken_from_the_state(self):
+        stats, aggregated = self.update_state()
+        self.assertEqual(9, len(aggregated))
+        self.assertTrue(os.path.isfile(os.path.join(self.path, streaming.STATE_FILE)))
+        stats_again, aggregated = self.update_state()
+        self.assertEqual([], aggregated)
+        pd.testing.assert_frame_equal(stats, stats_again)
+
+    def test_only_the_changed_pair_is_aggregated_again(self):
+        self.update_state()
+        self.store_episode(PAIRS[1], "episode_2", 99.0, mtime=2)
+        stats, aggregated = self.update_state()
+        self.assertEqual([os.path.join(PAIRS[1], "taboo", "0_high_en", f"episode_{episode}", "scores.json")
+                          for episode in range(3)], aggregated)
+        rebuilt, aggregated = self.update_state(rebuild=True)
+        self.assertEqual(9, len(aggregated))
+        pd.testing.assert_frame_equal(rebuilt, stats)
+        self.assertEqual(10 + 11 + 99, stats.loc[("taboo", PAIRS[1], "0_high_en", "Main Score"), "sum"])
+
+    def test_added_pair_is_aggregated(self):
+        self.update_state()
+        self.store_episode("model-d-t0.0--model-d-t0.0", "episode_0", 5.0, mtime=1)
+        stats, aggregated = self.update_state()
+        self.assertEqual(1, len(aggregated))
+        self.assertEqual(4, len(stats.index.unique("model")))
+
+    def test_state_version_mismatch_forces_a_rebuild(self):
+        self.update_state()
+        self.assertTrue(streaming.load_state(self.path))
+        with mock.patch.object(streaming, "STATE_VERSION", streaming.STATE_VERSION + 1):
+            self.assertEqual({}, streaming.load_state(self.path))
+            _, aggregated = self.update_state()
+            self.assertEqual(9, len(aggregated))
+            _, aggregated = self.update_state()
+            self.assertEqual([], aggregated)
+
+    def test_state_round_trip(self):
+        self.update_state()
+        state = streaming.load_state(self.path)
+        self.assertEqual(set(PAIRS), set(state))
+        streaming.save_state(self.path, state)
+        for pair, entry in streaming.load_state(self.path).items():
+            self.assertEqual(state[pair]["fingerprint"], entry["fingerprint"])
+            pd.testing.assert_frame_equal(state[pair]["stats"], entry["stats"])
+
+
+if __name__ == '__main__':
+    unittest.main()